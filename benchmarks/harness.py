@@ -0,0 +1,93 @@
+"""Timing, JSON reports and baseline comparison for the benchmark suite."""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+DEFAULT_TOLERANCE = 0.2  # a benchmark regresses if its median is more than 20% slower than the baseline
+
+BENCHMARKS = {}  # name -> (fn, large); fn(params) returns a zero-argument callable to time, or (callable, info dict)
+
+def benchmark(name, large=False):
+    """Register a benchmark. large ones (several GB of memory) only run with --large."""
+    def register(fn):
+        BENCHMARKS[name] = (fn, large)
+        return fn
+    return register
+
+def time_callable(fn, repeat=5, warmup=1):
+    """Run fn warmup + repeat times. Returns: dict of wall-clock statistics in seconds."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "mean_s": statistics.fmean(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "repeat": repeat,
+    }
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    import numpy as np
+    import pandas as pd
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def run(names=None, large=False, repeat=5, warmup=1, log=print):
+    """Run the selected benchmarks (default: all that fit the large flag). Returns: report dict."""
+    results = {}
+    for name, (setup, is_large) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        if is_large and not large and not names:
+            continue
+        prepared = setup()
+        fn, info = prepared if isinstance(prepared, tuple) else (prepared, {})
+        result = time_callable(fn, repeat=repeat, warmup=warmup)
+        result.update(info)
+        results[name] = result
+        log(f"{name:<40} median {result['median_s'] * 1000:10.2f} ms   min {result['min_s'] * 1000:10.2f} ms")
+        del prepared, fn
+    return {"environment": environment(), "results": results}
+
+def save(report, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Median-to-median comparison against a baseline report.
+    Returns: list of dicts (name, baseline_s, current_s, ratio, status) with status 'regression' | 'improvement' | 'ok'."""
+    rows = []
+    for name, current in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        ratio = current["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        status = "regression" if ratio > 1 + tolerance else "improvement" if ratio < 1 / (1 + tolerance) else "ok"
+        rows.append({"name": name, "baseline_s": base["median_s"], "current_s": current["median_s"], "ratio": ratio, "status": status})
+    return rows
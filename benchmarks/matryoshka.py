@@ -0,0 +1,108 @@
+"""Recall@k and speed of two-stage Matryoshka search (utils.two_stage_top_k) against exact search (utils.batch_top_k).
+
+    python -m benchmarks.matryoshka                                       # synthetic 11.5k x 768 catalogue
+    python -m benchmarks.matryoshka --embeddings course_embeddings/course_embeddings.npz --queries disciplines.npz
+    python -m benchmarks.matryoshka --n 860000 --num-queries 256          # discipline-scale catalogue (~3 GB of RAM)
+
+Queries come from --queries (an .npz with an `embeddings` array) or are catalogue rows plus noise. The synthetic
+catalogue imitates Matryoshka training (variance decays along the dimensions, so leading dimensions carry most of the
+similarity); its recall is indicative only, measure on real embeddings before changing a default."""
+import argparse
+import sys
+
+import numpy as np
+
+import src.utils as utils
+from benchmarks import harness
+from benchmarks.suite import EMBEDDING_DIM, NUM_COURSES, SEED
+
+DEFAULT_OUTPUT = "benchmarks/results/matryoshka.json"
+DEFAULT_PREFIX_DIMS = (128, 256)
+DEFAULT_SHORTLISTS = (16, 32, 64, 128)
+DEFAULT_TOP_K = 5
+DEFAULT_NUM_QUERIES = 1024
+
+def matryoshka_embeddings(n, dim=EMBEDDING_DIM, seed=SEED, num_clusters=500, decay=0.5, chunk=65_536):
+    """L2-normalised float32 rows around num_clusters topics, with the spread of dimension d scaled by (d + 1) ** -decay."""
+    rng = np.random.default_rng(seed)
+    scale = (np.arange(dim, dtype=np.float32) + 1) ** -decay
+    centres = rng.standard_normal((num_clusters, dim), dtype=np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        block = centres[rng.integers(0, num_clusters, m)] + rng.standard_normal((m, dim), dtype=np.float32)
+        block *= scale
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        out[start:start + m] = block
+    return out
+
+def noisy_queries(embeddings, num_queries=DEFAULT_NUM_QUERIES, noise=0.5, seed=SEED + 1):
+    """Catalogue rows perturbed with noise of the same per-dimension profile, then re-normalised."""
+    rng = np.random.default_rng(seed)
+    rows = embeddings[rng.integers(0, len(embeddings), num_queries)]
+    spread = rows.std(axis=0, keepdims=True)
+    queries = rows + noise * spread * rng.standard_normal(rows.shape, dtype=np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def recall_at_k(indices, exact_indices):
+    """Fraction of the exact top-k found in the approximate top-k, averaged over queries."""
+    k = exact_indices.shape[1]
+    hits = sum(len(set(a[:k]) & set(e)) for a, e in zip(indices, exact_indices))
+    return hits / exact_indices.size
+
+def evaluate(queries, embeddings, top_k=DEFAULT_TOP_K, prefix_dims=DEFAULT_PREFIX_DIMS, shortlists=DEFAULT_SHORTLISTS,
+             repeat=3, log=print):
+    """Time exact search and every (prefix_dim, shortlist) pair on the same queries. Returns: list of result dicts."""
+    dim = embeddings.shape[1]
+    exact_fn = lambda: utils.batch_top_k(queries, embeddings, top_k=top_k)
+    exact_indices, _ = exact_fn()
+    exact = harness.time_callable(exact_fn, repeat=repeat)
+    rows = [{"mode": "exact", "prefix_dim": dim, "shortlist": None, "recall": 1.0, "speedup": 1.0,
+             "scan_ratio": 1.0, **exact}]
+    for prefix_dim in prefix_dims:
+        if prefix_dim >= dim:
+            continue
+        prefix = utils.truncate_embeddings(embeddings, prefix_dim)
+        for shortlist in shortlists:
+            fn = lambda: utils.two_stage_top_k(queries, embeddings, top_k=top_k, prefix=prefix, shortlist=shortlist)
+            indices, _ = fn()
+            timing = harness.time_callable(fn, repeat=repeat)
+            rows.append({"mode": "two_stage", "prefix_dim": prefix_dim, "shortlist": shortlist,
+                         "recall": recall_at_k(indices, exact_indices), "speedup": exact["median_s"] / timing["median_s"],
+                         "scan_ratio": dim / prefix_dim, **timing})
+    for r in rows:
+        log(f"{r['mode']:<10} d={r['prefix_dim']:<5} shortlist={str(r['shortlist']):<5} recall@{top_k}={r['recall']:.3f}  "
+            f"{r['median_s'] * 1000:9.2f} ms  x{r['speedup']:.2f}  scans 1/{r['scan_ratio']:.0f} of the matrix")
+    return rows
+
+def _load_npz(path):
+    with np.load(path) as data:
+        embeddings = data["embeddings"].astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", help="catalogue .npz (e.g. course_embeddings.npz); default: synthetic")
+    parser.add_argument("--queries", help="query .npz with an `embeddings` array; default: noisy catalogue rows")
+    parser.add_argument("--n", type=int, default=NUM_COURSES, help="synthetic catalogue size")
+    parser.add_argument("--num-queries", type=int, default=DEFAULT_NUM_QUERIES)
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--prefix-dims", type=int, nargs="+", default=list(DEFAULT_PREFIX_DIMS))
+    parser.add_argument("--shortlists", type=int, nargs="+", default=list(DEFAULT_SHORTLISTS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    embeddings = _load_npz(args.embeddings) if args.embeddings else matryoshka_embeddings(args.n)
+    queries = _load_npz(args.queries)[:args.num_queries] if args.queries else noisy_queries(embeddings, args.num_queries)
+    print(f"{len(queries)} queries x {embeddings.shape[0]} x {embeddings.shape[1]}")
+    rows = evaluate(queries, embeddings, top_k=args.top_k, prefix_dims=args.prefix_dims,
+                    shortlists=args.shortlists, repeat=args.repeat)
+    harness.save({"environment": harness.environment(), "catalogue": args.embeddings or "synthetic",
+                  "queries": args.queries or "noisy catalogue rows", "n": int(embeddings.shape[0]),
+                  "num_queries": int(len(queries)), "top_k": args.top_k, "results": rows}, args.output)
+    print(f"Report written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
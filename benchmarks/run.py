@@ -0,0 +1,59 @@
+"""Run the benchmark suite, write a JSON report and optionally compare it with a saved baseline.
+
+    python -m benchmarks.run                                   # all regular benchmarks -> benchmarks/results/latest.json
+    python -m benchmarks.run --large                           # also the 860k x 768 searches (~3 GB of RAM)
+    python -m benchmarks.run --save-baseline                   # store the report as benchmarks/results/baseline.json
+    python -m benchmarks.run --compare benchmarks/results/baseline.json   # exit code 1 on regressions
+"""
+import argparse
+import logging
+import sys
+
+from benchmarks import harness
+import benchmarks.suite  # noqa: F401  (registers the benchmarks)
+
+DEFAULT_OUTPUT = "benchmarks/results/latest.json"
+DEFAULT_BASELINE = "benchmarks/results/baseline.json"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--large", action="store_true", help="include the multi-GB benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--save-baseline", action="store_true", help=f"also write the report to {DEFAULT_BASELINE}")
+    parser.add_argument("--compare", metavar="BASELINE", help="baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=harness.DEFAULT_TOLERANCE,
+                        help="allowed median slowdown before a benchmark counts as a regression (0.2 = 20%%)")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (_, large) in harness.BENCHMARKS.items():
+            print(f"{name}{'  (large)' if large else ''}")
+        return 0
+    unknown = set(args.names) - set(harness.BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    logging.getLogger("pipeline").setLevel(logging.WARNING)  # process_speciality logs every step
+    report = harness.run(args.names, large=args.large, repeat=args.repeat, warmup=args.warmup)
+    harness.save(report, args.output)
+    print(f"Report written to {args.output}")
+    if args.save_baseline:
+        harness.save(report, DEFAULT_BASELINE)
+        print(f"Baseline written to {DEFAULT_BASELINE}")
+
+    if args.compare:
+        rows = harness.compare(report, harness.load(args.compare), tolerance=args.tolerance)
+        for r in rows:
+            print(f"{r['name']:<40} {r['baseline_s'] * 1000:10.2f} ms -> {r['current_s'] * 1000:10.2f} ms  x{r['ratio']:.2f}  {r['status']}")
+        regressions = [r for r in rows if r["status"] == "regression"]
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""The benchmarks: hot paths of src/ on synthetic, seeded inputs (no data files or network needed)."""
+import hashlib
+import io
+import json
+import os
+import random
+import tempfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.harness import benchmark
+
+SEED = 0
+EMBEDDING_DIM = 768
+NUM_COURSES = 11_500       # Urait catalogue
+NUM_DISCIPLINES = 860_000  # discipline rows of a full pipeline run
+NUM_URLS = 50_000
+NUM_QUERIES = 1024
+
+def random_embeddings(n, dim=EMBEDDING_DIM, seed=SEED, chunk=65_536):
+    """L2-normalised float32 rows, generated in chunks so the large matrices never exist in float64."""
+    rng = np.random.default_rng(seed)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk):
+        block = rng.standard_normal((min(chunk, n - start), dim), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        out[start:start + len(block)] = block
+    return out
+
+### url_utils ###
+def url_corpus(n=NUM_URLS, seed=SEED):
+    """Variations of the URLs from the extract_root test cases: new first labels, paths and schemes."""
+    from src.url_cases import URL_ROOT_CASES
+    seeds = sorted({url for url, _ in URL_ROOT_CASES})
+    rng = random.Random(seed)
+    labels = ["www", "lk", "abit", "sveden", "edu", "priem", "old", "new", "m"]
+    paths = ["", "sveden/education/", "files/uchplan.pdf", "upload/iblock/3f2/rpd.pdf", "vuz/card/mgu/"]
+    urls = []
+    for _ in range(n):
+        url = rng.choice(seeds)
+        scheme, _, rest = url.partition("://")
+        host, _, _ = rest.partition("/")
+        if rng.random() < 0.3:
+            host = f"{rng.choice(labels)}.{host.removeprefix('www.')}"
+        urls.append(f"{rng.choice(['http', 'https'])}://{host}/{rng.choice(paths)}")
+    return urls
+
+@benchmark("url_utils.extract_root")
+def bench_extract_root():
+    import src.url_utils as url_utils
+    urls = url_corpus()
+    return (lambda: [url_utils.extract_root(u) for u in urls]), {"n": len(urls)}
+
+### Similarity search ###
+def _bench_get_most_similar(n):
+    import src.utils as utils
+    embeddings = random_embeddings(n)
+    query = random_embeddings(1, seed=SEED + 1)[0]
+    return (lambda: utils.get_most_similar(query, embeddings, top_k=5)), {"n": n, "dim": EMBEDDING_DIM}
+
+def _bench_batch_top_k(n, chunk_size):
+    import src.utils as utils
+    embeddings = random_embeddings(n)
+    queries = random_embeddings(NUM_QUERIES, seed=SEED + 1)
+    return (lambda: utils.batch_top_k(queries, embeddings, top_k=5, chunk_size=chunk_size)), \
+        {"n": n, "queries": NUM_QUERIES, "dim": EMBEDDING_DIM, "chunk_size": chunk_size}
+
+def _bench_two_stage_top_k(n, prefix_dim):
+    import src.utils as utils
+    embeddings = random_embeddings(n)
+    prefix = utils.truncate_embeddings(embeddings, prefix_dim)
+    queries = random_embeddings(NUM_QUERIES, seed=SEED + 1)
+    return (lambda: utils.two_stage_top_k(queries, embeddings, top_k=5, prefix=prefix)), \
+        {"n": n, "queries": NUM_QUERIES, "dim": EMBEDDING_DIM, "prefix_dim": prefix_dim, "shortlist": utils.DEFAULT_SHORTLIST}
+
+@benchmark("utils.get_most_similar[11.5k]")
+def bench_get_most_similar_courses():
+    return _bench_get_most_similar(NUM_COURSES)
+
+@benchmark("utils.batch_top_k[1024x11.5k]")
+def bench_batch_top_k_courses():
+    return _bench_batch_top_k(NUM_COURSES, chunk_size=1024)
+
+@benchmark("utils.get_most_similar[860k]", large=True)
+def bench_get_most_similar_disciplines():
+    return _bench_get_most_similar(NUM_DISCIPLINES)
+
+@benchmark("utils.batch_top_k[1024x860k]", large=True)
+def bench_batch_top_k_disciplines():
+    return _bench_batch_top_k(NUM_DISCIPLINES, chunk_size=64)  # 64 x 860k float32 scores = 220 MB per chunk
+
+@benchmark("utils.two_stage_top_k[1024x11.5k,256]")
+def bench_two_stage_top_k_courses():
+    return _bench_two_stage_top_k(NUM_COURSES, prefix_dim=256)
+
+@benchmark("utils.two_stage_top_k[1024x860k,128]", large=True)
+def bench_two_stage_top_k_disciplines():
+    return _bench_two_stage_top_k(NUM_DISCIPLINES, prefix_dim=128)
+
+### Course catalogue ###
+def synthetic_project_subjects(num_projects=NUM_COURSES, subjects_per_project=20, seed=SEED):
+    """project_subjects.csv-shaped text: one row per (project, subject), `;`-separated, NULLs as in the export."""
+    rng = np.random.default_rng(seed)
+    n = num_projects * subjects_per_project
+    project_id = np.repeat(np.arange(1, num_projects + 1), subjects_per_project)
+    subject_id = rng.integers(1, 200_000, n)
+    df = pd.DataFrame({
+        "project_id": project_id,
+        "project_name": [f"Курс {p}" for p in project_id],
+        "subject_id": subject_id,
+        "parent_subject_id": np.where(rng.random(n) < 0.1, "NULL", rng.integers(1, 200_000, n).astype(str)),
+        "subject_name": [f"Тема {s}. Полное название раздела" for s in subject_id],
+        "subject_short_name": [f"Тема {s}" for s in subject_id],
+        "subject_page": rng.integers(1, 500, n),
+        "level": rng.integers(1, 4, n),
+        "l_key": rng.integers(1, 1000, n),
+        "r_key": rng.integers(1, 1000, n),
+        "fcode": rng.integers(1, 50, n),
+        "fname": [f"Университет {f}" for f in rng.integers(1, 300, n)],
+    })
+    return df.to_csv(sep=';', index=False)
+
+@benchmark("utils.load_project_subjects")
+def bench_load_project_subjects():
+    import src.utils as utils
+    tmp = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8-sig")
+    tmp.write(synthetic_project_subjects())
+    tmp.close()
+    return (lambda: utils.load_project_subjects(tmp.name)), {"bytes": os.path.getsize(tmp.name)}
+
+@benchmark("utils.aggregate_courses")
+def bench_aggregate_courses():
+    import src.utils as utils
+    subjects_df = pd.read_csv(io.StringIO(synthetic_project_subjects()), sep=';', na_values=['NULL'])
+    return (lambda: utils.aggregate_courses(subjects_df)), {"rows": len(subjects_df)}
+
+### Embedding (de)serialisation ###
+@benchmark("embeddings.to_json_column")
+def bench_embeddings_to_json():
+    embeddings = random_embeddings(NUM_COURSES)
+    return (lambda: [json.dumps(vec.tolist()) for vec in embeddings]), {"n": NUM_COURSES}  # as in make_courses_csv
+
+@benchmark("gap_analysis.parse_embedding_column")
+def bench_embeddings_from_json():
+    import src.gap_analysis as gap_analysis
+    column = pd.Series([json.dumps(vec.tolist()) for vec in random_embeddings(NUM_COURSES)])
+    return (lambda: gap_analysis.parse_embedding_column(column)), {"n": NUM_COURSES}
+
+@benchmark("embeddings.npz_roundtrip")
+def bench_embeddings_npz():
+    embeddings = random_embeddings(NUM_COURSES)
+    ids = np.arange(NUM_COURSES)
+
+    def roundtrip():
+        buf = io.BytesIO()
+        np.savez_compressed(buf, ids=ids, embeddings=embeddings)
+        buf.seek(0)
+        with np.load(buf) as data:
+            return data["ids"], data["embeddings"]
+    return roundtrip, {"n": NUM_COURSES}
+
+### End to end ###
+STUB_DISCIPLINES = 12
+
+class _StubSearchResponse:
+    status_code = 200
+
+    def __init__(self, query):
+        self.query = query
+
+    def json(self):
+        slug = hashlib.md5(self.query.encode("utf-8")).hexdigest()[:12]  # stable across processes, unlike hash()
+        return {"organic": [{"link": f"https://univ{i}.ru/sveden/{slug}.pdf"} for i in range(10)]}
+
+def _stub_respond(prompt, document):
+    if "educational programme" in prompt:
+        return json.dumps({"disciplines": [{"discipline_name": f"Дисциплина {i}", "topics": [] if i % 3 else [f"Тема {i}.1", f"Тема {i}.2"]}
+                                           for i in range(STUB_DISCIPLINES)]}, ensure_ascii=False)
+    return "; ".join(f"Тема {i}" for i in range(15))
+
+@benchmark("pipeline_utils.process_speciality[stub]")
+def bench_process_speciality():
+    """Orchestration cost of one speciality (search, fetch, parse, topic fan-out) with instant in-process stubs."""
+    import src.google_search as google_search
+    import src.pipeline_utils as pipeline_utils
+    import src.utils as utils
+    from src.gemini_stub import StubGeminiClient
+
+    document = ("Рабочая программа дисциплины. Содержание дисциплины. Тема 1. " * 400).encode("utf-8")
+    patches = [
+        mock.patch.object(google_search, "_google_search", _StubSearchResponse),
+        mock.patch.object(google_search, "DEFAULT_RATE_LIMIT", 0),
+        mock.patch.object(utils, "_fetch_document", lambda *a, **kw: (document, "text/plain")),
+        mock.patch.object(utils, "get_gemini_client", lambda *a, **kw: StubGeminiClient(_stub_respond)),
+    ]
+
+    def run():
+        for p in patches:
+            p.start()
+        try:
+            return pipeline_utils.process_speciality("01.03.01", "Математика", 1, 1, topics_from_study_plan=True)
+        finally:
+            for p in patches:
+                p.stop()
+    return run, {"disciplines": STUB_DISCIPLINES}
@@ -2,8 +2,10 @@
 
 # app.py
 import streamlit as st
+import numpy as np
 import pandas as pd
 import src.utils as utils
+import src.matching as matching
 
 st.set_page_config(page_title="Подбор курса по дисциплине", layout="centered")
 
@@ -16,21 +18,19 @@ def to_bool_ru(x: object) -> bool:
     if s in NO_TOKENS:  return False
     return False  # по умолчанию — «нет»
 
-DEFAULT_PROMPT = (
-    "Извлеки название дисциплины/курса и названия тем, которые в нём изучаются, "
-    "всё на русском языке. Включай только академические темы, не административные. "
-    "Ответь только названиями, разделёнными запятыми. Название дисциплины/курса должно быть первым."
-)
+DEFAULT_PROMPT = matching.DEFAULT_PARSE_PROMPT
 
 @st.cache_resource
 def get_client():
-    return utils.get_api_client()
+    return utils.get_gemini_client()
 
 @st.cache_resource
 def load_courses_and_embeddings():
     courses_df = pd.read_csv("courses.csv")
     embeddings_by_id = utils.load_course_embeddings()
-    return courses_df, embeddings_by_id
+    course_ids = np.array(list(embeddings_by_id.keys()))
+    course_matrix = np.vstack(list(embeddings_by_id.values()))
+    return courses_df, course_ids, course_matrix
 
 def run_matching(url: str, parse_prompt: str, top_k: int = 5):
     client = get_client()
@@ -54,11 +54,11 @@ def run_matching(url: str, parse_prompt: str, top_k: int = 5):
     embedding = utils.embed_text(text_to_embed, client)
 
     # Шаг 2: поиск ближайших курсов
-    courses_df, embeddings_by_id = load_courses_and_embeddings()
+    courses_df, course_ids, course_matrix = load_courses_and_embeddings()
     st.info(f"📊 Находим топ-{top_k} ближайших курсов…")
-    most_similar = utils.get_most_similar(embedding, embeddings_by_id, top_k=top_k)  # [(id, score)]
-    id2score = dict(most_similar)
-    top_ids = [cid for cid, _ in most_similar]
+    top_indices, top_scores = utils.get_most_similar(embedding, course_matrix, top_k=top_k)
+    top_ids = [int(course_ids[i]) for i in top_indices]
+    id2score = dict(zip(top_ids, top_scores))
     st.success(f"✅ Топ-{top_k} найден.")
     with st.container(border=True):
         st.markdown("**Найденные ближайшие курсы (ID → сходство):**")
@@ -72,45 +72,52 @@ def run_matching(url: str, parse_prompt: str, top_k: int = 5):
         .reset_index(drop=True)
     )
 
-    # Шаг 3: проверка пригодности — с поэтапным выводом и досрочной остановкой
+    # Шаг 3: проверка пригодности — все кандидаты проверяются параллельно, результаты выводятся по мере готовности.
+    # Вердикт фиксируется в порядке сходства: первый «Да», перед которым все кандидаты выше получили «Нет».
     st.info("🤖 Проверяем пригодность курсов…")
-    log_box = st.container()  # сюда будем писать результаты по одному
-    processed_rows = []
-    early_stop = False
-
+    log_box = st.container()
+    slots = []
     for i, row in sim_df.iterrows():
-        course_id = row["project_id"]
-        course_name = row["project_name"]
-        course_topics = row["topics"]
-
-        with log_box.expander(f"Проверка #{i+1}: {course_name} (ID {course_id})", expanded=True if i == 0 else False):
-            st.caption(f"Темы курса: {course_topics}")
-            raw_decision, explanation = utils.determine_course_suitability(
-                discipline, topics, course_name, course_topics, client
-            )
-            suitable = to_bool_ru(raw_decision)
-            st.markdown(f"**Решение:** {'✅ Да' if suitable else '❌ Нет'}")
-            st.markdown(f"**Пояснение:** {explanation}")
-
+        slot = log_box.expander(f"Проверка #{i+1}: {row['project_name']} (ID {row['project_id']})", expanded=(i == 0))
+        slot.caption(f"Темы курса: {row['topics']}")
+        slots.append((slot, slot.empty()))
+        slots[-1][1].markdown("⏳ Проверяется…")
+
+    def check(row):
+        return utils.determine_course_suitability(
+            "", discipline, topics, row["project_name"], row["topics"], client)
+
+    results = []
+    for i, result in matching.check_candidates_speculatively([row for _, row in sim_df.iterrows()], check):
+        if isinstance(result, Exception):
+            result = {"answer": "Ошибка", "explanation": str(result)}
+        suitable = to_bool_ru(result.get("answer"))
+        slots[i][1].markdown(f"**Решение:** {'✅ Да' if suitable else '❌ Нет'}\n\n**Пояснение:** {result.get('explanation', '')}")
+        results.append((i, result))
+
+    accepted = matching.committed_rank(results)
+    checked = {i for i, _ in results}
+    for i, (slot, placeholder) in enumerate(slots):
+        if i not in checked:
+            placeholder.markdown("⏭️ Проверка отменена — найден курс выше по сходству.")
+    if accepted is not None:
+        st.success(f"🛑 Найден подходящий курс (#{accepted + 1}) — остальные проверки остановлены.")
+    st.success("✅ Проверка пригодности завершена." if accepted is None else "✅ Проверка завершена досрочно.")
+
+    # Собираем финальный DataFrame только из обработанных строк (в порядке сходства)
+    processed_rows = []
+    for i, result in sorted(results, key=lambda x: x[0]):
+        row = sim_df.iloc[i]
         processed_rows.append(
             {
-                "project_id": course_id,
-                "project_name": course_name,
-                "topics": course_topics,
+                "project_id": row["project_id"],
+                "project_name": row["project_name"],
+                "topics": row["topics"],
                 "similarity": float(row["similarity"]),
-                "Пригоден": bool(suitable),
-                "Пояснение": explanation,
+                "Пригоден": to_bool_ru(result.get("answer")),
+                "Пояснение": result.get("explanation", ""),
             }
         )
-
-        if suitable:
-            st.success("🛑 Найден подходящий курс — останавливаем проверку остальных.")
-            early_stop = True
-            break
-
-    st.success("✅ Проверка пригодности завершена." if not early_stop else "✅ Проверка завершена досрочно.")
-
-    # Собираем финальный DataFrame только из обработанных строк
     out_df = pd.DataFrame(processed_rows)
     out_df = out_df.rename(columns={
         "project_id":   "ID курса",
@@ -119,7 +126,6 @@ def run_matching(url: str, parse_prompt: str, top_k: int = 5):
         "topics":       "Темы курса",
     })
     out_df = out_df[["ID курса", "Название курса", "Темы курса", "Сходство", "Пригоден", "Пояснение"]]
-    # Отсортируем по сходству (на случай досрочной остановки не по первому)
     out_df = out_df.sort_values("Сходство", ascending=False).reset_index(drop=True)
 
     return discipline, topics, out_df
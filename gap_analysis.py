@@ -0,0 +1,24 @@
+"""Find popular disciplines without a matching Urait course, for the whole discipline corpus in one run."""
+#%%
+import src.utils as utils
+import src.gap_analysis as gap_analysis
+import src.discipline_canonicalizer as discipline_canonicalizer
+
+#%%
+disciplines_df, discipline_embeddings = gap_analysis.load_disciplines('data/generated/disciplines_with_embeddings.csv')
+courses_df, course_embeddings = gap_analysis.load_courses('data/generated/courses.csv')
+print(f"{len(disciplines_df)} disciplines x {len(courses_df)} courses")
+
+#%%
+# uncertain pairs are checked by the LLM; verdicts are cached in the .jsonl, so re-running resumes an interrupted run
+client = utils.get_gemini_client()
+coverage_df = gap_analysis.run_gap_analysis(
+    disciplines_df, discipline_embeddings, courses_df, course_embeddings, client,
+    cache_path="data/generated/gap_analysis_checks.jsonl")
+
+#%%
+coverage_df = gap_analysis.rank_by_popularity(coverage_df, canonical_map=discipline_canonicalizer.load_canonical_map())
+coverage_df.to_csv("data/generated/coverage.csv", index=False, sep=';')
+print(coverage_df['status'].value_counts())
+coverage_df[coverage_df['status'] == 'gap'].head(30)
+# %%
@@ -1,20 +1,32 @@
 #%% Imports
 import os
 import logging
+import time
 import pandas as pd
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 import re
 
 import src.pipeline_utils as pipeline_utils
+import src.utils as utils
+import src.metrics as metrics
+import src.scheduler as scheduler
+import src.result_sink as result_sink
 import src.url_utils as url_utils
+import src.discipline_store as discipline_store
+import src.discipline_canonicalizer as discipline_canonicalizer
 
 #%% Config
-OUTPUT_CSV = "data/generated/study_plans_all.csv"
+OUTPUT_DB = "data/generated/study_plans_all.sqlite"  # rows land here as they are produced (src/result_sink.py)
+OUTPUT_CSV = "data/generated/study_plans_all.csv"  # exported from OUTPUT_DB when the run ends
+POPULARITY_DB = "data/generated/disciplines_popularity.sqlite"
+POPULARITY_CSV = "data/generated/disciplines_by_popularity.csv"
+POPULARITY_EXPORT_INTERVAL = 300  # seconds between POPULARITY_CSV refreshes during a run (and once at the end)
 NUM_STUDY_PLANS = 50
-NUM_WORKERS = 4
+NUM_WORKERS = 16  # specialities in flight; concurrent API calls are limited adaptively per service (src/limits.py)
 FLUSH_MIN_ROWS = 5
+PRIORITY_SCORE = "search_count"  # "students", "search_count" or None (file order); see src/scheduler.py
+QUOTA_CALLS = None  # Serper + Gemini generate calls for the run; low-priority specialities are preempted when it runs short
 LOG_FILE = "pipeline_study_plans.log"
 LOG_LEVEL = logging.INFO
 
@@ -49,18 +61,6 @@ def log(msg, level="info", speciality_name=""):
     to_log = f"{msg} | {speciality_name}"
     (logger.error if level == "error" else logger.warning if level == "warning" else logger.info)(to_log)
 
-#%% IO helpers
-def save_rows_to_csv(rows, filename=OUTPUT_CSV):
-    if not rows:
-        return
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    header = not os.path.exists(filename) or os.path.getsize(filename) == 0
-    df = pd.DataFrame(rows, columns=[
-        "speciality_code", "speciality_name", "university",
-        "study_plan_url", "disciplines"
-    ])
-    df.to_csv(filename, index=False, sep=';', mode='a', header=header)
-
 #%% Load and prepare speciality + university pairs
 speciality_df = pd.read_csv("data/download/specialities.csv", sep=';')
 # speciality_df = speciality_df[
@@ -68,12 +68,23 @@ speciality_df = pd.read_csv("data/download/specialities.csv", sep=';')
 # ]
 
 university_df = pd.read_csv("data/generated/universities_cleaned.csv")
+popularity_store = discipline_store.DisciplinePopularityStore(
+    POPULARITY_DB, students_map=discipline_store.students_by_university(university_df),
+    canonical_map=discipline_canonicalizer.load_canonical_map())
 
 #%% Per-row processing
 def process_speciality_row(row):
+    """Study plan rows for one speciality; a preempted speciality keeps the rows collected so far."""
+    local_rows = []
+    try:
+        return _process_speciality_row(row, local_rows)
+    except scheduler.Preempted:
+        log(f"[PREEMPTED] [{row.name}] keeping {len(local_rows)} rows", level="warning", speciality_name=row['speciality_name'])
+        return local_rows
+
+def _process_speciality_row(row, local_rows):
     scode = row['speciality_code']
     sname = row['speciality_name']
-    local_rows = []
 
     idx = row.name
     log(f"[START] [{idx}]", speciality_name=sname)
@@ -139,48 +150,78 @@ def process_speciality_row(row):
     return local_rows
 
 #%% Orchestration
-def run_pipeline(df):
-    rows_buf, total_written = [], 0
+def run_pipeline(df, sink):
+    rows_buf = []
+    last_export = time.monotonic()
+
+    def export_popularity():
+        nonlocal last_export
+        last_export = time.monotonic()
+        try:
+            popularity_store.export_csv(POPULARITY_CSV)
+        except Exception as e:
+            logger.error(f"[POPULARITY-FAIL] Could not export {POPULARITY_CSV}: {e}")
 
     def flush_rows():
-        nonlocal rows_buf, total_written
         if not rows_buf:
             return
+        n = len(rows_buf)
+        sink.write(rows_buf)
+        try:
+            sink.flush()  # write() only queues: commit here so the log reports committed rows
+            logger.info(f"[WRITE] +{n} rows (committed={sink.written})")
+        except Exception as e:
+            logger.error(f"[WRITE-FAIL] Could not commit rows to {OUTPUT_DB}, the sink keeps retrying them: {e}")
         try:
-            n = len(rows_buf)
-            save_rows_to_csv(rows_buf)
-            total_written += n
-            logger.info(f"[WRITE] +{n} rows (cumulative={total_written})")
+            popularity_store.add_study_plan_rows(rows_buf)  # O(new rows)
         except Exception as e:
-            logger.error(f"[WRITE-FAIL] Could not write {len(rows_buf)} rows: {e}")
+            logger.error(f"[POPULARITY-FAIL] Could not apply {n} rows to {POPULARITY_DB}: {e}")
         finally:
             rows_buf.clear()
+        if time.monotonic() - last_export >= POPULARITY_EXPORT_INTERVAL:
+            export_popularity()
+
+    try:
+        deleted = utils.cleanup_document_sessions(utils.get_gemini_client())
+        if deleted:
+            logger.info(f"[CLEANUP] Deleted {deleted} caches/files left by earlier runs' document sessions")
+    except Exception as e:
+        logger.warning(f"[CLEANUP-FAIL] Could not clean up document sessions: {e}")
 
+    stop_metrics = metrics.start_exporter()
     try:
-        with ThreadPoolExecutor(max_workers=NUM_WORKERS) as ex:
-            futures = {
-                ex.submit(process_speciality_row, r): (r['speciality_code'], r['speciality_name'])
-                for _, r in df.iterrows()
-            }
-            for fut in tqdm(as_completed(futures), total=len(futures), desc="Specialities"):
-                scode, sname = futures[fut]  # fixed unpacking (removed 'uni')
-                try:
-                    batch = fut.result()
-                except Exception as e:
-                    log(f"FAIL speciality task: {e}", level="error", speciality_name=sname)
-                    batch = []
-                if batch:
-                    rows_buf.extend(batch)
-                if len(rows_buf) >= FLUSH_MIN_ROWS:
-                    flush_rows()
+        sched = scheduler.PriorityScheduler(NUM_WORKERS, quota=QUOTA_CALLS, log=logger.info)
+        units = scheduler.prioritized_units(df, scheduler.load_score(PRIORITY_SCORE))
+        for (scode, sname), status, result in tqdm(sched.run(units, process_speciality_row), total=len(units), desc="Specialities"):
+            batch = []
+            if status in ("done", "preempted"):
+                batch = result or []  # a preempted speciality returns the rows it had so far
+            elif status == "failed":
+                log(f"FAIL speciality task: {result}", level="error", speciality_name=sname)
+            if status in ("preempted", "skipped"):
+                log(f"[{status.upper()}] quota exhausted", level="warning", speciality_name=sname)
+            if batch:
+                rows_buf.extend(batch)
+            if len(rows_buf) >= FLUSH_MIN_ROWS:
+                flush_rows()
     finally:
         flush_rows()
+        export_popularity()
         logger.info("[DONE] specialities_with_study_plans complete")
+        try:
+            sink.close()
+        finally:
+            try:
+                sink.export_csv(OUTPUT_CSV)  # whatever was committed, even if the last rows failed
+            finally:
+                stop_metrics()
+                print(metrics.summary())
 
 #%% Run
 if __name__ == "__main__":
-    # Clear output file on each run to avoid accidental appends across runs.
-    if os.path.exists(OUTPUT_CSV):
-        os.remove(OUTPUT_CSV)
-    run_pipeline(speciality_df)
+    # Start each run empty; OUTPUT_CSV and POPULARITY_CSV keep the previous run until the exports replace them.
+    sink = result_sink.ResultSink(OUTPUT_DB, "study_plans")
+    sink.clear()
+    popularity_store.clear()
+    run_pipeline(speciality_df, sink)
 
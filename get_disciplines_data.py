@@ -1,23 +1,13 @@
 """Pipeline to extract disciplines and their topics from study plans and work programs."""
 #%%
 import pandas as pd
-import os
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 import src.pipeline_utils as pipeline_utils
-
-def save_rows_to_csv(rows, filename="data/generated/disciplines.csv"):
-    if not rows:
-        return
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    header = not os.path.exists(filename) or os.path.getsize(filename) == 0
-    df = pd.DataFrame(rows, columns=[
-        "speciality_code","speciality_name","study_plan_url",
-        "discipline_name","work_program_url","topics"
-    ])
-    # append; write header only once
-    df.to_csv(filename, index=False, sep=';', mode='a', header=header)
+import src.utils as utils
+import src.metrics as metrics
+import src.scheduler as scheduler
+import src.result_sink as result_sink
 
 num_study_plans = 1
 num_work_programs = 1
@@ -30,9 +20,14 @@ speciality_df # 187 rows
 
 #%%
 # ------------ Config ------------
+OUTPUT_DB = "data/generated/disciplines.sqlite"  # rows land here as they are produced (src/result_sink.py)
+OUTPUT_CSV = "data/generated/disciplines.csv"  # exported from OUTPUT_DB when the run ends
 FLUSH_EVERY_SPECIALITIES = 1
 FLUSH_MIN_ROWS = 100
-NUM_WORKERS = 4
+NUM_WORKERS = 16  # specialities in flight; concurrent API calls are limited adaptively per service (src/limits.py)
+TOPICS_FROM_STUDY_PLAN = True  # take topics from the study plan itself when it has discipline annotations (see pipeline_utils.has_annotations)
+PRIORITY_SCORE = "students"  # process specialities by: "students", "search_count" or None (file order); see src/scheduler.py
+QUOTA_CALLS = None  # Serper + Gemini generate calls for the run; low-priority specialities are preempted when it runs short
 LOG_FILE = "pipeline.log"
 LOG_LEVEL = logging.INFO
 # --------------------------------
@@ -72,120 +67,61 @@ def log(msg, level="info", speciality_code=None, speciality_name=None):
     else:
         logger.info(prefix + msg)
 
-def process_speciality(speciality_code, speciality_name, num_study_plans, num_work_programs):
-    log("START", speciality_code=speciality_code, speciality_name=speciality_name)
-    local_rows = []
-
-    # 1) Study plans
-    try:
-        study_plan_urls = pipeline_utils.get_study_plan_urls(speciality_code, speciality_name)
-    except Exception as e:
-        log(f"FAIL get_study_plan_urls: {e}", level="error",
-            speciality_code=speciality_code, speciality_name=speciality_name)
-        return local_rows
-
-    used_study_plans = 0
-    for study_plan_url in study_plan_urls:
-        if used_study_plans >= num_study_plans:
-            break
-
-        plan_yielded = False
-        try:
-            discipline_names = pipeline_utils.extract_discipline_names(study_plan_url, speciality_name)
-        except Exception as e:
-            log(f"FAIL extract_discipline_names url={study_plan_url}: {e}", level="error",
-                speciality_code=speciality_code, speciality_name=speciality_name)
-            continue
-        if not discipline_names or discipline_names == ['None']:
-            log(f"No relevant disciplines in study_plan url={study_plan_url}",
-                speciality_code=speciality_code, speciality_name=speciality_name)
-            continue
-
-        # 2) For each discipline → work programs (retry-until-success)
-        for discipline_name in discipline_names:
-            used_work_programs = 0
-            try:
-                work_program_urls = pipeline_utils.get_work_program_urls(
-                    discipline_name, speciality_code, speciality_name
-                )
-            except Exception as e:
-                log(f"FAIL get_work_program_urls discipline='{discipline_name}': {e}", level="error",
-                    speciality_code=speciality_code, speciality_name=speciality_name)
-                work_program_urls = []
-
-            for work_program_url in work_program_urls:
-                if used_work_programs >= num_work_programs:
-                    break
-                try:
-                    topics = pipeline_utils.extract_topics(work_program_url, discipline_name)
-                except Exception as e:
-                    log(f"FAIL extract_topics url={work_program_url} discipline='{discipline_name}': {e}", level="error",
-                        speciality_code=speciality_code, speciality_name=speciality_name)
-                    continue
-                if not topics or topics == ['None']:
-                    log(f"No topics url={work_program_url} discipline='{discipline_name}'",
-                        speciality_code=speciality_code, speciality_name=speciality_name)
-                    continue
-
-                local_rows.append({
-                    "speciality_code": speciality_code,
-                    "speciality_name": speciality_name,
-                    "study_plan_url": study_plan_url,
-                    "discipline_name": discipline_name,
-                    "work_program_url": work_program_url,
-                    "topics": "; ".join(topics),
-                })
-                used_work_programs += 1
-                plan_yielded = True  # this study plan succeeded at least once
-
-        if plan_yielded:
-            used_study_plans += 1
-
-    log(f"DONE → {len(local_rows)} rows", speciality_code=speciality_code, speciality_name=speciality_name)
-    return local_rows
-
-def run_pipeline(speciality_df, num_study_plans, num_work_programs, save_rows_to_csv):
-    rows_buf, completed, total_written = [], 0, 0
+def run_pipeline(speciality_df, num_study_plans, num_work_programs, sink):
+    rows_buf, completed = [], 0
 
     def flush_rows():
-        nonlocal rows_buf, total_written
         if not rows_buf:
             return
+        n = len(rows_buf)
+        sink.write(rows_buf)
+        rows_buf.clear()
         try:
-            n = len(rows_buf)
-            save_rows_to_csv(rows_buf)
-            total_written += n
-            logger.info(f"[WRITE] +{n} rows (cumulative={total_written})")
+            sink.flush()  # write() only queues: commit here so the log reports committed rows
+            logger.info(f"[WRITE] +{n} rows (committed={sink.written})")
         except Exception as e:
-            logger.error(f"[WRITE-FAIL] Could not write {len(rows_buf)} rows: {e}")
-        finally:
-            rows_buf.clear()
+            logger.error(f"[WRITE-FAIL] Could not commit rows to {OUTPUT_DB}, the sink keeps retrying them: {e}")
+
+    try:
+        deleted = utils.cleanup_document_sessions(utils.get_gemini_client())
+        if deleted:
+            logger.info(f"[CLEANUP] Deleted {deleted} caches/files left by earlier runs' document sessions")
+    except Exception as e:
+        logger.warning(f"[CLEANUP-FAIL] Could not clean up document sessions: {e}")
 
+    stop_metrics = metrics.start_exporter()
     try:
-        with ThreadPoolExecutor(max_workers=NUM_WORKERS) as ex:
-            futures = {
-                ex.submit(process_speciality, r['speciality_code'], r['speciality_name'],
-                          num_study_plans, num_work_programs): (r['speciality_code'], r['speciality_name'])
-                for _, r in speciality_df.iterrows()
-            }
-            for fut in tqdm(as_completed(futures), total=len(futures), desc="Specialities"):
-                scode, sname = futures[fut]
-                try:
-                    batch = fut.result()
-                except Exception as e:
-                    log(f"FAIL speciality task: {e}", level="error", speciality_code=scode, speciality_name=sname)
-                    batch = []
-                if batch:
-                    rows_buf.extend(batch)
-
-                completed += 1
-                if completed % FLUSH_EVERY_SPECIALITIES == 0 or len(rows_buf) >= FLUSH_MIN_ROWS:
-                    flush_rows()
+        sched = scheduler.PriorityScheduler(NUM_WORKERS, quota=QUOTA_CALLS, log=logger.info)
+        units = scheduler.prioritized_units(speciality_df, scheduler.load_score(PRIORITY_SCORE))
+        process = lambda r: pipeline_utils.process_speciality(r['speciality_code'], r['speciality_name'],
+                                                              num_study_plans, num_work_programs, TOPICS_FROM_STUDY_PLAN)
+        for (scode, sname), status, result in tqdm(sched.run(units, process), total=len(units), desc="Specialities"):
+            batch = []
+            if status in ("done", "preempted"):
+                batch = result or []  # a preempted speciality returns the rows it had so far
+            elif status == "failed":
+                log(f"FAIL speciality task: {result}", level="error", speciality_code=scode, speciality_name=sname)
+            if status in ("preempted", "skipped"):
+                log(f"[{status.upper()}] quota exhausted", level="warning", speciality_code=scode, speciality_name=sname)
+            if batch:
+                rows_buf.extend(batch)
+
+            completed += 1
+            if completed % FLUSH_EVERY_SPECIALITIES == 0 or len(rows_buf) >= FLUSH_MIN_ROWS:
+                flush_rows()
     finally:
         # flush even on crash/KeyboardInterrupt
         flush_rows()
-        logger.info(f"[DONE] All specialities processed. Total rows written: {total_written}")
+        logger.info(f"[DONE] All specialities processed. Total rows written: {sink.written}")
+        try:
+            sink.close()
+        finally:
+            try:
+                sink.export_csv(OUTPUT_CSV)  # whatever was committed, even if the last rows failed
+            finally:
+                stop_metrics()
+                print(metrics.summary())
 
-run_pipeline(speciality_df, num_study_plans, num_work_programs, save_rows_to_csv)
+run_pipeline(speciality_df, num_study_plans, num_work_programs, result_sink.ResultSink(OUTPUT_DB, "disciplines"))
 
 # %%
@@ -13,51 +13,36 @@ print(f"Total discipline occurrences: {total_disciplines}")
 print(f"Unique disciplines (case-insensitive): {num_unique_disciplines}")
 
 #%%
-# Aggregate by discipline
+# Aggregate by discipline in the popularity store. This cell clears it and recounts every study plan under the
+# current canonical names; generate_specialities_with_study_plans.py applies new rows as deltas during a run.
+import src.discipline_store as discipline_store
+import src.discipline_canonicalizer as discipline_canonicalizer
+import src.utils as utils
 university_df = pd.read_csv("data/generated/universities_cleaned.csv")
 df = pd.read_csv("data/generated/study_plans.csv", sep=';')
 
-# explode disciplines, map students from university_df, group & collect
-uamt = pd.to_numeric(university_df['students_amount'], errors='coerce').fillna(0).astype(int)
-m = dict(zip(university_df['name'].astype(str).str.strip(), uamt))
-m.update(dict(zip(university_df['abbreviation'].dropna().astype(str).str.strip(),
-                  uamt[university_df['abbreviation'].notna()])))
-
-w = df.copy()
-w['discipline'] = w['disciplines'].fillna('').str.split(r'\s*[;\.]\s*', regex=True)
-w = w.explode('discipline').drop_duplicates()
-w['discipline'] = w['discipline'].fillna('').str.strip().str.lower()
-w = w[w['discipline'].str.len() > 1]
-w['students_amount'] = w['university'].astype(str).str.strip().map(m).fillna(0).astype(int)
-w.sort_values('students_amount', ascending=False).drop(columns=['disciplines']).to_csv("data/generated/disciplines_all.csv", index=False, sep=';')
-
-g = (w.groupby('discipline', sort=False)
-       .agg(total_students_amount=('students_amount','sum'),
-            speciality_name=('speciality_name', list),
-            speciality_code=('speciality_code', list),
-            university=('university', list),
-            study_plan_urls=('study_plan_url', list))
-       .reset_index())
-
-g['num_speciality_name'] = g['speciality_name'].apply(lambda xs: sum(pd.notna(xs)))
-g['num_university'] = g['university'].apply(lambda xs: sum(pd.notna(xs)))
-for c in ['speciality_name','speciality_code','university','study_plan_urls']:
-    g[c] = g[c].apply(lambda xs: list(dict.fromkeys([v for v in xs if pd.notna(v) and str(v).strip()])))
-g['num_distinct_speciality_name'] = g['speciality_name'].apply(len)
-g['num_distinct_university'] = g['university'].apply(len)
-
-disciplines_grouped_df = g.sort_values('total_students_amount', ascending=False).reset_index(drop=True)
-disciplines_grouped_df
+# collapse near-duplicate names («Мат. анализ», «Математический анализ (часть 1)») onto one canonical name.
+# The map is persisted; the store is rebuilt below, so occurrences are recounted under the current names.
+names = df['disciplines'].apply(discipline_store.split_disciplines).explode().dropna()
+embed_fn = discipline_canonicalizer.make_gemini_embed_fn(
+    utils.get_gemini_client(), cache_path="data/generated/discipline_name_embeddings.npz")
+canonical_map = discipline_canonicalizer.build_canonical_map(names, embed_fn=embed_fn)
+discipline_canonicalizer.save_canonical_map(canonical_map)
+print(f"{len(canonical_map)} discipline names mapped to a canonical name")
+
+popularity_store = discipline_store.DisciplinePopularityStore(
+    "data/generated/disciplines_popularity.sqlite",
+    students_map=discipline_store.students_by_university(university_df),
+    canonical_map=canonical_map)
+popularity_store.clear()  # rebuilt from the current study plans, so plans dropped since the last run do not linger
+popularity_store.add_study_plan_rows(df.to_dict('records'))
+popularity_store.occurrences_dataframe().to_csv("data/generated/disciplines_all.csv", index=False, sep=';')
 
 #%%
 # Add search counts
-query_df = pd.read_csv("data/download/search_queries.csv", usecols=["query","search_count"]).fillna({"query":""})
-query_df['query'] = query_df['query'].astype(str).str.strip().str.lower()
-
-disciplines_grouped_df = disciplines_grouped_df.merge(
-    query_df, left_on='discipline', right_on='query', how='left'
-).drop(columns=['query']).fillna({'search_count': 0}).astype({'search_count': int})
+query_df = pd.read_csv("data/download/search_queries.csv", usecols=["query","search_count"])
+popularity_store.set_search_counts(query_df)
 
+disciplines_grouped_df = popularity_store.export_csv("data/generated/disciplines_by_popularity.csv")
 disciplines_grouped_df.sort_values("search_count", ascending=False)
-disciplines_grouped_df.to_csv("data/generated/disciplines_by_popularity.csv", index=False, sep=';')
 # %%
@@ -0,0 +1,388 @@
+"""Embedded analytics database (SQLite) over the pipeline outputs.
+
+The CSV files are imported once into normalised, indexed tables. List-valued cells (disciplines of a study plan,
+topics of a work program or course) become link tables. After that, questions such as "top uncovered disciplines
+in 09.03.xx weighted by students" are single indexed queries instead of reloading and regrouping CSVs:
+
+    python -m src.analytics_db import                       # (re)build data/generated/analytics.sqlite
+    python -m src.analytics_db top-uncovered "09.03.%" --limit 20
+
+Tables: specialities, universities, study_plans, disciplines, study_plan_disciplines, work_programs, topics,
+work_program_topics, courses, course_topics, matches (gap analysis results), search_counts, and
+discipline_universities (derived at import, the grain of the coverage queries)."""
+import argparse
+import ast
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import src.discipline_store as discipline_store
+import src.discipline_canonicalizer as discipline_canonicalizer
+
+DEFAULT_DB = "data/generated/analytics.sqlite"
+DEFAULT_SOURCES = {
+    "specialities": "data/download/specialities.csv",
+    "universities": "data/generated/universities_cleaned.csv",
+    "study_plans": "data/generated/study_plans_all.csv",
+    "work_programs": "data/generated/disciplines.csv",
+    "courses": "data/generated/courses.csv",
+    "matches": "data/generated/coverage.csv",
+    "search_counts": "data/download/search_queries.csv",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS specialities (
+    id INTEGER PRIMARY KEY, code TEXT, name TEXT NOT NULL, UNIQUE (code, name)
+);
+CREATE INDEX IF NOT EXISTS idx_specialities_code ON specialities (code);
+CREATE INDEX IF NOT EXISTS idx_specialities_name ON specialities (name);
+CREATE TABLE IF NOT EXISTS universities (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, abbreviation TEXT,
+    students_amount INTEGER NOT NULL DEFAULT 0, url TEXT, url_root TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_universities_abbreviation ON universities (abbreviation);
+CREATE INDEX IF NOT EXISTS idx_universities_url_root ON universities (url_root);
+CREATE TABLE IF NOT EXISTS study_plans (
+    id INTEGER PRIMARY KEY, speciality_id INTEGER NOT NULL REFERENCES specialities (id),
+    university_id INTEGER REFERENCES universities (id), url TEXT NOT NULL, UNIQUE (speciality_id, url)
+);
+CREATE INDEX IF NOT EXISTS idx_study_plans_university ON study_plans (university_id);
+CREATE TABLE IF NOT EXISTS disciplines (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS study_plan_disciplines (
+    study_plan_id INTEGER NOT NULL REFERENCES study_plans (id),
+    discipline_id INTEGER NOT NULL REFERENCES disciplines (id),
+    PRIMARY KEY (study_plan_id, discipline_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_study_plan_disciplines_discipline ON study_plan_disciplines (discipline_id, study_plan_id);
+-- derived at import: study plans per (speciality, discipline, university), the grain of the coverage queries
+CREATE TABLE IF NOT EXISTS discipline_universities (
+    speciality_id INTEGER NOT NULL, discipline_id INTEGER NOT NULL, university_id INTEGER,
+    num_study_plans INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_discipline_universities_speciality ON discipline_universities (speciality_id, discipline_id);
+CREATE TABLE IF NOT EXISTS work_programs (
+    id INTEGER PRIMARY KEY, speciality_id INTEGER NOT NULL REFERENCES specialities (id),
+    discipline_id INTEGER NOT NULL REFERENCES disciplines (id), study_plan_url TEXT, url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_work_programs_discipline ON work_programs (discipline_id);
+CREATE INDEX IF NOT EXISTS idx_work_programs_speciality ON work_programs (speciality_id);
+CREATE TABLE IF NOT EXISTS topics (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS work_program_topics (
+    work_program_id INTEGER NOT NULL REFERENCES work_programs (id),
+    topic_id INTEGER NOT NULL REFERENCES topics (id), position INTEGER NOT NULL,
+    PRIMARY KEY (work_program_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_work_program_topics_topic ON work_program_topics (topic_id);
+CREATE TABLE IF NOT EXISTS courses (
+    project_id INTEGER PRIMARY KEY, project_name TEXT, university TEXT
+);
+CREATE TABLE IF NOT EXISTS course_topics (
+    project_id INTEGER NOT NULL REFERENCES courses (project_id),
+    topic_id INTEGER NOT NULL REFERENCES topics (id), position INTEGER NOT NULL,
+    PRIMARY KEY (project_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_course_topics_topic ON course_topics (topic_id);
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY, speciality_id INTEGER REFERENCES specialities (id),
+    discipline_id INTEGER NOT NULL REFERENCES disciplines (id), project_id INTEGER REFERENCES courses (project_id),
+    status TEXT NOT NULL, decided_by TEXT, similarity REAL, explanation TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_matches_discipline ON matches (discipline_id, status);
+CREATE INDEX IF NOT EXISTS idx_matches_speciality ON matches (speciality_id);
+CREATE TABLE IF NOT EXISTS search_counts (
+    query TEXT PRIMARY KEY, search_count INTEGER NOT NULL
+);
+"""
+TABLES = ["discipline_universities", "matches", "course_topics", "courses", "work_program_topics", "work_programs", "topics",
+          "study_plan_disciplines", "disciplines", "study_plans", "universities", "specialities", "search_counts"]
+
+def connect(path=DEFAULT_DB):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    s = str(value).strip()
+    return s if s else None
+
+def split_list_cell(value, separator=";"):
+    """Items of a list-valued cell: 'a; b' (current files) or a stringified Python list (older files)."""
+    s = _clean(value)
+    if s is None:
+        return []
+    if s.startswith("[") and s.endswith("]"):
+        try:
+            return [str(x).strip() for x in ast.literal_eval(s) if _clean(x)]
+        except (ValueError, SyntaxError):
+            pass
+    return [x.strip() for x in s.split(separator) if x.strip()]
+
+class _Ids:
+    """name -> id for a (name UNIQUE) table, inserting unknown names; keeps imports to one lookup per distinct name."""
+
+    def __init__(self, conn, table, column="name"):
+        self.conn, self.table, self.column = conn, table, column
+        self.ids = dict(conn.execute(f"SELECT {column}, id FROM {table}"))
+
+    def __call__(self, name):
+        if name not in self.ids:
+            cur = self.conn.execute(f"INSERT INTO {self.table} ({self.column}) VALUES (?)", (name,))
+            self.ids[name] = cur.lastrowid
+        return self.ids[name]
+
+def _speciality_ids(conn):
+    ids = {(code, name): i for i, code, name in conn.execute("SELECT id, code, name FROM specialities")}
+
+    def get(code, name):
+        key = (_clean(code), _clean(name))
+        if key not in ids:
+            ids[key] = conn.execute("INSERT INTO specialities (code, name) VALUES (?, ?)", key).lastrowid
+        return ids[key]
+    return get
+
+def _column(df, name):
+    return df[name] if name in df.columns else pd.Series([None] * len(df), index=df.index)
+
+def _discipline_name(name, canonical_map):
+    name = name.strip().lower()
+    return canonical_map.get(name, name)
+
+### Importers (DataFrames in the layouts of the CSV files) ###
+def import_specialities(conn, df):
+    get = _speciality_ids(conn)
+    for code, name in zip(df['speciality_code'], df['speciality_name']):
+        if _clean(name):
+            get(code, name)
+
+def import_universities(conn, df):
+    students = pd.to_numeric(df['students_amount'], errors='coerce').fillna(0).astype(int)
+    rows = [(_clean(name), _clean(abbr), int(n), _clean(url), _clean(root))
+            for name, abbr, n, url, root in zip(df['name'], _column(df, 'abbreviation'), students,
+                                                _column(df, 'url'), _column(df, 'url_root'))
+            if _clean(name)]
+    conn.executemany(
+        "INSERT INTO universities (name, abbreviation, students_amount, url, url_root) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (name) DO UPDATE SET abbreviation = excluded.abbreviation, "
+        "students_amount = excluded.students_amount, url = excluded.url, url_root = excluded.url_root", rows)
+
+def _university_ids(conn):
+    """Study plans carry a university name or abbreviation (see discipline_store.students_by_university)."""
+    ids = {}
+    for i, name, abbr in conn.execute("SELECT id, name, abbreviation FROM universities"):
+        if abbr:
+            ids[abbr] = i
+        ids[name] = i
+
+    def get(name):
+        name = _clean(name)
+        if name is None or name == "Unknown":
+            return None
+        if name not in ids:
+            ids[name] = conn.execute("INSERT INTO universities (name) VALUES (?)", (name,)).lastrowid
+        return ids[name]
+    return get
+
+def import_study_plans(conn, df, canonical_map=None):
+    """study_plans_all.csv rows; disciplines are split and normalised like the popularity store does."""
+    canonical_map = canonical_map or {}
+    speciality_id, university_id = _speciality_ids(conn), _university_ids(conn)
+    discipline_id = _Ids(conn, "disciplines")
+    plan_ids = {(sid, url): i for i, sid, url in conn.execute("SELECT id, speciality_id, url FROM study_plans")}
+    links = []
+    for row in df.itertuples(index=False):
+        url = _clean(row.study_plan_url)
+        if url is None:
+            continue
+        sid = speciality_id(row.speciality_code, row.speciality_name)
+        if (sid, url) not in plan_ids:
+            plan_ids[sid, url] = conn.execute("INSERT INTO study_plans (speciality_id, university_id, url) VALUES (?, ?, ?)",
+                                              (sid, university_id(row.university), url)).lastrowid
+        plan_id = plan_ids[sid, url]
+        for name in dict.fromkeys(canonical_map.get(d, d) for d in discipline_store.split_disciplines(row.disciplines)):
+            links.append((plan_id, discipline_id(name)))
+    conn.executemany("INSERT OR IGNORE INTO study_plan_disciplines VALUES (?, ?)", links)
+
+def import_work_programs(conn, df, canonical_map=None):
+    """disciplines.csv rows (one per discipline and work program, with its topics)."""
+    canonical_map = canonical_map or {}
+    speciality_id = _speciality_ids(conn)
+    discipline_id, topic_id = _Ids(conn, "disciplines"), _Ids(conn, "topics")
+    links = []
+    for row in df.itertuples(index=False):
+        name = _clean(row.discipline_name)
+        if name is None:
+            continue
+        cur = conn.execute(
+            "INSERT INTO work_programs (speciality_id, discipline_id, study_plan_url, url) VALUES (?, ?, ?, ?)",
+            (speciality_id(row.speciality_code, row.speciality_name), discipline_id(_discipline_name(name, canonical_map)),
+             _clean(row.study_plan_url), _clean(row.work_program_url)))
+        links.extend((cur.lastrowid, topic_id(t), pos) for pos, t in enumerate(split_list_cell(row.topics)))
+    conn.executemany("INSERT INTO work_program_topics VALUES (?, ?, ?)", links)
+
+def import_courses(conn, df):
+    """courses.csv (utils.aggregate_courses layout: topics joined with ', '); embeddings stay in their own files."""
+    topic_id = _Ids(conn, "topics")
+    conn.executemany("INSERT OR REPLACE INTO courses VALUES (?, ?, ?)",
+                     [(int(pid), _clean(name), _clean(uni)) for pid, name, uni in
+                      zip(df['project_id'], df['project_name'], _column(df, 'university'))])
+    conn.executemany("INSERT OR REPLACE INTO course_topics VALUES (?, ?, ?)",
+                     [(int(pid), topic_id(t), pos) for pid, topics in zip(df['project_id'], df['topics'])
+                      for pos, t in enumerate(split_list_cell(topics, separator=","))])
+
+def import_matches(conn, df, canonical_map=None):
+    """coverage.csv from gap_analysis.run_gap_analysis (one row per speciality and discipline).
+    'unchecked' rows (a suitability check failed) are skipped, so those disciplines do not count as checked."""
+    canonical_map = canonical_map or {}
+    discipline_id = _Ids(conn, "disciplines")
+    specialities = {}
+    for i, name in conn.execute("SELECT id, name FROM specialities ORDER BY id DESC"):
+        specialities[name] = i  # coverage.csv has no code; the first id wins for duplicated names
+    known_courses = {pid for (pid,) in conn.execute("SELECT project_id FROM courses")}
+    rows = []
+    for row in df.itertuples(index=False):
+        name = _clean(row.discipline_name)
+        if name is None or row.status == 'unchecked':
+            continue
+        pid = int(row.project_id) if pd.notna(row.project_id) and int(row.project_id) in known_courses else None
+        rows.append((specialities.get(_clean(row.speciality_name)), discipline_id(_discipline_name(name, canonical_map)),
+                     pid, row.status, _clean(row.decided_by), float(row.similarity), _clean(row.explanation)))
+    conn.executemany("INSERT INTO matches (speciality_id, discipline_id, project_id, status, decided_by, similarity, "
+                     "explanation) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+def import_search_counts(conn, df):
+    q = df[["query", "search_count"]].fillna({"query": "", "search_count": 0})
+    q = q.assign(query=q["query"].astype(str).str.strip().str.lower())
+    q = q.groupby("query", as_index=False)["search_count"].sum()
+    conn.executemany("INSERT OR REPLACE INTO search_counts VALUES (?, ?)", zip(q["query"], q["search_count"].astype(int)))
+
+def import_all(path=DEFAULT_DB, sources=None, canonical_map=None, log=print):
+    """Rebuild the database from the CSV files (missing files are skipped). Returns {table: row count}."""
+    sources = {**DEFAULT_SOURCES, **(sources or {})}
+    if canonical_map is None:
+        canonical_map = discipline_canonicalizer.load_canonical_map()
+    readers = {
+        "specialities": lambda p: import_specialities(conn, pd.read_csv(p, sep=';', dtype=str)),
+        "universities": lambda p: import_universities(conn, pd.read_csv(p)),
+        "study_plans": lambda p: import_study_plans(conn, pd.read_csv(p, sep=';', dtype=str), canonical_map),
+        "work_programs": lambda p: import_work_programs(conn, pd.read_csv(p, sep=';', dtype=str), canonical_map),
+        "courses": lambda p: import_courses(conn, pd.read_csv(p, usecols=lambda c: c != 'embedding')),
+        "matches": lambda p: import_matches(conn, pd.read_csv(p, sep=';'), canonical_map),
+        "search_counts": lambda p: import_search_counts(conn, pd.read_csv(p, usecols=["query", "search_count"])),
+    }
+    conn = connect(path)
+    try:
+        with conn:
+            for table in TABLES:
+                conn.execute(f"DELETE FROM {table}")
+            for name, read in readers.items():  # order matters: specialities/universities/courses are referenced
+                source = sources.get(name)
+                if not source or not os.path.exists(source):
+                    log(f"[IMPORT] {name}: {source} not found, skipped")
+                    continue
+                start = time.perf_counter()
+                read(source)
+                log(f"[IMPORT] {name}: {source} in {time.perf_counter() - start:.1f}s")
+            conn.execute("""
+                INSERT INTO discipline_universities
+                SELECT sp.speciality_id, spd.discipline_id, sp.university_id, COUNT(*)
+                FROM study_plan_disciplines spd JOIN study_plans sp ON sp.id = spd.study_plan_id
+                GROUP BY sp.speciality_id, spd.discipline_id, sp.university_id""")
+        conn.execute("ANALYZE")
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+    finally:
+        conn.close()
+
+### Queries ###
+def top_uncovered_disciplines(conn, code_pattern="%", limit=30, include_unchecked=True):
+    """Disciplines taught in specialities whose code matches code_pattern (SQL LIKE, e.g. '09.03.%') that no Urait
+    course covers, weighted by the students of the distinct universities teaching them.
+    coverage is 'gap' (checked, no course) or 'unchecked' (not in the gap analysis yet; dropped unless include_unchecked)."""
+    return pd.read_sql_query("""
+        WITH selected AS (
+            SELECT x.* FROM specialities s
+            JOIN discipline_universities x ON x.speciality_id = s.id
+            WHERE s.code LIKE :pattern
+        ),
+        per_university AS (
+            SELECT discipline_id, university_id, SUM(num_study_plans) AS num_study_plans
+            FROM selected GROUP BY discipline_id, university_id
+        ),
+        per_discipline AS (
+            SELECT p.discipline_id, COALESCE(SUM(u.students_amount), 0) AS total_students_amount,
+                   COUNT(p.university_id) AS num_universities, SUM(p.num_study_plans) AS num_study_plans
+            FROM per_university p LEFT JOIN universities u ON u.id = p.university_id
+            GROUP BY p.discipline_id
+        ),
+        uncovered AS (
+            SELECT pd.*, EXISTS (SELECT 1 FROM matches m WHERE m.discipline_id = pd.discipline_id) AS checked
+            FROM per_discipline pd
+            WHERE NOT EXISTS (SELECT 1 FROM matches m WHERE m.discipline_id = pd.discipline_id AND m.status = 'covered')
+        ),
+        top AS (
+            SELECT * FROM uncovered WHERE :unchecked OR checked
+            ORDER BY total_students_amount DESC, num_study_plans DESC LIMIT :limit
+        )
+        SELECT d.name AS discipline, t.total_students_amount, t.num_universities,
+               (SELECT COUNT(DISTINCT speciality_id) FROM selected x WHERE x.discipline_id = t.discipline_id) AS num_specialities,
+               t.num_study_plans, COALESCE(q.search_count, 0) AS search_count,
+               CASE WHEN t.checked THEN 'gap' ELSE 'unchecked' END AS coverage
+        FROM top t
+        JOIN disciplines d ON d.id = t.discipline_id
+        LEFT JOIN search_counts q ON q.query = d.name
+        ORDER BY t.total_students_amount DESC, t.num_study_plans DESC, d.name
+    """, conn, params={"pattern": code_pattern, "limit": limit, "unchecked": int(include_unchecked)})
+
+def discipline_topics(conn, discipline):
+    """Topics of a discipline across its work programs, most frequent first."""
+    return pd.read_sql_query("""
+        SELECT t.name AS topic, COUNT(*) AS num_work_programs
+        FROM disciplines d
+        JOIN work_programs wp ON wp.discipline_id = d.id
+        JOIN work_program_topics wpt ON wpt.work_program_id = wp.id
+        JOIN topics t ON t.id = wpt.topic_id
+        WHERE d.name = ?
+        GROUP BY t.id ORDER BY num_work_programs DESC, t.name
+    """, conn, params=(discipline.strip().lower(),))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the analytics database.")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="rebuild the database from the CSV files")
+    for name, source in DEFAULT_SOURCES.items():
+        imp.add_argument(f"--{name.replace('_', '-')}", default=source, metavar="CSV")
+    top = sub.add_parser("top-uncovered", help="top uncovered disciplines by students")
+    top.add_argument("code_pattern", nargs="?", default="%", help="speciality code, SQL LIKE pattern (e.g. '09.03.%%')")
+    top.add_argument("--limit", type=int, default=30)
+    top.add_argument("--checked-only", action="store_true", help="only disciplines the gap analysis has checked")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        counts = import_all(args.db, {name: getattr(args, name) for name in DEFAULT_SOURCES})
+        for table, n in counts.items():
+            print(f"{table:<24} {n}")
+        return
+    conn = connect(args.db)
+    try:
+        start = time.perf_counter()
+        df = top_uncovered_disciplines(conn, args.code_pattern, args.limit, include_unchecked=not args.checked_only)
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(df)
+        print(f"{(time.perf_counter() - start) * 1000:.1f} ms")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
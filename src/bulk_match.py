@@ -0,0 +1,107 @@
+"""Match lists of work program (RPD) URLs against the course catalogue, unattended.
+
+    python -m src.bulk_match urls.txt -o data/generated/matches.jsonl --workers 16 --check
+    cat urls.txt | python -m src.bulk_match - -o matches.jsonl
+
+URLs are read one per line (blank lines and #comments are skipped). Each is parsed, embedded and retrieved with
+`workers` URLs in flight; embeddings of concurrent URLs are batched by MatchingService. With --check the candidates
+also get speculative suitability checks. Every result is appended to the JSON Lines output as soon as it is done,
+so re-running the same command resumes: URLs with a successful record are skipped, failed ones are retried."""
+import argparse
+import json
+import os
+import sys
+import time
+
+from tqdm import tqdm
+
+import src.matching as matching
+import src.matching_service as matching_service
+import src.utils as utils
+
+DEFAULT_WORKERS = 16
+
+def read_urls(lines):
+    """Unique URLs in input order."""
+    urls = (line.strip() for line in lines)
+    return list(dict.fromkeys(u for u in urls if u and not u.startswith("#")))
+
+def load_done(path):
+    """URLs with a successful record in an earlier (possibly interrupted) run's output."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line after a crash
+            if "error" not in record:
+                done.add(record.get("url"))
+    return done
+
+def _open_for_append(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    needs_newline = os.path.exists(path) and os.path.getsize(path) > 0
+    if needs_newline:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    f = open(path, "a", encoding="utf-8")
+    if needs_newline:
+        f.write("\n")  # finish a torn line so the next record starts cleanly
+    return f
+
+def run(urls, output, service, top_k=matching_service.DEFAULT_TOP_K, check=False, progress=True):
+    """Match the URLs not yet done in `output`, appending one JSON line per URL. Returns summary counts."""
+    done = load_done(output)
+    todo = [u for u in urls if u not in done]
+    counts = {"skipped": len(urls) - len(todo), "matched": 0, "accepted": 0, "failed": 0}
+    if not todo:
+        return counts
+    with _open_for_append(output) as f:
+        results = service.match_many([{"url": u} for u in todo], top_k=top_k, check=check)
+        for result in tqdm(results, total=len(todo), desc="RPDs", disable=not progress):
+            record = {"url": todo[result.pop("index")], **result}
+            if "error" in record:
+                counts["failed"] += 1
+            else:
+                counts["matched"] += 1
+                if record.get("accepted") is not None:
+                    counts["accepted"] += 1
+                    record["course"] = record["matches"][record["accepted"]]
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="file with one URL per line, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="JSON Lines output (appended to; enables resume)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="URLs parsed and checked concurrently")
+    parser.add_argument("--top-k", type=int, default=matching_service.DEFAULT_TOP_K)
+    parser.add_argument("--check", action="store_true", help="run suitability checks on the candidates")
+    parser.add_argument("--courses", default=matching.DEFAULT_COURSES_CSV)
+    parser.add_argument("--embeddings", default="course_embeddings/course_embeddings.npz")
+    parser.add_argument("--prefix-dim", type=int, help="two-stage search on this many leading dimensions (e.g. 256)")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        urls = read_urls(sys.stdin)
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            urls = read_urls(f)
+    index = matching.CourseIndex.load(args.courses, args.embeddings, prefix_dim=args.prefix_dim)
+    service = matching_service.MatchingService(index, utils.get_gemini_client(), parse_workers=args.workers)
+    start = time.perf_counter()
+    try:
+        counts = run(urls, args.output, service, top_k=args.top_k, check=args.check)
+    finally:
+        service.close()
+    print(f"{len(urls)} URLs in {time.perf_counter() - start:.0f}s: " + ", ".join(f"{k} {v}" for k, v in counts.items()))
+    return 1 if counts["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
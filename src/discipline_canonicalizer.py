@@ -0,0 +1,233 @@
+"""Collapse near-duplicate discipline names («Математический анализ», «Мат. анализ»,
+«Математический анализ (часть 1)») onto one canonical name.
+
+Candidates are blocked with character n-gram MinHash/LSH (plus a token-prefix key for abbreviations),
+then confirmed with embedding cosine similarity, so no all-pairs comparison is ever made.
+Confirmed pairs are clustered with complete linkage: a name joins a cluster only if it is confirmed similar to every
+member, so a chain A~B~C never merges A and C. The resulting name -> canonical map is persisted and applied with
+a dict lookup."""
+import os
+import re
+import zlib
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+
+import src.metrics as metrics
+
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_NGRAM = 3
+DEFAULT_COSINE_THRESHOLD = 0.9
+DEFAULT_MAX_BUCKET_SIZE = 100
+_MERSENNE_PRIME = (1 << 31) - 1
+
+_PARENS_RE = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+_PART_RE = re.compile(r'\b(?:часть|ч|модуль|раздел)\s*\.?\s*(?:\d+|[ivx]+)\b')
+_TRAILING_NUMBER_RE = re.compile(r'(?:\s+|-)(?:\d+|[ivx]+)\s*$')
+_NON_WORD_RE = re.compile(r'[^\w]+')
+
+def normalize_discipline_name(name):
+    """Cheap normal form: lower-case, ё→е, drop parentheses, «часть N»/trailing part numbers and punctuation."""
+    s = str(name).lower().replace('ё', 'е')
+    s = _PARENS_RE.sub(' ', s)
+    s = _PART_RE.sub(' ', s)
+    s = _NON_WORD_RE.sub(' ', s).replace('_', ' ')
+    s = _TRAILING_NUMBER_RE.sub('', s)
+    return ' '.join(s.split())
+
+def _shingles(key, ngram):
+    padded = f" {key} "
+    return {padded[i:i + ngram] for i in range(max(1, len(padded) - ngram + 1))}
+
+def minhash_signatures(keys, num_perm=DEFAULT_NUM_PERM, ngram=DEFAULT_NGRAM, seed=0, chunk_grams=100_000):
+    """MinHash signatures of character n-gram sets.
+    Each distinct n-gram is hashed once; per-key minima are taken with np.minimum.reduceat over chunks.
+    Returns: np.ndarray of shape (len(keys), num_perm)."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.int64)
+    b = rng.integers(0, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.int64)
+
+    vocab = {}
+    gram_ids, offsets = [], []
+    for key in keys:
+        offsets.append(len(gram_ids))
+        gram_ids.extend(vocab.setdefault(g, len(vocab)) for g in _shingles(key, ngram))
+    gram_ids = np.array(gram_ids, dtype=np.int64)
+    offsets = np.array(offsets + [len(gram_ids)], dtype=np.int64)
+
+    base = np.fromiter((zlib.crc32(g.encode('utf-8')) % _MERSENNE_PRIME for g in vocab), dtype=np.int64, count=len(vocab))
+    permuted = ((a * base[None, :] + b) % _MERSENNE_PRIME).T.astype(np.int32)  # (vocab, num_perm), values < 2**31
+
+    sigs = np.empty((len(keys), num_perm), dtype=np.int32)
+    start = 0
+    while start < len(keys):
+        # take as many keys as fit into chunk_grams n-grams (at least one)
+        stop = max(start + 1, int(np.searchsorted(offsets, offsets[start] + chunk_grams, side='right')) - 1)
+        stop = min(stop, len(keys))
+        lo, hi = offsets[start], offsets[stop]
+        block = permuted[gram_ids[lo:hi]]
+        sigs[start:stop] = np.minimum.reduceat(block, offsets[start:stop] - lo, axis=0)
+        start = stop
+    return sigs
+
+def _pairs_from_groups(groups, max_bucket_size):
+    pairs = set()
+    for members in groups:
+        if len(members) < 2 or len(members) > max_bucket_size:
+            continue
+        members = members.tolist() if hasattr(members, 'tolist') else members
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                pairs.add((members[x], members[y]))
+    return pairs
+
+def lsh_candidate_pairs(signatures, bands=DEFAULT_BANDS, max_bucket_size=DEFAULT_MAX_BUCKET_SIZE):
+    """Index pairs that share at least one LSH band. Oversized buckets (very common n-gram patterns) are skipped."""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    coef = np.random.default_rng(1).integers(1, 2**62, size=rows, dtype=np.int64).astype(np.uint64)
+    pairs = set()
+    for band in range(bands):
+        # hash the band's rows to one uint64 (wrap-around arithmetic), then bucket by equal hashes
+        chunk = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        _, bucket, sizes = np.unique(chunk @ coef, return_inverse=True, return_counts=True)
+        keep = np.flatnonzero((sizes[bucket] >= 2) & (sizes[bucket] <= max_bucket_size))
+        keep = keep[np.argsort(bucket[keep], kind='stable')]
+        bounds = np.flatnonzero(np.diff(bucket[keep])) + 1
+        pairs |= _pairs_from_groups(np.split(keep, bounds) if len(keep) else [], max_bucket_size)
+    return pairs
+
+def abbreviation_candidate_pairs(keys, prefix_len=3, max_bucket_size=DEFAULT_MAX_BUCKET_SIZE):
+    """Index pairs whose tokens share prefixes (e.g. «мат анализ» / «математический анализ»).
+    Catches abbreviations that have too few n-grams in common for MinHash."""
+    buckets = defaultdict(list)
+    for i, key in enumerate(keys):
+        tokens = key.split()
+        if len(tokens) >= 2:
+            buckets[tuple(t[:prefix_len] for t in tokens)].append(i)
+    return _pairs_from_groups(buckets.values(), max_bucket_size)
+
+def complete_linkage_clusters(n, pairs, sims=None):
+    """Cluster ids 0..n-1 from similar pairs, most similar pairs first; two clusters merge only if every
+    cross pair is among `pairs` (complete linkage over the confirmed pairs).
+    Returns: list of cluster ids (a member index) per item."""
+    confirmed = {(min(i, j), max(i, j)) for i, j in pairs}
+    order = sorted(confirmed) if sims is None else [
+        (min(i, j), max(i, j)) for _, (i, j) in sorted(zip(sims, pairs), key=lambda x: (-x[0], x[1]))]
+    cluster = list(range(n))
+    members = {}
+    for i, j in order:
+        ci, cj = cluster[i], cluster[j]
+        if ci == cj:
+            continue
+        mi, mj = members.get(ci, [ci]), members.get(cj, [cj])
+        if all((min(a, b), max(a, b)) in confirmed for a in mi for b in mj):
+            if len(mi) < len(mj):
+                ci, cj, mi, mj = cj, ci, mj, mi
+            for b in mj:
+                cluster[b] = ci
+            members[ci] = mi + mj
+            members.pop(cj, None)
+    return cluster
+
+def build_canonical_map(names, counts=None, embed_fn=None, cosine_threshold=DEFAULT_COSINE_THRESHOLD,
+                        num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS, ngram=DEFAULT_NGRAM, verbose=True):
+    """Cluster discipline names and map each to its cluster's canonical name.
+
+    names: iterable of discipline names (duplicates allowed; they are counted if counts is None)
+    counts: optional dict name -> number of occurrences; the most frequent name of a cluster becomes canonical
+    embed_fn: callable(list of str) -> np.ndarray of L2-normalised rows, used to confirm candidate pairs.
+              Only names that appear in a candidate pair are embedded. If None, candidates are accepted as-is.
+    Clusters are built with complete linkage over the confirmed pairs (see complete_linkage_clusters).
+    Returns: dict name -> canonical name (only for names that differ from their canonical form)."""
+    counts = Counter(counts) if counts is not None else Counter(names)
+    uniq = list(counts)
+    norm = [normalize_discipline_name(n) for n in uniq]
+
+    # 1) identical normal forms are merged directly
+    keys = list(dict.fromkeys(k for k in norm if k))
+    key_idx = {k: i for i, k in enumerate(keys)}
+
+    # 2) blocking: MinHash/LSH on character n-grams + abbreviation prefixes
+    sigs = minhash_signatures(keys, num_perm=num_perm, ngram=ngram)
+    pairs = lsh_candidate_pairs(sigs, bands=bands) | abbreviation_candidate_pairs(keys)
+    if verbose:
+        print(f"{len(uniq)} names -> {len(keys)} normal forms, {len(pairs)} candidate pairs")
+
+    # 3) confirmation with embedding cosine
+    pairs, sims = sorted(pairs), None
+    if pairs and embed_fn is not None:
+        involved = sorted({i for pair in pairs for i in pair})
+        row = {i: r for r, i in enumerate(involved)}
+        vecs = np.asarray(embed_fn([keys[i] for i in involved]), dtype=np.float32)
+        left = np.array([row[i] for i, _ in pairs])
+        right = np.array([row[j] for _, j in pairs])
+        sims = np.einsum('ij,ij->i', vecs[left], vecs[right])
+        keep = sims >= cosine_threshold
+        pairs, sims = [pair for pair, k in zip(pairs, keep) if k], sims[keep].tolist()
+        if verbose:
+            print(f"{len(pairs)} pairs confirmed (cosine >= {cosine_threshold})")
+
+    cluster = complete_linkage_clusters(len(keys), pairs, sims)
+
+    # canonical name: the most frequent original name in the cluster;
+    # ties go to names that are already in normal form, then to longer ones (full over abbreviated)
+    best = {}
+    for name, key in zip(uniq, norm):
+        if not key:
+            continue
+        root = cluster[key_idx[key]]
+        rank = (counts[name], name == key, len(name))
+        if root not in best or rank > best[root][0]:
+            best[root] = (rank, name)
+
+    canonical_map = {}
+    for name, key in zip(uniq, norm):
+        if not key:
+            continue
+        canonical = best[cluster[key_idx[key]]][1]
+        if canonical != name:
+            canonical_map[name] = canonical
+    return canonical_map
+
+def make_gemini_embed_fn(client, cache_path=None, output_dimensionality=768):
+    """embed_fn for build_canonical_map backed by utils.embed_texts, with an optional .npz cache of name embeddings."""
+    import src.utils as utils
+
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as data:
+            cache = dict(zip(data["names"].tolist(), data["embeddings"]))
+
+    def embed_fn(texts):
+        missing = [t for t in dict.fromkeys(texts) if t not in cache]
+        metrics.record_cache("name_embeddings", hit=True, n=len(texts) - len(missing))
+        metrics.record_cache("name_embeddings", hit=False, n=len(missing))
+        if missing:
+            vecs = utils.embed_texts(missing, client, output_dimensionality=output_dimensionality)
+            cache.update(zip(missing, vecs))
+            if cache_path:
+                np.savez_compressed(cache_path, names=np.array(list(cache), dtype=str),
+                                    embeddings=np.vstack(list(cache.values())))
+        return np.vstack([cache[t] for t in texts])
+
+    return embed_fn
+
+def save_canonical_map(canonical_map, path="data/generated/discipline_canonical_map.csv"):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    df = pd.DataFrame(sorted(canonical_map.items()), columns=["name", "canonical_name"])
+    df.to_csv(path, index=False, sep=';')
+
+def load_canonical_map(path="data/generated/discipline_canonical_map.csv"):
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, sep=';', dtype=str, keep_default_na=False)
+    return dict(zip(df["name"], df["canonical_name"]))
+
+def canonicalize(names, canonical_map):
+    """Map a pandas Series (or list) of names through canonical_map; unknown names are returned unchanged."""
+    if isinstance(names, pd.Series):
+        return names.map(lambda n: canonical_map.get(n, n))
+    return [canonical_map.get(n, n) for n in names]
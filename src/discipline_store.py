@@ -0,0 +1,164 @@
+"""Incremental per-discipline popularity counters kept in a local SQLite file.
+
+Study plan rows (speciality_code, speciality_name, university, study_plan_url, disciplines) are applied as deltas,
+so each batch costs O(new rows) and disciplines_by_popularity.csv can be exported at any time while the extraction
+pipeline is still running, instead of re-reading and regrouping the whole study_plans.csv. An export reads the whole
+aggregate, so callers export on an interval or at the end of a run, not per batch."""
+import os
+import re
+import sqlite3
+import threading
+import pandas as pd
+
+# split on ';' and on sentence-like '.', but keep abbreviations such as «Мат. анализ» in one piece
+DISCIPLINE_SPLIT_RE = re.compile(r'\s*(?:;|\.(?!\s*[a-zа-яё]))\s*')
+LIST_FIELDS = ["speciality_name", "speciality_code", "university", "study_plan_urls"]
+POPULARITY_COLUMNS = [
+    "discipline", "total_students_amount", *LIST_FIELDS,
+    "num_speciality_name", "num_university", "num_distinct_speciality_name", "num_distinct_university", "search_count",
+]
+
+def split_disciplines(disciplines):
+    """Split a `disciplines` cell into normalised (lower-cased, stripped) discipline names, dropping 1-char junk."""
+    if disciplines is None or (isinstance(disciplines, float) and pd.isna(disciplines)):
+        return []
+    names = [d.strip().lower() for d in DISCIPLINE_SPLIT_RE.split(str(disciplines))]
+    return [d for d in names if len(d) > 1]
+
+def students_by_university(university_df):
+    """Map university name and abbreviation -> students_amount (same lookup the study plans carry in `university`)."""
+    uamt = pd.to_numeric(university_df['students_amount'], errors='coerce').fillna(0).astype(int)
+    m = dict(zip(university_df['name'].astype(str).str.strip(), uamt))
+    m.update(dict(zip(university_df['abbreviation'].dropna().astype(str).str.strip(),
+                      uamt[university_df['abbreviation'].notna()])))
+    return m
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    s = str(value).strip()
+    return s if s else None
+
+class DisciplinePopularityStore:
+    """Per-discipline counters (total students, distinct universities/specialities, study plan urls) in SQLite.
+
+    Each (discipline, speciality_code, speciality_name, university, study_plan_url) occurrence is counted once,
+    so re-applying rows that were already seen is a no-op."""
+
+    def __init__(self, path="data/generated/disciplines_popularity.sqlite", students_map=None, canonical_map=None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.students_map = students_map or {}
+        self.canonical_map = canonical_map or {}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS occurrences (
+                discipline TEXT NOT NULL,
+                speciality_code TEXT, speciality_name TEXT, university TEXT, study_plan_url TEXT,
+                students_amount INTEGER NOT NULL,
+                UNIQUE (discipline, speciality_code, speciality_name, university, study_plan_url)
+            );
+            CREATE TABLE IF NOT EXISTS discipline_stats (
+                discipline TEXT PRIMARY KEY,
+                total_students_amount INTEGER NOT NULL DEFAULT 0,
+                num_speciality_name INTEGER NOT NULL DEFAULT 0,
+                num_university INTEGER NOT NULL DEFAULT 0,
+                first_seen INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_stats_students ON discipline_stats (total_students_amount DESC);
+            CREATE TABLE IF NOT EXISTS discipline_values (
+                discipline TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL,
+                PRIMARY KEY (discipline, field, value)
+            );
+            CREATE TABLE IF NOT EXISTS search_counts (
+                query TEXT PRIMARY KEY, search_count INTEGER NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def _canonical(self, discipline):
+        return self.canonical_map.get(discipline, discipline)
+
+    def add_study_plan_rows(self, rows):
+        """Apply study plan rows (dicts with speciality_code, speciality_name, university, study_plan_url, disciplines).
+        Cost is proportional to the number of new rows. Returns the number of new discipline occurrences."""
+        added = 0
+        with self._lock, self.conn:
+            cur = self.conn.cursor()
+            for row in rows:
+                scode, sname = _clean(row.get("speciality_code")), _clean(row.get("speciality_name"))
+                uni, url = _clean(row.get("university")), _clean(row.get("study_plan_url"))
+                students = int(self.students_map.get(uni, 0)) if uni else 0
+                for discipline in dict.fromkeys(self._canonical(d) for d in split_disciplines(row.get("disciplines"))):
+                    cur.execute(
+                        "INSERT OR IGNORE INTO occurrences VALUES (?, ?, ?, ?, ?, ?)",
+                        (discipline, scode, sname, uni, url, students))
+                    if cur.rowcount == 0:
+                        continue
+                    added += 1
+                    cur.execute(
+                        "INSERT INTO discipline_stats VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (discipline) DO UPDATE SET "
+                        "total_students_amount = total_students_amount + excluded.total_students_amount, "
+                        "num_speciality_name = num_speciality_name + excluded.num_speciality_name, "
+                        "num_university = num_university + excluded.num_university",
+                        (discipline, students, int(sname is not None), int(uni is not None), cur.lastrowid))
+                    cur.executemany(
+                        "INSERT OR IGNORE INTO discipline_values VALUES (?, ?, ?)",
+                        [(discipline, field, value) for field, value in
+                         zip(LIST_FIELDS, (sname, scode, uni, url)) if value is not None])
+        return added
+
+    def clear(self):
+        """Drop all counted occurrences (a fresh run); search counts are kept."""
+        with self._lock, self.conn:
+            for table in ("occurrences", "discipline_stats", "discipline_values"):
+                self.conn.execute(f"DELETE FROM {table}")
+
+    def set_search_counts(self, query_df):
+        """Replace search counts (columns query, search_count, e.g. data/download/search_queries.csv)."""
+        q = query_df[["query", "search_count"]].fillna({"query": "", "search_count": 0})
+        q = q.assign(query=q["query"].astype(str).str.strip().str.lower()).drop_duplicates("query")
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM search_counts")
+            self.conn.executemany("INSERT INTO search_counts VALUES (?, ?)",
+                                  zip(q["query"], q["search_count"].astype(int)))
+
+    def to_dataframe(self):
+        """Current aggregate in the disciplines_by_popularity.csv layout, most students first."""
+        with self._lock:
+            stats = pd.read_sql_query(
+                "SELECT s.discipline, s.total_students_amount, s.num_speciality_name, s.num_university, "
+                "COALESCE(q.search_count, 0) AS search_count "
+                "FROM discipline_stats s LEFT JOIN search_counts q ON q.query = s.discipline "
+                "ORDER BY s.total_students_amount DESC, s.first_seen", self.conn)
+            values = pd.read_sql_query(
+                "SELECT discipline, field, value FROM discipline_values ORDER BY rowid", self.conn)
+        lists = values.groupby(["discipline", "field"], sort=False)["value"].agg(list).unstack("field")
+        for field in LIST_FIELDS:
+            col = lists[field] if field in lists.columns else pd.Series(dtype=object)
+            stats[field] = stats["discipline"].map(col).apply(lambda xs: xs if isinstance(xs, list) else [])
+        stats["num_distinct_speciality_name"] = stats["speciality_name"].apply(len)
+        stats["num_distinct_university"] = stats["university"].apply(len)
+        return stats[POPULARITY_COLUMNS]
+
+    def occurrences_dataframe(self):
+        """One row per counted discipline occurrence (the disciplines_all.csv layout), most students first."""
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT speciality_code, speciality_name, university, study_plan_url, discipline, students_amount "
+                "FROM occurrences ORDER BY students_amount DESC, rowid", self.conn)
+
+    def export_csv(self, filename="data/generated/disciplines_by_popularity.csv"):
+        """Write the aggregate to CSV atomically (readers never see a half-written file)."""
+        df = self.to_dataframe()
+        tmp = filename + ".tmp"
+        df.to_csv(tmp, index=False, sep=';')
+        os.replace(tmp, filename)
+        return df
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,159 @@
+"""Bulk gap analysis: which disciplines have no suitable Urait course.
+
+Every discipline is matched against the whole catalogue with chunked top-k retrieval. Clear cases are decided
+by similarity alone; only uncertain (discipline, course) pairs go to determine_course_suitability, concurrently.
+LLM verdicts are appended to a JSONL cache as they arrive, so an interrupted run resumes where it stopped."""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+import src.utils as utils
+
+DEFAULT_TOP_K = 5
+DEFAULT_ACCEPT_SIMILARITY = 0.85  # at or above: covered without asking the LLM
+DEFAULT_REJECT_SIMILARITY = 0.65  # below: not a candidate at all
+DEFAULT_NUM_WORKERS = 8
+
+def parse_embedding_column(series):
+    """Stack a column of JSON-encoded embeddings into a float32 matrix with L2-normalised rows."""
+    matrix = np.vstack([np.asarray(json.loads(s), dtype=np.float32) for s in series])
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def load_disciplines(path="data/generated/disciplines_with_embeddings.csv"):
+    df = pd.read_csv(path, sep=';')
+    return df.drop(columns=['embedding']), parse_embedding_column(df['embedding'])
+
+def load_courses(path="data/generated/courses.csv"):
+    df = pd.read_csv(path)
+    return df.drop(columns=['embedding']), parse_embedding_column(df['embedding'])
+
+def _pair_key(discipline_row, project_id):
+    return f"{discipline_row['speciality_name']}|{discipline_row['discipline_name']}|{int(project_id)}"
+
+def _is_verdict(result):
+    """True for a real Да/Нет answer; determine_course_suitability reports parse failures as {"answer": "Ошибка"}."""
+    return isinstance(result, dict) and str(result.get('answer', '')).strip().lower() in ('да', 'нет')
+
+def load_check_cache(path):
+    """LLM verdicts from earlier (possibly interrupted) runs: pair key -> parsed suitability dict.
+    Records without a Да/Нет answer (failed parses from older runs) are skipped, so those pairs are checked again."""
+    cache = {}
+    if not os.path.exists(path):
+        return cache
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line after a crash
+            if _is_verdict(record.get('result')):
+                cache[record['key']] = record['result']
+    return cache
+
+def run_gap_analysis(disciplines_df, discipline_embeddings, courses_df, course_embeddings, client,
+                     cache_path="data/generated/gap_analysis_checks.jsonl", top_k=DEFAULT_TOP_K,
+                     accept_similarity=DEFAULT_ACCEPT_SIMILARITY, reject_similarity=DEFAULT_REJECT_SIMILARITY,
+                     num_workers=DEFAULT_NUM_WORKERS, chunk_size=1024, prefix_dim=None):
+    """Decide coverage for every discipline row.
+    Returns: DataFrame with one row per discipline: status ('covered' | 'gap' | 'unchecked'), decided_by
+    ('similarity' | 'llm', None when unchecked), the matched (or best) course and its similarity, and the LLM
+    explanation when there is one. 'unchecked': no course accepted, and some uncertain pair has no verdict yet
+    (its check failed); such disciplines are checked again on the next run.
+    prefix_dim: shortlist courses on that many leading embedding dimensions and rescore at full dimension
+    (utils.two_stage_top_k); None searches exactly."""
+    if prefix_dim is None:
+        indices, scores = utils.batch_top_k(discipline_embeddings, course_embeddings, top_k=top_k, chunk_size=chunk_size)
+    else:
+        indices, scores = utils.two_stage_top_k(discipline_embeddings, course_embeddings, top_k=top_k,
+                                                prefix_dim=prefix_dim, chunk_size=chunk_size)
+    course_ids = courses_df['project_id'].to_numpy()
+
+    # pairs worth an LLM call: similarity in [reject, accept) for disciplines not already covered by similarity
+    auto_covered = scores[:, 0] >= accept_similarity
+    uncertain = (scores >= reject_similarity) & (scores < accept_similarity) & ~auto_covered[:, None]
+
+    cache = load_check_cache(cache_path)
+    todo = []
+    for i, j in zip(*np.nonzero(uncertain)):
+        key = _pair_key(disciplines_df.iloc[i], course_ids[indices[i, j]])
+        if key not in cache:
+            todo.append((key, i, indices[i, j]))
+    print(f"{int(auto_covered.sum())} disciplines covered by similarity, {int(uncertain.sum())} uncertain pairs, "
+          f"{len(todo)} not in cache")
+
+    lock = threading.Lock()
+
+    def check(key, i, c):
+        d, course = disciplines_df.iloc[i], courses_df.iloc[c]
+        result = utils.determine_course_suitability(
+            d['speciality_name'], d['discipline_name'], d['topics'],
+            course['project_name'], course['topics'], client)
+        return key, result
+
+    if todo:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with open(cache_path, 'a', encoding='utf-8') as f, ThreadPoolExecutor(max_workers=num_workers) as ex:
+            futures = [ex.submit(check, *item) for item in todo]
+            for fut in tqdm(as_completed(futures), total=len(futures), desc="Suitability checks"):
+                try:
+                    key, result = fut.result()
+                except Exception as e:
+                    tqdm.write(f"FAIL suitability check: {e}")
+                    continue
+                if not _is_verdict(result):
+                    tqdm.write(f"FAIL suitability check {key}: {result}")
+                    continue  # not cached: retried on the next run instead of counting as «Нет»
+                with lock:
+                    cache[key] = result
+                    f.write(json.dumps({'key': key, 'result': result}, ensure_ascii=False) + "\n")
+                    f.flush()
+
+    rows = []
+    for i in range(len(disciplines_df)):
+        d = disciplines_df.iloc[i]
+        status, decided_by, match, explanation = 'gap', 'similarity', 0, ""
+        if auto_covered[i]:
+            status = 'covered'
+        else:
+            missing = False
+            for j in np.flatnonzero(uncertain[i]):  # rank order: first accepted is the best-ranked one
+                result = cache.get(_pair_key(d, course_ids[indices[i, j]]))
+                if result is None:
+                    missing = True
+                    continue
+                decided_by = 'llm'
+                if str(result.get('answer', '')).strip().lower() == 'да':
+                    status, match, explanation = 'covered', j, result.get('explanation', "")
+                    break
+            if status == 'gap' and missing:
+                status, decided_by = 'unchecked', None
+        course = courses_df.iloc[indices[i, match]]
+        rows.append({
+            'speciality_name': d['speciality_name'],
+            'discipline_name': d['discipline_name'],
+            'status': status,
+            'decided_by': decided_by,
+            'project_id': course['project_id'],
+            'project_name': course['project_name'],
+            'similarity': float(scores[i, match]),
+            'explanation': explanation,
+        })
+    return pd.DataFrame(rows)
+
+def rank_by_popularity(coverage_df, popularity_path="data/generated/disciplines_by_popularity.csv", canonical_map=None):
+    """Attach total_students_amount from disciplines_by_popularity.csv and sort gaps first, most students first."""
+    popularity = pd.read_csv(popularity_path, sep=';', usecols=['discipline', 'total_students_amount'])
+    canonical_map = canonical_map or {}
+    key = coverage_df['discipline_name'].astype(str).str.strip().str.lower()
+    out = coverage_df.assign(discipline=key.map(lambda n: canonical_map.get(n, n)))
+    out = out.merge(popularity, on='discipline', how='left').fillna({'total_students_amount': 0})
+    out['total_students_amount'] = out['total_students_amount'].astype(int)
+    out['is_gap'] = out['status'] == 'gap'
+    out = out.sort_values(['is_gap', 'total_students_amount'], ascending=[False, False]).drop(columns=['is_gap'])
+    return out.reset_index(drop=True)
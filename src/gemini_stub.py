@@ -0,0 +1,137 @@
+"""In-process stand-in for genai.Client: enough of models/files/caches for the document and embedding helpers
+to run offline (tests, local experiments). Answers come from a user-supplied function."""
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+from google.genai import types
+
+DEFAULT_CACHE_MIN_TOKENS = 1024  # Gemini 2.5 Flash minimum for explicit caches
+CHARS_PER_TOKEN = 4
+
+def _default_respond(prompt, document):
+    return "None"
+
+def _part_data(part):
+    if isinstance(part, str):
+        return part.encode("utf-8")
+    if getattr(part, "inline_data", None) is not None:
+        return part.inline_data.data
+    if getattr(part, "text", None) is not None:
+        return part.text.encode("utf-8")
+    return b""
+
+class _Models:
+    def __init__(self, stub):
+        self.stub = stub
+
+    def count_tokens(self, model, contents, config=None):
+        n = sum(len(self.stub._resolve(part)) for part in contents)
+        return SimpleNamespace(total_tokens=max(1, n // CHARS_PER_TOKEN))
+
+    def generate_content(self, model, contents, config=None):
+        document, prompt = b"", ""
+        for part in contents:
+            if isinstance(part, str):
+                prompt = part
+            else:
+                document += self.stub._resolve(part)
+        cached = getattr(config, "cached_content", None) if config is not None else None
+        if cached:
+            document = self.stub._cache_data(cached) + document
+        with self.stub.lock:
+            self.stub.calls.append({"prompt": prompt, "document_bytes": len(document), "cached_content": cached})
+        answer = self.stub.respond(prompt, document)
+        return SimpleNamespace(text=answer) if isinstance(answer, str) else answer  # full response objects pass through
+
+    def embed_content(self, model, contents, config=None):
+        dim = getattr(config, "output_dimensionality", None) or 768
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        embeddings = []
+        for text in texts:
+            rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+            embeddings.append(SimpleNamespace(values=rng.standard_normal(dim).tolist()))
+        return SimpleNamespace(embeddings=embeddings)
+
+class _Files:
+    def __init__(self, stub):
+        self.stub = stub
+        self.items = {}
+
+    def upload(self, file, config=None):
+        data = file.read() if hasattr(file, "read") else open(file, "rb").read()
+        now = datetime.now(timezone.utc)
+        name = f"files/stub-{next(self.stub.ids)}"
+        f = types.File(name=name, uri=f"stub://{name}", display_name=getattr(config, "display_name", None),
+                       mime_type=getattr(config, "mime_type", None), size_bytes=len(data),
+                       create_time=now, expiration_time=now + timedelta(hours=48))
+        with self.stub.lock:
+            self.items[name] = (f, data)
+        return f
+
+    def get(self, name):
+        return self.items[name][0]
+
+    def list(self, config=None):
+        return [f for f, _ in list(self.items.values())]
+
+    def delete(self, name, config=None):
+        with self.stub.lock:
+            del self.items[name]
+
+class _Caches:
+    def __init__(self, stub):
+        self.stub = stub
+        self.items = {}
+
+    def create(self, model, config):
+        data = b"".join(self.stub._resolve(part) for content in config.contents for part in content.parts)
+        if len(data) // CHARS_PER_TOKEN < self.stub.cache_min_tokens:
+            raise ValueError(f"Cached content is too small: minimum is {self.stub.cache_min_tokens} tokens.")
+        now = datetime.now(timezone.utc)
+        ttl = float(str(config.ttl or "3600s").rstrip("s"))
+        name = f"cachedContents/stub-{next(self.stub.ids)}"
+        cache = types.CachedContent(name=name, display_name=config.display_name, model=model,
+                                    create_time=now, expire_time=now + timedelta(seconds=ttl))
+        with self.stub.lock:
+            self.items[name] = (cache, data)
+        return cache
+
+    def get(self, name):
+        return self.items[name][0]
+
+    def list(self, config=None):
+        return [c for c, _ in list(self.items.values())]
+
+    def delete(self, name, config=None):
+        with self.stub.lock:
+            del self.items[name]
+
+class StubGeminiClient:
+    """respond(prompt, document_bytes) -> answer text (or a full response object). Every generate_content call is recorded in `calls`."""
+
+    def __init__(self, respond=_default_respond, cache_min_tokens=DEFAULT_CACHE_MIN_TOKENS):
+        self.respond = respond
+        self.cache_min_tokens = cache_min_tokens
+        self.calls = []
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.models = _Models(self)
+        self.files = _Files(self)
+        self.caches = _Caches(self)
+
+    def _resolve(self, part):
+        """Bytes behind a content part; file references are looked up among the uploaded files."""
+        file_data = getattr(part, "file_data", None)
+        if file_data is not None:
+            name = file_data.file_uri.removeprefix("stub://")
+            return self.files.items[name][1]
+        return _part_data(part)
+
+    def _cache_data(self, name):
+        cache, data = self.caches.items[name]
+        if cache.expire_time <= datetime.now(timezone.utc):
+            raise ValueError(f"Cached content {name} has expired.")
+        return data
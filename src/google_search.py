@@ -1,9 +1,15 @@
-import requests
 import json
-from dotenv import load_dotenv
 import os
 import time
 
+import src.metrics as metrics
+import src.replay as replay
+import src.limits as limits
+import src.resilience as resilience
+import src.scheduler as scheduler
+
+DEFAULT_RATE_LIMIT = 0.1  # seconds slept before every search
+
 def parse_serper_response(response):
     """
     Parse Serper.dev search API response into a simplified list of results.
@@ -31,9 +37,14 @@ def parse_serper_response(response):
     return results
 
 def _google_search(query):
+    import requests
+    from dotenv import load_dotenv
     load_dotenv()
     api_key = os.getenv("SERPER_API_KEY")
     url = "https://google.serper.dev/search"
+    standin_url = os.getenv("URAIT_STANDIN_URL")  # local stand-in server, see src/standin_server.py
+    if standin_url:
+        url = standin_url.rstrip("/") + "/search"
     payload = json.dumps({
         "q": query,
         "location": "Moscow, Moscow, Russia",
@@ -49,9 +60,24 @@ def _google_search(query):
     response = requests.request("POST", url, headers=headers, data=payload)
     return response
 
-def search(query, rate_limit=0.1):
-    time.sleep(rate_limit)
-    response = _google_search(query)
+def search(query, rate_limit=None):
+    scheduler.checkpoint()  # charges the run's call quota; raises Preempted for preempted low-priority work
+    rate_limit = DEFAULT_RATE_LIMIT if rate_limit is None else rate_limit
+    if rate_limit:
+        time.sleep(rate_limit)
+
+    def attempt():
+        with limits.get_limiter("serper").slot(), metrics.timed("search"):
+            response = replay.call("search", {"q": query}, lambda: _google_search(query),
+                                   replay.encode_search, replay.decode_search)
+            status = getattr(response, "status_code", None)
+            if status == 429 or status in resilience.TRANSIENT_STATUSES:
+                # raised inside the slot, so the limiter sees 429/503 as a rate limit
+                raise resilience.TransientHTTPError(status, "from Serper")
+            return response
+
+    response = resilience.call_with_retries(attempt, "search")
+    metrics.inc("search_responses_total", status=getattr(response, "status_code", "unknown"))
     search_results = parse_serper_response(response)
     return search_results
 
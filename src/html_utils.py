@@ -0,0 +1,139 @@
+"""Fast HTML -> text extraction for study plan / RPD pages.
+
+Scripts, styles, inline SVG, navigation, headers/footers and forms are dropped; tables are kept as compact
+`cell | cell` rows. Uses only the standard library parser, so it is cheap enough to run on every page."""
+import re
+from html.parser import HTMLParser
+
+DROP_TAGS = {
+    "script", "style", "noscript", "svg", "math", "canvas", "iframe", "object", "embed", "template",
+    "nav", "header", "footer", "aside", "form", "button", "select", "menu", "dialog", "head",
+}
+# containers whose role, id or one of whose classes is exactly a site-chrome name; partial matches such as
+# `table-header` or `menu-content` often wrap the programme table itself, and tables are never dropped by hint
+BOILERPLATE_NAMES = {
+    "nav", "navbar", "navigation", "menu", "breadcrumb", "breadcrumbs", "footer", "header", "sidebar",
+    "cookie", "cookies", "banner", "social", "share", "modal", "popup",
+}
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "menu", "menubar", "search"}
+BOILERPLATE_TAGS = {"div", "ul", "ol", "section"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "ul", "ol", "li", "dl", "dt", "dd", "h1", "h2", "h3", "h4", "h5", "h6",
+    "blockquote", "pre", "table", "thead", "tbody", "tfoot", "caption", "br", "hr", "figure", "figcaption", "address",
+}
+DEFAULT_MIN_TEXT_CHARS = 200
+
+def _is_boilerplate(attrs):
+    attrs = {k: (v or "").strip().lower() for k, v in attrs}
+    return (attrs.get("role") in BOILERPLATE_ROLES or attrs.get("id") in BOILERPLATE_NAMES
+            or any(c in BOILERPLATE_NAMES for c in attrs.get("class", "").split()))
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip_stack = []
+        self.lines = []
+        self.current = []
+        self.row = None
+        self.cell = None
+        self.title = []
+        self.in_title = False
+
+    def _flush(self):
+        text = " ".join("".join(self.current).split())
+        if text:
+            self.lines.append(text)
+        self.current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self.in_title = True
+            return
+        if tag in VOID_TAGS:
+            if tag in ("br", "hr") and not self.skip_stack:
+                if self.cell is not None:
+                    self.cell.append(" ")
+                else:
+                    self._flush()
+            return
+        if self.skip_stack or tag in DROP_TAGS or (tag in BOILERPLATE_TAGS and _is_boilerplate(attrs)):
+            self.skip_stack.append(tag)
+            return
+        if tag == "tr":
+            self._flush()
+            self.row = []
+        elif tag in ("td", "th"):
+            self.cell = []
+        elif tag in BLOCK_TAGS and self.cell is None:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+            return
+        if self.skip_stack:
+            if tag in self.skip_stack:
+                # pop up to the matching open tag (tolerates unclosed inner tags)
+                while self.skip_stack and self.skip_stack.pop() != tag:
+                    pass
+            return
+        if tag in ("td", "th") and self.cell is not None:
+            text = " ".join("".join(self.cell).split())
+            if self.row is not None:
+                self.row.append(text)
+            elif text:
+                self.lines.append(text)
+            self.cell = None
+        elif tag == "tr" and self.row is not None:
+            if any(self.row):
+                self.lines.append(" | ".join(self.row))
+            self.row = None
+        elif tag in BLOCK_TAGS and self.cell is None:
+            self._flush()
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title.append(data)
+        elif self.skip_stack:
+            return
+        elif self.cell is not None:
+            self.cell.append(data)
+        else:
+            self.current.append(data)
+
+def html_to_text(html):
+    """Main text of an HTML document (bytes or str), one block per line, tables as `cell | cell` rows."""
+    if isinstance(html, bytes):
+        html = _decode(html)
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    parser._flush()
+    lines = []
+    title = " ".join("".join(parser.title).split())
+    if title:
+        lines.append(title)
+    for line in parser.lines:
+        if not lines or line != lines[-1]:
+            lines.append(line)
+    return "\n".join(lines)
+
+def _decode(data):
+    match = re.search(rb'<meta[^>]+charset=["\']?([\w-]+)', data[:4096], re.I)
+    encodings = [match.group(1).decode("ascii", "ignore")] if match else []
+    for encoding in encodings + ["utf-8", "cp1251"]:
+        try:
+            return data.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return data.decode("utf-8", errors="replace")
+
+def extract_main_text(data, min_chars=DEFAULT_MIN_TEXT_CHARS):
+    """Text payload for an HTML document, or None if too little text survives (e.g. a JS-rendered page),
+    in which case the raw HTML should be sent instead."""
+    try:
+        text = html_to_text(data)
+    except Exception:
+        return None
+    return text if len(text) >= min_chars else None
@@ -0,0 +1,117 @@
+"""Adaptive (AIMD) concurrency limits for the external services.
+
+Each service has a limit on calls in flight. A call that succeeds within the latency target raises the limit
+additively (by `increase` per limit-worth of successes, i.e. about +1 per round trip); a 429/503 cuts it
+multiplicatively, at most once per cooldown so one burst of rejections counts as one congestion signal.
+Slow successes hold the limit where it is. Callers block in acquire while the service is at its limit.
+
+    with limits.get_limiter("gemini_generate").slot():
+        response = client.models.generate_content(...)
+
+The current limit and in-flight count are exported as src.metrics gauges; every cut is logged."""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import src.metrics as metrics
+
+RATE_LIMIT_STATUSES = {429, 503}
+
+# service -> limiter settings; latency_target in seconds
+DEFAULT_LIMITS = {
+    "serper": {"initial": 4, "max_limit": 32, "latency_target": 5.0},
+    "gemini_generate": {"initial": 4, "max_limit": 64, "latency_target": 60.0},
+    "gemini_count_tokens": {"initial": 4, "max_limit": 32, "latency_target": 10.0},
+    "gemini_embed": {"initial": 4, "max_limit": 32, "latency_target": 10.0},
+}
+
+logger = logging.getLogger("pipeline.limits")
+
+def status_code_of(exc):
+    """HTTP status of an API error (genai APIError.code, requests/httpx response status), or None."""
+    for attr in ("code", "status_code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+def is_rate_limited(exc):
+    return status_code_of(exc) in RATE_LIMIT_STATUSES
+
+class AIMDLimiter:
+    def __init__(self, name, initial=4, min_limit=1, max_limit=64, increase=1.0, decrease=0.5,
+                 latency_target=None, cooldown=1.0):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit, self.max_limit = min_limit, max_limit
+        self.increase, self.decrease = increase, decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge("concurrency_limit", round(self.limit, 2), service=self.name)
+        metrics.set_gauge("concurrency_in_flight", self.in_flight, service=self.name)
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+            self._publish()
+
+    def release(self, latency, rate_limited=False, failed=False):
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if rate_limited:
+                metrics.inc("concurrency_rate_limited_total", service=self.name)
+                if now - self.last_decrease >= self.cooldown:
+                    old = self.limit
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self.last_decrease = now
+                    metrics.inc("concurrency_decreases_total", service=self.name)
+                    logger.info(f"[LIMIT] {self.name}: rate limited, concurrency {old:.1f} -> {self.limit:.1f}")
+            elif not failed and (self.latency_target is None or latency <= self.latency_target):
+                self.limit = min(self.max_limit, self.limit + self.increase / max(self.limit, 1.0))
+            self._publish()
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Hold one unit of concurrency for the duration of a call. Exceptions carrying 429/503 count as rate limits;
+        other exceptions (also BaseExceptions such as KeyboardInterrupt or scheduler.Preempted) release the slot
+        without changing the limit."""
+        self.acquire()
+        start = time.monotonic()
+        rate_limited, failed = False, True
+        try:
+            yield
+            failed = False
+        except Exception as e:
+            rate_limited = is_rate_limited(e)
+            raise
+        finally:
+            self.release(time.monotonic() - start, rate_limited=rate_limited, failed=failed)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(service):
+    """Process-wide limiter for a service, created from DEFAULT_LIMITS on first use."""
+    with _limiters_lock:
+        if service not in _limiters:
+            _limiters[service] = AIMDLimiter(service, **DEFAULT_LIMITS.get(service, {}))
+        return _limiters[service]
+
+def configure(service, **settings):
+    """Replace a service's limiter (e.g. a different initial/max limit for a load test)."""
+    with _limiters_lock:
+        _limiters[service] = AIMDLimiter(service, **{**DEFAULT_LIMITS.get(service, {}), **settings})
+        return _limiters[service]
@@ -0,0 +1,115 @@
+"""Course matching helpers shared by the demo and batch tools."""
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+import src.utils as utils
+
+DEFAULT_PARSE_PROMPT = (
+    "Извлеки название дисциплины/курса и названия тем, которые в нём изучаются, "
+    "всё на русском языке. Включай только академические темы, не административные. "
+    "Ответь только названиями, разделёнными запятыми. Название дисциплины/курса должно быть первым."
+)
+DEFAULT_COURSES_CSV = "courses.csv"
+
+def is_suitable(result):
+    """True if a determine_course_suitability result says «Да»."""
+    return str(result.get("answer", "")).strip().lower() in {"да", "yes", "true", "1"}
+
+def check_candidates_speculatively(candidates, check, accept=is_suitable, max_workers=None):
+    """Run check(candidate) for all candidates (best-ranked first) concurrently.
+
+    Yields (rank, result) as checks finish, in completion order. Stops as soon as the verdict is known,
+    i.e. some candidate is accepted and every better-ranked candidate has been rejected. Checks that have not
+    started yet are cancelled, in-flight ones are left to finish in the background and their results are dropped.
+    The committed verdict is the smallest accepted rank among the yielded results (None if nothing was accepted).
+    Failed checks are yielded as (rank, exception) and count as rejections."""
+    candidates = list(candidates)
+    if not candidates:
+        return
+    ex = ThreadPoolExecutor(max_workers=max_workers or len(candidates))
+    futures = {ex.submit(check, c): rank for rank, c in enumerate(candidates)}
+    done_ranks, accepted = set(), set()
+    try:
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in sorted(finished, key=futures.get):
+                rank = futures[fut]
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    result = e
+                done_ranks.add(rank)
+                if not isinstance(result, Exception) and accept(result):
+                    accepted.add(rank)
+                yield rank, result
+            if accepted:
+                best = min(accepted)
+                if all(r in done_ranks for r in range(best)):
+                    return
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+
+def committed_rank(results, accept=is_suitable):
+    """Best-ranked accepted candidate among (rank, result) pairs from check_candidates_speculatively, or None."""
+    accepted = [rank for rank, result in results if not isinstance(result, Exception) and accept(result)]
+    return min(accepted) if accepted else None
+
+def parse_rpd(url, client, prompt=DEFAULT_PARSE_PROMPT):
+    """(discipline, topics) parsed from a work program (RPD) page or PDF."""
+    toks = [s.strip() for s in utils.parse_document(url, prompt, client).split(",") if s.strip()]
+    if not toks:
+        raise ValueError("Parsing returned an empty result.")
+    return toks[0], toks[1:]
+
+def embedding_text(discipline, topics):
+    """The text a discipline is embedded as (the course embeddings use the same «name, topic, ...» form)."""
+    return f"{discipline}, {', '.join(topics)}"
+
+class CourseIndex:
+    """Course catalogue with its embedding matrix (L2-normalised float32 rows aligned with courses_df)."""
+
+    def __init__(self, courses_df, matrix, prefix_dim=None):
+        import numpy as np
+        self.courses_df = courses_df.reset_index(drop=True)
+        self.matrix = np.asarray(matrix, dtype=np.float32)
+        # truncated copy of the matrix for two-stage search (see utils.two_stage_top_k); None searches exactly
+        self.prefix = None if prefix_dim is None else utils.truncate_embeddings(self.matrix, prefix_dim)
+
+    @classmethod
+    def load(cls, courses_csv=DEFAULT_COURSES_CSV, npz_path="course_embeddings/course_embeddings.npz", prefix_dim=None):
+        import numpy as np
+        import pandas as pd
+        embeddings_by_id = utils.load_course_embeddings(npz_path)
+        courses_df = pd.read_csv(courses_csv)
+        courses_df = courses_df[courses_df['project_id'].isin(embeddings_by_id)].drop_duplicates('project_id')
+        matrix = np.vstack([embeddings_by_id[int(pid)] for pid in courses_df['project_id']]).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return cls(courses_df, matrix / norms, prefix_dim=prefix_dim)
+
+    def __len__(self):
+        return len(self.courses_df)
+
+    def top_k(self, queries, top_k):
+        """(indices, scores) of the top_k courses for every row of queries, best first."""
+        if self.prefix is None:
+            return utils.batch_top_k(queries, self.matrix, top_k=top_k)
+        return utils.two_stage_top_k(queries, self.matrix, top_k=top_k, prefix=self.prefix)
+
+    def candidates(self, indices, scores):
+        """Course dicts (project_id, project_name, topics, similarity) for one row of top_k output."""
+        rows = self.courses_df.iloc[indices]
+        return [{"project_id": int(r.project_id), "project_name": r.project_name, "topics": r.topics,
+                 "similarity": float(score)} for r, score in zip(rows.itertuples(index=False), scores)]
+
+def suitability_verdict(discipline, topics, candidates, client, speciality=""):
+    """Speculative suitability checks of the candidates (best first).
+    Returns (accepted rank or None, [(rank, result dict)] of the checks that finished, failures as {"error": ...})."""
+    def check(course):
+        return utils.determine_course_suitability(
+            speciality, discipline, topics, course["project_name"], course["topics"], client)
+
+    results = list(check_candidates_speculatively(candidates, check))
+    accepted = committed_rank(results)
+    return accepted, [(rank, {"error": str(r)} if isinstance(r, Exception) else r) for rank, r in sorted(results, key=lambda x: x[0])]
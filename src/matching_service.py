@@ -0,0 +1,263 @@
+"""HTTP matching service: the course index stays resident and concurrent requests share embedding calls.
+
+    python -m src.matching_service --port 8090
+    curl -N localhost:8090/match -d '{"items": [{"url": "https://.../rpd.pdf"}, {"discipline": "Алгебра", "topics": ["Группы"]}]}'
+
+POST /match takes {"items": [...], "top_k": 5, "check": false}. An item is an RPD {"url": ...} (parsed by Gemini) or
+{"discipline": ..., "topics": [...]}. The response is NDJSON, one line per item as soon as it is done (chunked):
+{"index", "discipline", "topics", "matches": [{project_id, project_name, topics, similarity}]} plus
+"accepted"/"checks" with check=true, or {"index", "error"}.
+GET /health reports the index size and batching counters.
+
+Items from all in-flight requests go through one MicroBatcher: whatever arrives within max_wait seconds (up to
+max_batch_size texts) is embedded in one embed_content call and scored against the catalogue in one matrix multiply."""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import src.matching as matching
+import src.metrics as metrics
+import src.utils as utils
+
+DEFAULT_PORT = 8090
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 50
+DEFAULT_MAX_BATCH_SIZE = utils.EMBED_BATCH_SIZE
+DEFAULT_MAX_WAIT = 0.02  # seconds a batch stays open for more items
+DEFAULT_BATCH_WORKERS = 4  # batches embedded concurrently
+DEFAULT_PARSE_WORKERS = 16  # RPD parses and suitability checks in flight across all requests
+
+class MicroBatcher:
+    """Coalesces submit(item) calls into process_batch(items) -> results (same order) calls.
+    A batch closes after max_wait seconds or at max_batch_size items; up to `workers` batches run concurrently."""
+
+    def __init__(self, process_batch, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT,
+                 workers=DEFAULT_BATCH_WORKERS, name="batch"):
+        self.process_batch = process_batch
+        self.max_batch_size, self.max_wait = max_batch_size, max_wait
+        self.name = name
+        self.pending = []
+        self.condition = threading.Condition()
+        self.closed = False
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-batch")
+        self.thread = threading.Thread(target=self._run, name=f"{name}-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, item):
+        fut = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self.pending.append((item, fut))
+            self.condition.notify()
+        return fut
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed and not self.pending:
+                    return
+                deadline = time.monotonic() + self.max_wait
+                while len(self.pending) < self.max_batch_size and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch, self.pending = self.pending[:self.max_batch_size], self.pending[self.max_batch_size:]
+            metrics.inc("microbatch_batches_total", batcher=self.name)
+            metrics.observe("microbatch_size", len(batch), buckets=(1, 2, 4, 8, 16, 32, 64, 128), batcher=self.name)
+            self.executor.submit(self._process, batch)
+
+    def _process(self, batch):
+        try:
+            results = self.process_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            fut.set_result(result)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        self.executor.shutdown(wait=True)
+
+class MatchingService:
+    def __init__(self, index, client, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT,
+                 batch_workers=DEFAULT_BATCH_WORKERS, parse_workers=DEFAULT_PARSE_WORKERS, parse_prompt=matching.DEFAULT_PARSE_PROMPT):
+        self.index, self.client = index, client
+        self.parse_prompt = parse_prompt
+        self.batcher = MicroBatcher(self._retrieve_batch, max_batch_size, max_wait, batch_workers, name="match")
+        self.workers = ThreadPoolExecutor(max_workers=parse_workers, thread_name_prefix="match-item")
+
+    def _retrieve_batch(self, items):
+        """items: (text, top_k) pairs -> candidate lists; one embedding call and one matrix multiply."""
+        embeddings = utils.embed_texts([text for text, _ in items], self.client)
+        indices, scores = self.index.top_k(embeddings, top_k=max(k for _, k in items))
+        return [self.index.candidates(indices[i, :k], scores[i, :k]) for i, (_, k) in enumerate(items)]
+
+    def retrieve(self, discipline, topics, top_k=DEFAULT_TOP_K):
+        return self.batcher.submit((matching.embedding_text(discipline, topics), top_k)).result()
+
+    @staticmethod
+    def _item_topics(item):
+        if not item.get("discipline"):
+            raise ValueError("An item needs a 'url' or a 'discipline'.")
+        return item["discipline"], [str(t) for t in item.get("topics") or []]
+
+    def match_item(self, item, top_k=DEFAULT_TOP_K, check=False):
+        """One request item -> result dict (see the module docstring)."""
+        if item.get("url"):
+            discipline, topics = matching.parse_rpd(item["url"], self.client, self.parse_prompt)
+        else:
+            discipline, topics = self._item_topics(item)
+        result = {"discipline": discipline, "topics": topics, "matches": self.retrieve(discipline, topics, top_k)}
+        if check:
+            accepted, checks = matching.suitability_verdict(discipline, topics, result["matches"], self.client,
+                                                             speciality=item.get("speciality", ""))
+            result.update(accepted=accepted, checks=[{"rank": rank, **r} for rank, r in checks])
+        return result
+
+    def _submit_item(self, item, top_k, check):
+        """Future of match_item. Topic lists without checks go straight to the batcher and hold no worker thread."""
+        if item.get("url") or check:
+            return self.workers.submit(self.match_item, item, top_k, check)
+        fut = Future()
+        try:
+            discipline, topics = self._item_topics(item)
+            retrieval = self.batcher.submit((matching.embedding_text(discipline, topics), top_k))
+        except Exception as e:
+            fut.set_exception(e)
+            return fut
+
+        def done(f):
+            if f.exception() is not None:
+                fut.set_exception(f.exception())
+            else:
+                fut.set_result({"discipline": discipline, "topics": topics, "matches": f.result()})
+        retrieval.add_done_callback(done)
+        return fut
+
+    def match_many(self, items, top_k=DEFAULT_TOP_K, check=False):
+        """Yield {"index": i, ...} per item in completion order."""
+        futures = {self._submit_item(item, top_k, check): i for i, item in enumerate(items)}
+        for fut in as_completed(futures):
+            try:
+                yield {"index": futures[fut], **fut.result()}
+            except Exception as e:
+                metrics.inc("match_item_errors_total")
+                yield {"index": futures[fut], "error": str(e)}
+
+    def close(self):
+        self.workers.shutdown(wait=False, cancel_futures=True)
+        self.batcher.close()
+
+class MatchingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None  # set by make_server
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send_json(404, {"error": f"Unknown path {self.path}"})
+        snap = metrics.snapshot()
+        self._send_json(200, {
+            "courses": len(self.service.index),
+            "counters": [c for c in snap["counters"] if c["name"].startswith(("microbatch", "match_"))],
+            "histograms": [h for h in snap["histograms"] if h["name"] == "microbatch_size"],
+        })
+
+    def do_POST(self):
+        if self.path != "/match":
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            return self._send_json(404, {"error": f"Unknown path {self.path}"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            items = request.get("items")
+            if items is None:
+                items = [request]  # a single bare item
+            if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+                raise ValueError("'items' must be a list of objects")
+            top_k = max(1, min(MAX_TOP_K, int(request.get("top_k", DEFAULT_TOP_K))))
+            check = bool(request.get("check", False))
+        except (ValueError, TypeError, AttributeError) as e:
+            return self._send_json(400, {"error": str(e)})
+
+        metrics.inc("match_requests_total")
+        metrics.inc("match_items_total", len(items))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for result in self.service.match_many(items, top_k, check):
+                self._write_chunk((json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8"))
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # client went away; its remaining items finish unobserved
+
+class MatchingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; the default 5 resets connections when bulk clients burst
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT):
+    handler = type("ConfiguredMatchingHandler", (MatchingHandler,), {"service": service})
+    server = MatchingServer((host, port), handler)
+    return server
+
+def start_in_thread(service, host="127.0.0.1", port=0):
+    """Serve in a daemon thread (port=0 picks a free port). Returns (server, base_url)."""
+    server = make_server(service, host, port)
+    threading.Thread(target=server.serve_forever, name="matching-service", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Course matching HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--courses", default=matching.DEFAULT_COURSES_CSV)
+    parser.add_argument("--embeddings", default="course_embeddings/course_embeddings.npz")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait", type=float, default=DEFAULT_MAX_WAIT, help="seconds a batch waits for more items")
+    parser.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS)
+    parser.add_argument("--prefix-dim", type=int, help="two-stage search on this many leading dimensions (e.g. 256)")
+    args = parser.parse_args(argv)
+
+    index = matching.CourseIndex.load(args.courses, args.embeddings, prefix_dim=args.prefix_dim)
+    service = MatchingService(index, utils.get_gemini_client(), max_batch_size=args.max_batch_size,
+                              max_wait=args.max_wait, parse_workers=args.parse_workers)
+    server = make_server(service, args.host, args.port)
+    print(f"Matching {len(index)} courses on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    main()
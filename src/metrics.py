@@ -0,0 +1,229 @@
+"""Process-wide pipeline metrics: counters, gauges and latency histograms for search, downloads and Gemini calls.
+
+    with metrics.timed("search"):
+        response = _google_search(query)
+    metrics.record_usage("gemini_generate", response)   # token counters from usage_metadata
+    metrics.record_cache("search", hit=True)
+
+Snapshots can be written as JSON and Prometheus text (start_exporter does it periodically);
+summary() is a short human-readable table printed at the end of a run."""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)  # seconds
+DEFAULT_EXPORT_INTERVAL = 30.0
+DEFAULT_JSON_PATH = "data/generated/metrics.json"
+DEFAULT_PROM_PATH = "data/generated/metrics.prom"
+PREFIX = "urait_"
+
+# usage_metadata field -> token kind label
+USAGE_FIELDS = {
+    "prompt_token_count": "input",
+    "candidates_token_count": "output",
+    "thoughts_token_count": "thinking",
+    "cached_content_token_count": "cached",
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> float
+_gauges = {}      # (name, labels) -> float
+_histograms = {}  # (name, labels) -> {"buckets": [...], "count": int, "sum": float}
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name, value=1, **labels):
+    """Add value to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to its current value (e.g. a concurrency limit)."""
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    """Record one observation in a histogram (cumulative buckets are computed on export)."""
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = {"le": tuple(buckets), "buckets": [0] * (len(buckets) + 1), "count": 0, "sum": 0.0}
+        h["buckets"][bisect.bisect_left(h["le"], value)] += 1
+        h["count"] += 1
+        h["sum"] += value
+
+@contextmanager
+def timed(stage):
+    """Time a call: stage_seconds histogram plus stage_calls_total{status="ok"|"error"}."""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        observe("stage_seconds", time.perf_counter() - start, stage=stage)
+        inc("stage_calls_total", stage=stage, status=status)
+
+def record_usage(stage, response):
+    """Token counters from a Gemini response's usage_metadata (missing fields are skipped)."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for field, kind in USAGE_FIELDS.items():
+        n = getattr(usage, field, None)
+        if n:
+            inc("gemini_tokens_total", n, stage=stage, kind=kind)
+
+def record_cache(cache, hit, n=1):
+    """Count n lookups of a cache as hits or misses."""
+    if n:
+        inc("cache_requests_total", n, cache=cache, result="hit" if hit else "miss")
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+### Export ###
+def _quantile(h, q):
+    """Approximate quantile: upper bound of the bucket holding the q-th observation (inf for the overflow bucket)."""
+    target, seen = q * h["count"], 0
+    for le, n in zip(list(h["le"]) + [float("inf")], h["buckets"]):
+        seen += n
+        if seen >= target and n:
+            return le
+    return float("inf")
+
+def _quantile_label(h, q):
+    value = _quantile(h, q)
+    return "+Inf" if value == float("inf") else value
+
+def snapshot():
+    """Plain-dict copy of all metrics (JSON-serialisable)."""
+    with _lock:
+        counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(_counters.items())]
+        gauges = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(_gauges.items())]
+        histograms = []
+        for (n, l), h in sorted(_histograms.items()):
+            histograms.append({
+                "name": n, "labels": dict(l), "count": h["count"], "sum": h["sum"],
+                "buckets": dict(zip([str(le) for le in h["le"]] + ["+Inf"], h["buckets"])),
+                "p50": _quantile_label(h, 0.5), "p95": _quantile_label(h, 0.95),
+            })
+    return {"timestamp": time.time(), "counters": counters, "gauges": gauges, "histograms": histograms}
+
+def _prom_labels(labels, **extra):
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items.items()) + "}"
+
+def to_prometheus(snap=None):
+    """Prometheus text exposition format."""
+    snap = snap or snapshot()
+    lines, typed = [], set()
+    for c in snap["counters"]:
+        name = PREFIX + c["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_prom_labels(c['labels'])} {c['value']}")
+    for g in snap.get("gauges", []):
+        name = PREFIX + g["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} gauge")
+            typed.add(name)
+        lines.append(f"{name}{_prom_labels(g['labels'])} {g['value']}")
+    for h in snap["histograms"]:
+        name = PREFIX + h["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for le, n in h["buckets"].items():
+            cumulative += n
+            lines.append(f"{name}_bucket{_prom_labels(h['labels'], le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_prom_labels(h['labels'])} {h['sum']}")
+        lines.append(f"{name}_count{_prom_labels(h['labels'])} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def export(json_path=DEFAULT_JSON_PATH, prom_path=DEFAULT_PROM_PATH):
+    snap = snapshot()
+    if json_path:
+        _write_atomic(json_path, json.dumps(snap, ensure_ascii=False, indent=2))
+    if prom_path:
+        _write_atomic(prom_path, to_prometheus(snap))
+
+def start_exporter(interval=DEFAULT_EXPORT_INTERVAL, json_path=DEFAULT_JSON_PATH, prom_path=DEFAULT_PROM_PATH):
+    """Export every `interval` seconds from a daemon thread. Returns stop(); stop() writes a final snapshot."""
+    stop_event = threading.Event()
+
+    def loop():
+        while not stop_event.wait(interval):
+            try:
+                export(json_path, prom_path)
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=loop, name="metrics-exporter", daemon=True)
+    thread.start()
+
+    def stop():
+        stop_event.set()
+        thread.join()
+        export(json_path, prom_path)
+
+    return stop
+
+def summary(snap=None):
+    """Per-stage calls/errors/latency, token usage and cache hit rates as a text table."""
+    snap = snap or snapshot()
+    calls = {}
+    for c in snap["counters"]:
+        if c["name"] == "stage_calls_total":
+            stage_calls = calls.setdefault(c["labels"]["stage"], {"ok": 0, "error": 0})
+            stage_calls[c["labels"]["status"]] += c["value"]
+
+    lines = [f"{'stage':<22}{'calls':>8}{'errors':>8}{'total s':>10}{'mean s':>9}{'p50 s':>8}{'p95 s':>8}"]
+    for h in snap["histograms"]:
+        if h["name"] != "stage_seconds":
+            continue
+        stage = h["labels"]["stage"]
+        c = calls.get(stage, {"ok": 0, "error": 0})
+        mean = h["sum"] / h["count"] if h["count"] else 0.0
+        lines.append(f"{stage:<22}{h['count']:>8}{int(c['error']):>8}{h['sum']:>10.1f}{mean:>9.2f}{h['p50']:>8}{h['p95']:>8}")
+
+    tokens = {}
+    for c in snap["counters"]:
+        if c["name"] == "gemini_tokens_total":
+            tokens.setdefault(c["labels"]["stage"], {})[c["labels"]["kind"]] = int(c["value"])
+    for stage, kinds in sorted(tokens.items()):
+        lines.append(f"tokens {stage}: " + ", ".join(f"{kind}={n:,}" for kind, n in sorted(kinds.items())))
+
+    limits = {g["labels"].get("service"): g["value"] for g in snap.get("gauges", []) if g["name"] == "concurrency_limit"}
+    for service, limit in sorted(limits.items()):
+        lines.append(f"concurrency limit {service}: {limit:.1f}")
+
+    caches = {}
+    for c in snap["counters"]:
+        if c["name"] == "cache_requests_total":
+            caches.setdefault(c["labels"]["cache"], {"hit": 0, "miss": 0})[c["labels"]["result"]] += c["value"]
+    for cache, r in sorted(caches.items()):
+        total = r["hit"] + r["miss"]
+        lines.append(f"cache {cache}: {int(r['hit'])}/{int(total)} hits ({r['hit'] / total:.0%})")
+    return "\n".join(lines)
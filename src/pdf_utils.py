@@ -0,0 +1,107 @@
+"""Local PDF preprocessing: keep only the pages that matter before a document is sent to Gemini.
+
+Study plans and work programs are often 80-300 page PDFs where only the curriculum table or the
+«Содержание дисциплины» section is relevant. Pages are scored by keyword heuristics on their text layer;
+when the text layer is missing or the scores are not convincing the full document is kept."""
+import io
+import re
+
+STUDY_PLAN_KEYWORDS = [
+    "учебный план", "план учебного процесса", "дисциплин", "блок 1", "б1.", "обязательная часть",
+    "часть, формируемая", "элективн", "факультатив", "зачет", "экзамен", "з.е.", "зач. ед", "семестр",
+]
+WORK_PROGRAM_KEYWORDS = [
+    "содержание дисциплины", "содержание разделов", "тематический план", "структура и содержание",
+    "раздел", "тема ", "темы", "лекци", "практическ", "семинар",
+]
+DEFAULT_MIN_SCORE = 6
+DEFAULT_MIN_CHARS_PER_PAGE = 200  # below this on average the PDF is a scan without a text layer
+DEFAULT_MAX_FRACTION = 0.6  # if more pages than this are relevant, pruning is not worth it
+DEFAULT_MIN_PAGES = 5
+EXTRA_TERM_WEIGHT = 5
+
+def extract_page_texts(data):
+    """Text layer of every page (empty strings for pages without one)."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    texts = []
+    for page in reader.pages:
+        try:
+            texts.append(page.extract_text() or "")
+        except Exception:
+            texts.append("")
+    return texts
+
+def score_page(text, keywords, extra_terms=()):
+    """Keyword hits on a page; extra_terms (e.g. the discipline name) weigh EXTRA_TERM_WEIGHT each."""
+    text = re.sub(r'\s+', ' ', text.lower())
+    score = sum(text.count(k) for k in keywords)
+    score += EXTRA_TERM_WEIGHT * sum(text.count(t.lower()) for t in extra_terms if t)
+    return score
+
+def select_pages(texts, keywords, extra_terms=(), neighbours=1, min_score=DEFAULT_MIN_SCORE,
+                 min_chars_per_page=DEFAULT_MIN_CHARS_PER_PAGE, max_fraction=DEFAULT_MAX_FRACTION, min_pages=DEFAULT_MIN_PAGES):
+    """Indices of relevant pages (plus `neighbours` pages around each, so tables split across pages stay whole).
+    Returns None when confidence is low and the whole document should be used instead."""
+    n = len(texts)
+    if n < min_pages:
+        return None
+    if sum(len(t) for t in texts) / n < min_chars_per_page:
+        return None
+    scores = [score_page(t, keywords, extra_terms) for t in texts]
+    if max(scores) < min_score:
+        return None
+    threshold = max(min_score, max(scores) * 0.25)
+    selected = set()
+    for i, score in enumerate(scores):
+        if score >= threshold:
+            selected.update(range(max(0, i - neighbours), min(n, i + neighbours + 1)))
+    if len(selected) > max_fraction * n:
+        return None
+    return sorted(selected)
+
+def prune_pdf(data, keywords, extra_terms=(), as_text=False, **select_kwargs):
+    """Reduce a PDF to its relevant pages.
+    Returns: (payload bytes, mime_type) -- a smaller PDF, or the page texts as text/plain if as_text,
+    or the original bytes as application/pdf when pruning is not confident (or pypdf is unavailable)."""
+    try:
+        texts = extract_page_texts(data)
+        pages = select_pages(texts, keywords, extra_terms, **select_kwargs)
+    except Exception:
+        return data, "application/pdf"
+    if pages is None:
+        return data, "application/pdf"
+
+    if as_text:
+        text = "\n\n".join(f"--- стр. {i + 1} ---\n{texts[i]}" for i in pages)
+        return text.encode("utf-8"), "text/plain"
+
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(io.BytesIO(data))
+    writer = PdfWriter()
+    for i in pages:
+        writer.add_page(reader.pages[i])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue(), "application/pdf"
+
+def split_pdf(data, num_chunks):
+    """Split a PDF into num_chunks contiguous page ranges of (roughly) equal size.
+    Returns: list of (first_page, last_page, pdf bytes), pages 0-based and inclusive."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(io.BytesIO(data))
+    n = len(reader.pages)
+    num_chunks = max(1, min(num_chunks, n))
+    bounds = [round(i * n / num_chunks) for i in range(num_chunks + 1)]
+    chunks = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        writer = PdfWriter()
+        for i in range(start, stop):
+            writer.add_page(reader.pages[i])
+        out = io.BytesIO()
+        writer.write(out)
+        chunks.append((start, stop - 1, out.getvalue()))
+    return chunks
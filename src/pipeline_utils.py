@@ -1,5 +1,10 @@
+import json
+import logging
+
 import src.google_search as google_search
 import src.utils as utils
+import src.pdf_utils as pdf_utils
+import src.scheduler as scheduler
 
 def get_study_plan_urls(speciality_code, speciality_name, university_info=""):
     """Get URLs of study plans for a given speciality"""
@@ -8,9 +13,28 @@ def get_study_plan_urls(speciality_code, speciality_name, university_info=""):
     study_plan_urls = [r.get('url') for r in search_results]
     return study_plan_urls
 
-def extract_discipline_names(study_plan_url, speciality_name):
-    """Parse URL to get discipline names"""
-    prompt = f"""Extract the names of all disciplines that are directly related to '{speciality_name}' and its closely connected applications from this study plan (учебный план). This includes both required and elective courses. 
+DISCIPLINE_TOPICS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "disciplines": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "discipline_name": {"type": "STRING"},
+                    "topics": {"type": "ARRAY", "items": {"type": "STRING"}},
+                },
+                "required": ["discipline_name", "topics"],
+            },
+        },
+    },
+    "required": ["disciplines"],
+}
+ANNOTATIONS_MAX_OUTPUT_TOKENS = 32768  # one call returns topics for every discipline of the programme
+ANNOTATION_MARKERS = ("аннотац", "содержание дисциплины")
+
+def _discipline_names_prompt(speciality_name):
+    return f"""Extract the names of all disciplines that are directly related to '{speciality_name}' and its closely connected applications from this study plan (учебный план). This includes both required and elective courses. 
 
     Do not include:
     - Disciplines that are clearly outside the main subject area (for example, if the subject is history, drop math/physics/programming; if the subject is mathematics, drop languages, law, history, etc.).
@@ -22,10 +46,85 @@ def extract_discipline_names(study_plan_url, speciality_name):
 
     If you cannot find any relevant disciplines (for example, the webpage is clearly not a study plan or is an error webpage), return `None`.
     """
+
+def has_annotations(doc_data, mime_type):
+    """Whether a (pruned) study plan mentions discipline annotations or contents (ANNOTATION_MARKERS)."""
+    if mime_type == "application/pdf":
+        try:
+            text = " ".join(pdf_utils.extract_page_texts(doc_data))
+        except Exception:
+            return False
+    else:
+        text = doc_data.decode("utf-8", errors="replace")
+    text = " ".join(text.lower().split())
+    return any(marker in text for marker in ANNOTATION_MARKERS)
+
+def extract_discipline_names(study_plan_url, speciality_name, with_topics=False):
+    """Parse URL to get discipline names.
+    with_topics: if the study plan has discipline annotations (combined OPOP documents, see has_annotations),
+    also extract each discipline's topics in one structured-output call over the whole document. Returns dict
+    discipline_name -> topics instead, with an empty topic list for disciplines that have no annotation.
+    Plans without annotations, and structured answers that are cut off or not valid JSON, get names only."""
     llm_client = utils.get_gemini_client()
-    parsed = utils.parse_document(study_plan_url, prompt, llm_client)
-    discipline_names = parsed.split(';')
-    return discipline_names
+    doc_data, mime_type = utils.fetch_document(study_plan_url)
+    pruned = utils.reduce_document(doc_data, mime_type, page_keywords=pdf_utils.STUDY_PLAN_KEYWORDS)
+    if with_topics and has_annotations(*pruned):
+        try:
+            return extract_disciplines_with_topics(utils.reduce_document(doc_data, mime_type), speciality_name, llm_client)
+        except (json.JSONDecodeError, utils.TruncatedResponseError) as e:
+            _log(f"Unusable discipline topics answer for url={study_plan_url}, extracting names only: {e}", level="warning")
+    parsed = utils.generate_from_document(*pruned, _discipline_names_prompt(speciality_name), llm_client,
+                                          split_oversized=True)
+    discipline_names = [name.strip() for name in parsed.split(';') if name.strip()]
+    return {name: [] for name in discipline_names} if with_topics else discipline_names
+
+def merge_discipline_topics(texts):
+    """Merge structured (discipline -> topics) answers of document chunks into one JSON answer.
+    Raises json.JSONDecodeError if a chunk's answer is not valid JSON."""
+    merged = {}
+    for text in texts:
+        data = json.loads(text)
+        for d in data.get("disciplines", []) if isinstance(data, dict) else []:
+            name = d.get("discipline_name", "").strip()
+            if not name:
+                continue
+            _, topics = merged.setdefault(name.lower(), (name, {}))
+            for topic in d.get("topics", []):
+                topics.setdefault(topic.strip().lower(), topic.strip())
+    return json.dumps({"disciplines": [{"discipline_name": name, "topics": list(topics.values())}
+                                       for name, topics in merged.values()]}, ensure_ascii=False)
+
+def extract_disciplines_with_topics(document, speciality_name, llm_client=None):
+    """One-pass variant of extract_discipline_names for documents (bytes, mime_type) with discipline annotations.
+    Returns: dict discipline_name -> list of topics (empty if the document has no annotation for it).
+    Raises utils.TruncatedResponseError or json.JSONDecodeError if the answer is cut off or malformed."""
+    prompt = f"""This document is a study plan (учебный план) or an educational programme (образовательная программа) for '{speciality_name}'.
+    Extract the names of all disciplines that are directly related to '{speciality_name}' and its closely connected applications. This includes both required and elective courses.
+
+    Do not include:
+    - Disciplines that are clearly outside the main subject area (for example, if the subject is history, drop math/physics/programming; if the subject is mathematics, drop languages, law, history, etc.).
+    - Disciplines that are purely administrative or non-academic in nature, e.g. 'Научно-исследовательская работа'
+    - Seminars, labs, practicals, internships, and other non-lecture courses.
+    - Broad categories or headings, e.g. 'Математика' or 'Физика'
+
+    If the document contains annotations or contents of the disciplines (аннотации дисциплин, содержание дисциплины), list the academic topics of each discipline, in Russian, not administrative ones. Only take topics from the document; if a discipline has no annotation, return an empty list of topics for it.
+
+    Discipline names and topics must be in Russian. If the document is clearly not a study plan (for example, an error webpage), return an empty list of disciplines.
+    """
+    llm_client = llm_client or utils.get_gemini_client()
+    text = utils.generate_from_document(*document, prompt, llm_client, response_schema=DISCIPLINE_TOPICS_SCHEMA,
+                                        max_output_tokens=ANNOTATIONS_MAX_OUTPUT_TOKENS, split_oversized=True,
+                                        merge=merge_discipline_topics)
+    parsed = json.loads(text)
+    if not isinstance(parsed, dict):
+        raise json.JSONDecodeError("expected a JSON object", text, 0)
+    disciplines = {}
+    for d in parsed.get("disciplines", []):
+        name = d.get("discipline_name", "").strip()
+        if name:
+            topics = [t.strip() for t in d.get("topics", []) if t.strip() and t.strip().lower() != "none"]
+            disciplines.setdefault(name, topics)
+    return disciplines
 
 def get_work_program_urls(discipline_name, speciality_code, speciality_name, university_info=""):
     """Get URLs of work programs"""
@@ -34,13 +133,176 @@ def get_work_program_urls(discipline_name, speciality_code, speciality_name, uni
     work_program_urls = [r.get('url') for r in search_results]
     return work_program_urls
 
-def extract_topics(work_program_url, discipline_name):
-    """Parse the work program to get topics"""
-    prompt = f"""Extract all the topics covered in course {discipline_name}, all in Russian. Only include academic topics, not administrative. 
+def _topics_prompt(discipline_name):
+    return f"""Extract all the topics covered in course {discipline_name}, all in Russian. Only include academic topics, not administrative. 
     Respond only with the names of topics, separated by semicolon `;`.
     If you cannot find any academic topics, return `None`."""
 
+def extract_topics(work_program_url, discipline_name):
+    """Parse the work program to get topics"""
+    prompt = _topics_prompt(discipline_name)
     llm_client = utils.get_gemini_client()
-    parsed = utils.parse_document(work_program_url, prompt, llm_client)
+    parsed = utils.parse_document(work_program_url, prompt, llm_client,
+                                  page_keywords=pdf_utils.WORK_PROGRAM_KEYWORDS, page_terms=(discipline_name,),
+                                  split_oversized=True)
     topics = parsed.split('; ')
-    return topics
\ No newline at end of file
+    return topics
+
+def extract_topics_many(work_program_url, discipline_names, llm_client=None):
+    """Parse one work program (e.g. a consolidated collection of РПД) for several disciplines.
+    The document is uploaded once and queried concurrently (see utils.DocumentSession).
+    Returns: dict discipline_name -> list of topics, or the exception raised for that discipline."""
+    discipline_names = list(dict.fromkeys(discipline_names))
+    llm_client = llm_client or utils.get_gemini_client()
+    with utils.DocumentSession(work_program_url, llm_client, page_keywords=pdf_utils.WORK_PROGRAM_KEYWORDS,
+                               page_terms=tuple(discipline_names)) as session:
+        answers = session.generate_many([_topics_prompt(name) for name in discipline_names], return_exceptions=True)
+    return {name: answer if isinstance(answer, Exception) else answer.split('; ')
+            for name, answer in zip(discipline_names, answers)}
+
+### Per-speciality pipeline (used by get_disciplines_data.run_pipeline) ###
+logger = logging.getLogger("pipeline")
+
+def _log(msg, level="info", speciality_code=None, speciality_name=None):
+    prefix = f"[{speciality_code} {speciality_name}] " if speciality_code and speciality_name else ""
+    if level == "error":
+        logger.error(prefix + msg)
+    elif level == "warning":
+        logger.warning(prefix + msg)
+    else:
+        logger.info(prefix + msg)
+
+def prefetch_shared_work_programs(work_program_urls_by_discipline, speciality_code, speciality_name):
+    """Consolidated work programs: when the top search result is the same URL for several disciplines,
+    upload it once and extract topics for all of them together.
+    Returns: dict (work_program_url, discipline_name) -> topics (or the exception for that discipline)."""
+    by_url = {}
+    for discipline_name, urls in work_program_urls_by_discipline.items():
+        if urls:
+            by_url.setdefault(urls[0], []).append(discipline_name)
+
+    prefetched = {}
+    for url, names in by_url.items():
+        if len(names) < 2:
+            continue
+        try:
+            topics_by_name = extract_topics_many(url, names)
+        except Exception as e:
+            _log(f"FAIL extract_topics_many url={url} ({len(names)} disciplines): {e}", level="warning",
+                 speciality_code=speciality_code, speciality_name=speciality_name)
+            continue  # fall back to one extract_topics call per discipline
+        prefetched.update({(url, name): topics for name, topics in topics_by_name.items()})
+    return prefetched
+
+def process_speciality(speciality_code, speciality_name, num_study_plans, num_work_programs, topics_from_study_plan=False):
+    """Rows (one per discipline with topics) for one speciality.
+    If the scheduler preempts the speciality, the rows collected so far are returned instead of being lost."""
+    local_rows = []
+    try:
+        return _process_speciality(speciality_code, speciality_name, num_study_plans, num_work_programs,
+                                   topics_from_study_plan, local_rows)
+    except scheduler.Preempted:
+        _log(f"PREEMPTED, keeping {len(local_rows)} rows", level="warning",
+             speciality_code=speciality_code, speciality_name=speciality_name)
+        return local_rows
+
+def _process_speciality(speciality_code, speciality_name, num_study_plans, num_work_programs, topics_from_study_plan, local_rows):
+    _log("START", speciality_code=speciality_code, speciality_name=speciality_name)
+
+    # 1) Study plans
+    try:
+        study_plan_urls = get_study_plan_urls(speciality_code, speciality_name)
+    except Exception as e:
+        _log(f"FAIL get_study_plan_urls: {e}", level="error",
+             speciality_code=speciality_code, speciality_name=speciality_name)
+        return local_rows
+
+    used_study_plans = 0
+    for study_plan_url in study_plan_urls:
+        if used_study_plans >= num_study_plans:
+            break
+
+        plan_yielded = False
+        annotated = {}
+        try:
+            if topics_from_study_plan:
+                topics_by_discipline = extract_discipline_names(study_plan_url, speciality_name, with_topics=True)
+                discipline_names = list(topics_by_discipline)
+                annotated = {name: topics for name, topics in topics_by_discipline.items() if topics}
+            else:
+                discipline_names = extract_discipline_names(study_plan_url, speciality_name)
+        except Exception as e:
+            _log(f"FAIL extract_discipline_names url={study_plan_url}: {e}", level="error",
+                 speciality_code=speciality_code, speciality_name=speciality_name)
+            continue
+        if not discipline_names or discipline_names == ['None']:
+            _log(f"No relevant disciplines in study_plan url={study_plan_url}",
+                 speciality_code=speciality_code, speciality_name=speciality_name)
+            continue
+
+        # annotated disciplines already have topics: the study plan is their work program
+        for discipline_name, topics in annotated.items():
+            local_rows.append({
+                "speciality_code": speciality_code,
+                "speciality_name": speciality_name,
+                "study_plan_url": study_plan_url,
+                "discipline_name": discipline_name,
+                "work_program_url": study_plan_url,
+                "topics": "; ".join(topics),
+            })
+            plan_yielded = True
+        if annotated:
+            _log(f"{len(annotated)}/{len(discipline_names)} disciplines annotated in study_plan url={study_plan_url}",
+                 speciality_code=speciality_code, speciality_name=speciality_name)
+        discipline_names = [name for name in discipline_names if name not in annotated]
+
+        # 2) For each discipline → work program URLs
+        work_program_urls_by_discipline = {}
+        for discipline_name in discipline_names:
+            try:
+                work_program_urls_by_discipline[discipline_name] = get_work_program_urls(
+                    discipline_name, speciality_code, speciality_name
+                )
+            except Exception as e:
+                _log(f"FAIL get_work_program_urls discipline='{discipline_name}': {e}", level="error",
+                     speciality_code=speciality_code, speciality_name=speciality_name)
+                work_program_urls_by_discipline[discipline_name] = []
+        prefetched = prefetch_shared_work_programs(work_program_urls_by_discipline, speciality_code, speciality_name)
+
+        # 3) For each discipline → topics (retry-until-success)
+        for discipline_name in discipline_names:
+            used_work_programs = 0
+            for work_program_url in work_program_urls_by_discipline[discipline_name]:
+                if used_work_programs >= num_work_programs:
+                    break
+                try:
+                    topics = prefetched.get((work_program_url, discipline_name))
+                    if isinstance(topics, Exception):
+                        raise topics
+                    if topics is None:
+                        topics = extract_topics(work_program_url, discipline_name)
+                except Exception as e:
+                    _log(f"FAIL extract_topics url={work_program_url} discipline='{discipline_name}': {e}", level="error",
+                         speciality_code=speciality_code, speciality_name=speciality_name)
+                    continue
+                if not topics or topics == ['None']:
+                    _log(f"No topics url={work_program_url} discipline='{discipline_name}'",
+                         speciality_code=speciality_code, speciality_name=speciality_name)
+                    continue
+
+                local_rows.append({
+                    "speciality_code": speciality_code,
+                    "speciality_name": speciality_name,
+                    "study_plan_url": study_plan_url,
+                    "discipline_name": discipline_name,
+                    "work_program_url": work_program_url,
+                    "topics": "; ".join(topics),
+                })
+                used_work_programs += 1
+                plan_yielded = True  # this study plan succeeded at least once
+
+        if plan_yielded:
+            used_study_plans += 1
+
+    _log(f"DONE → {len(local_rows)} rows", speciality_code=speciality_code, speciality_name=speciality_name)
+    return local_rows
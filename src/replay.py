@@ -0,0 +1,249 @@
+"""Offline record/replay of everything that needs the network: Serper searches, document downloads and Gemini calls.
+
+Mode is taken from the environment (or set with configure()):
+    URAIT_REPLAY_MODE=record   live calls, request/response pairs are appended to the fixture store
+    URAIT_REPLAY_MODE=replay   no network at all; responses come from the store (missing ones raise FixtureMissing)
+    URAIT_REPLAY_DIR           fixture store directory (default data/fixtures)
+    URAIT_REPLAY_LATENCY       injected latency per service in replay, e.g.
+                               "search=lognormal:0.8:0.4;fetch=recorded;gemini_generate=const:2"
+
+Services: search, fetch, gemini_count_tokens, gemini_generate, gemini_embed, gemini_cache_create.
+Latency specs: const:<s>, uniform:<lo>:<hi>, lognormal:<median s>:<sigma>,
+recorded (the duration measured while recording).
+
+The store is fixtures.jsonl (one record per request key, last one wins) plus blobs/ for document bytes.
+Requests are keyed by a hash of their canonical JSON; document bytes, uploaded files and context caches are keyed
+by content digest, so a replayed DocumentSession matches its recording even though file/cache names differ."""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from src.limits import status_code_of
+
+MODES = ("off", "record", "replay")
+DEFAULT_FIXTURE_DIR = "data/fixtures"
+
+class FixtureMissing(LookupError):
+    """No recorded response for a request in replay mode."""
+
+class ReplayedError(Exception):
+    """A call that failed while recording; raised again on replay (ValueErrors are re-raised as ValueError).
+    Carries the recorded HTTP status, so resilience.classify retries a replayed 429/503 like the original."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class ReplayedConnectionError(ReplayedError, ConnectionError):
+    """A recorded timeout or connection error (transient without an HTTP status)."""
+
+### Configuration ###
+_lock = threading.Lock()
+_state = {"mode": None, "dir": None, "latency": {}, "index": None}
+_aliases = {}  # uploaded file uri / cache name -> digest of the document behind it
+
+def parse_latency(spec):
+    """'search=lognormal:0.8:0.4;fetch=recorded' -> {service: spec string}."""
+    latency = {}
+    for item in filter(None, (s.strip() for s in (spec or "").split(";"))):
+        service, _, dist = item.partition("=")
+        latency[service.strip()] = dist.strip()
+    return latency
+
+def configure(mode=None, fixture_dir=None, latency=None):
+    """Set mode/fixture dir/latency explicitly; anything left None is read from the environment."""
+    mode = mode or os.getenv("URAIT_REPLAY_MODE", "off")
+    if mode not in MODES:
+        raise ValueError(f"Unknown replay mode {mode!r}, expected one of {MODES}.")
+    with _lock:
+        _state["mode"] = mode
+        _state["dir"] = fixture_dir or os.getenv("URAIT_REPLAY_DIR", DEFAULT_FIXTURE_DIR)
+        if latency is None:
+            latency = os.getenv("URAIT_REPLAY_LATENCY", "")
+        _state["latency"] = parse_latency(latency) if isinstance(latency, str) else dict(latency)
+        _state["index"] = None
+
+def mode():
+    if _state["mode"] is None:
+        configure()
+    return _state["mode"]
+
+def _load_index():
+    if _state["index"] is None:
+        index = {}
+        path = os.path.join(_state["dir"], "fixtures.jsonl")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line after a crash
+                    index[record["key"]] = record
+        _state["index"] = index
+    return _state["index"]
+
+### Canonical request keys ###
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def alias(name, data_digest):
+    """Tell the key function that a file uri / cache name stands for the document with this digest."""
+    with _lock:
+        _aliases[name] = data_digest
+
+def _canonical(obj):
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return _aliases.get(obj, obj) if isinstance(obj, str) else obj
+    if isinstance(obj, bytes):
+        return {"sha256": digest(obj)}
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items()) if v is not None}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    if hasattr(obj, "model_dump"):  # genai pydantic types (Part, GenerateContentConfig, ...)
+        return _canonical(obj.model_dump(exclude_none=True))
+    return repr(obj)
+
+def request_key(service, request):
+    payload = json.dumps({"service": service, "request": _canonical(request)}, sort_keys=True, ensure_ascii=False)
+    return digest(payload.encode("utf-8"))
+
+### Latency injection ###
+def sample_latency(spec, recorded=0.0):
+    kind, *args = spec.split(":")
+    args = [float(a) for a in args]
+    if kind == "const":
+        return args[0]
+    if kind == "uniform":
+        return random.uniform(args[0], args[1])
+    if kind == "lognormal":
+        median, sigma = args
+        return random.lognormvariate(0.0, sigma) * median
+    if kind == "recorded":
+        return recorded
+    raise ValueError(f"Unknown latency distribution {spec!r}.")
+
+### Record / replay ###
+def _store(record, blob=None):
+    os.makedirs(os.path.join(_state["dir"], "blobs"), exist_ok=True)
+    if blob is not None:
+        blob_path = os.path.join(_state["dir"], "blobs", record["response"]["blob"])
+        if not os.path.exists(blob_path):
+            with open(blob_path + ".tmp", "wb") as f:
+                f.write(blob)
+            os.replace(blob_path + ".tmp", blob_path)
+    with _lock:
+        with open(os.path.join(_state["dir"], "fixtures.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        _load_index()[record["key"]] = record
+
+def call(service, request, live, encode, decode):
+    """Run live() according to the current mode.
+    encode(result) -> (JSON-serialisable response, blob bytes or None); decode(response, blob) -> result."""
+    current = mode()
+    if current == "off":
+        return live()
+
+    key = request_key(service, request)
+    if current == "record":
+        start = time.perf_counter()
+        try:
+            result = live()
+        except Exception as e:
+            import src.resilience as resilience
+            _store({"key": key, "service": service, "elapsed": time.perf_counter() - start,
+                    "error": {"type": type(e).__name__, "message": str(e), "status": status_code_of(e),
+                              "kind": resilience.classify(e)}})
+            raise
+        response, blob = encode(result)
+        if blob is not None:
+            response = {**response, "blob": digest(blob)}
+        _store({"key": key, "service": service, "elapsed": time.perf_counter() - start, "response": response}, blob)
+        return result
+
+    with _lock:
+        record = _load_index().get(key)
+    if record is None:
+        raise FixtureMissing(f"No {service} fixture for request {key[:12]} in {_state['dir']}.")
+    spec = _state["latency"].get(service)
+    if spec:
+        time.sleep(sample_latency(spec, record.get("elapsed", 0.0)))
+    if "error" in record:
+        error = record["error"]
+        if error["type"] == "ValueError":
+            raise ValueError(error["message"])
+        message = f"{error['type']}: {error['message']}"
+        if error.get("status") is None and error.get("kind") == "transient":
+            raise ReplayedConnectionError(message)
+        raise ReplayedError(message, status_code=error.get("status"))
+    blob = None
+    if "blob" in record["response"]:
+        with open(os.path.join(_state["dir"], "blobs", record["response"]["blob"]), "rb") as f:
+            blob = f.read()
+    return decode(record["response"], blob)
+
+### Codecs for the recorded services ###
+class RecordedResponse:
+    """Enough of requests.Response for google_search.parse_serper_response."""
+
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+def encode_search(response):
+    try:
+        data = response.json()
+    except Exception:
+        data = None
+    return {"status_code": getattr(response, "status_code", None), "json": data}, None
+
+def decode_search(response, blob):
+    return RecordedResponse(response["status_code"], response["json"])
+
+def encode_fetch(result):
+    data, mime_type = result
+    return {"mime_type": mime_type}, data
+
+def decode_fetch(response, blob):
+    return blob, response["mime_type"]
+
+def encode_count_tokens(total_tokens):
+    return {"total_tokens": total_tokens}, None
+
+def decode_count_tokens(response, blob):
+    return response["total_tokens"]
+
+USAGE_FIELDS = ("prompt_token_count", "candidates_token_count", "thoughts_token_count", "cached_content_token_count", "total_token_count")
+
+def encode_generate(response):
+    usage = getattr(response, "usage_metadata", None)
+    candidates = getattr(response, "candidates", None)
+    reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    return {"text": response.text, "usage": {f: getattr(usage, f, None) for f in USAGE_FIELDS} if usage else None,
+            "finish_reason": getattr(reason, "name", reason)}, None
+
+def decode_generate(response, blob):
+    usage = SimpleNamespace(**response["usage"]) if response.get("usage") else None
+    reason = response.get("finish_reason")
+    candidates = [SimpleNamespace(finish_reason=reason)] if reason else None
+    return SimpleNamespace(text=response["text"], usage_metadata=usage, candidates=candidates)
+
+def encode_embed(response):
+    return {"embeddings": [list(e.values) for e in response.embeddings]}, None
+
+def decode_embed(response, blob):
+    return SimpleNamespace(embeddings=[SimpleNamespace(values=v) for v in response["embeddings"]])
+
+def encode_cache(cache):
+    return {"name": cache.name}, None
+
+def decode_cache(response, blob):
+    return SimpleNamespace(name=response["name"])
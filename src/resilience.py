@@ -0,0 +1,174 @@
+"""Retries and circuit breakers around network calls.
+
+Errors are classified first: transient ones (timeouts, connection errors, 408/5xx) and rate limits (429) are retried
+with decorrelated-jitter backoff, permanent ones (other 4xx, unsupported or oversized documents, ...) are not.
+Retries draw from a process-wide budget, so a provider outage cannot multiply the load by max_attempts.
+Per-host circuit breakers open after repeated transient failures of a university server; calls to an open host
+fail immediately with CircuitOpenError until the cooldown has passed and a trial call succeeds.
+
+    data = resilience.call_with_retries(lambda: download(url), "fetch", host=urlsplit(url).hostname)"""
+import logging
+import random
+import threading
+import time
+
+import src.metrics as metrics
+from src.limits import status_code_of
+
+TRANSIENT, RATE_LIMITED, PERMANENT = "transient", "rate_limited", "permanent"
+TRANSIENT_STATUSES = {408, 500, 502, 503, 504}
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 0.5  # seconds
+DEFAULT_MAX_DELAY = 30.0
+DEFAULT_RETRY_RATIO = 0.2  # retries allowed per call made...
+DEFAULT_MIN_RETRIES_PER_SECOND = 2.0  # ...plus this many per second, so rare failures are always retried
+DEFAULT_FAILURE_THRESHOLD = 5  # consecutive transient failures that open a host's circuit
+DEFAULT_COOLDOWN = 120.0  # seconds a circuit stays open
+
+logger = logging.getLogger("pipeline.resilience")
+
+class CircuitOpenError(Exception):
+    """The host failed repeatedly and is being skipped until its cooldown ends."""
+
+class TransientHTTPError(Exception):
+    """A response (rather than an exception) with a retryable status, e.g. a Serper 5xx/429."""
+
+    def __init__(self, status_code, message=""):
+        super().__init__(f"HTTP {status_code} {message}".strip())
+        self.status_code = status_code
+
+def classify(exc):
+    """TRANSIENT, RATE_LIMITED or PERMANENT."""
+    if isinstance(exc, CircuitOpenError):
+        return PERMANENT
+    status = status_code_of(exc)
+    if status == 429:
+        return RATE_LIMITED
+    if status in TRANSIENT_STATUSES:
+        return TRANSIENT
+    if status is not None:
+        return PERMANENT
+    import httpx
+    import requests
+    if isinstance(exc, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError,
+                        requests.Timeout, requests.ConnectionError, TimeoutError, ConnectionError)):
+        return TRANSIENT
+    return PERMANENT
+
+def retry_after_of(exc):
+    """Seconds from a Retry-After header on the error's response, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def decorrelated_jitter(previous, base=DEFAULT_BASE_DELAY, cap=DEFAULT_MAX_DELAY):
+    """Next backoff delay: uniform in [base, 3 * previous], capped (AWS 'decorrelated jitter')."""
+    return min(cap, random.uniform(base, max(base, previous * 3)))
+
+class RetryBudget:
+    """Token bucket shared by all callers: every call deposits `ratio` tokens, every retry spends one,
+    and the bucket also refills at min_per_second."""
+
+    def __init__(self, ratio=DEFAULT_RETRY_RATIO, min_per_second=DEFAULT_MIN_RETRIES_PER_SECOND, max_tokens=100.0):
+        self.ratio, self.min_per_second, self.max_tokens = ratio, min_per_second, max_tokens
+        self.tokens = max_tokens
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.max_tokens, self.tokens + (now - self.updated) * self.min_per_second)
+        self.updated = now
+
+    def deposit(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+class CircuitBreaker:
+    """closed -> open after failure_threshold consecutive transient failures -> half-open after cooldown
+    (one trial call at a time) -> closed on success, open again on failure."""
+
+    def __init__(self, host, failure_threshold=DEFAULT_FAILURE_THRESHOLD, cooldown=DEFAULT_COOLDOWN):
+        self.host = host
+        self.failure_threshold, self.cooldown = failure_threshold, cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_in_flight:
+                metrics.inc("circuit_rejected_total")
+                raise CircuitOpenError(f"Circuit open for {self.host} after {self.failures} consecutive failures.")
+            self.trial_in_flight = True  # half-open: let this one call through
+
+    def record(self, failed):
+        """failed: the host did not answer (transient error). Any answer, even a 4xx, proves the host is up."""
+        with self.lock:
+            self.trial_in_flight = False
+            if not failed:
+                if self.opened_at is not None:
+                    logger.info(f"[CIRCUIT] {self.host}: closed")
+                self.failures, self.opened_at = 0, None
+            else:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    if self.opened_at is None:
+                        metrics.inc("circuit_opened_total")
+                        logger.info(f"[CIRCUIT] {self.host}: open for {self.cooldown:.0f}s after {self.failures} failures")
+                    self.opened_at = time.monotonic()
+
+_budget = RetryBudget()
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(host):
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+def call_with_retries(fn, service, host=None, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                      max_delay=DEFAULT_MAX_DELAY, budget=None):
+    """fn() with classified retries. host: circuit-breaker key (None = no breaker).
+    Raises the last error when it is permanent, attempts or the retry budget run out, or the host's circuit is open."""
+    budget = budget or _budget
+    breaker = get_breaker(host) if host else None
+    delay = base_delay
+    budget.deposit()
+    for attempt in range(1, max_attempts + 1):
+        if breaker:
+            breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            kind = classify(e)
+            if breaker:
+                breaker.record(failed=kind == TRANSIENT)
+            if kind == PERMANENT or attempt == max_attempts:
+                raise
+            if not budget.try_spend():
+                metrics.inc("retry_budget_exhausted_total", service=service)
+                raise
+            delay = decorrelated_jitter(delay, base_delay, max_delay)
+            if kind == RATE_LIMITED:
+                delay = max(delay, min(max_delay, retry_after_of(e) or 0.0))
+            metrics.inc("retries_total", service=service, reason=kind)
+            time.sleep(delay)
+        else:
+            if breaker:
+                breaker.record(failed=False)
+            return result
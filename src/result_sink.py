@@ -0,0 +1,171 @@
+"""Pipeline output rows in SQLite (WAL), written by a dedicated thread.
+
+Workers hand rows to write(), which only enqueues them. The writer thread inserts them in batched transactions
+(batch_size rows or flush_interval seconds, whichever comes first), so output I/O never blocks the pipeline and a crash
+loses at most the uncommitted batch, never half a row. A batch that fails to commit is kept and retried every
+flush_interval together with the rows queued since; flush() and close() raise while rows are still uncommitted. The CSV layouts the rest of the repo reads are exported
+on demand, also while a run is in progress (WAL lets readers work next to the writer):
+
+    python -m src.result_sink data/generated/study_plans_all.sqlite study_plans data/generated/study_plans_all.csv"""
+import argparse
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 2.0  # seconds
+
+# table -> columns, in the order of the CSV files the scripts used to append to
+LAYOUTS = {
+    "disciplines": ["speciality_code", "speciality_name", "study_plan_url",
+                    "discipline_name", "work_program_url", "topics"],
+    "study_plans": ["speciality_code", "speciality_name", "university", "study_plan_url", "disciplines"],
+}
+
+logger = logging.getLogger("pipeline.result_sink")
+
+class ResultSink:
+    def __init__(self, path, table, columns=None, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path, self.table = path, table
+        self.columns = list(columns or LAYOUTS[table])
+        self.batch_size, self.flush_interval = batch_size, flush_interval
+        self.error = None
+        self.written = 0
+        self._queue = queue.Queue()
+        quoted = [f'"{c}"' for c in self.columns]
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({", ".join(q + " TEXT" for q in quoted)})')
+        self._insert = f'INSERT INTO "{table}" ({", ".join(quoted)}) VALUES ({", ".join("?" * len(quoted))})'
+        self._thread = threading.Thread(target=self._run, name=f"result-sink-{table}", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # no fsync per commit; a power loss may drop the last commits, never tear them
+        return conn
+
+    def _values(self, row):
+        if isinstance(row, dict):
+            row = [row.get(c) for c in self.columns]
+        return [None if v is None or (isinstance(v, float) and math.isnan(v)) else str(v) for v in row]
+
+    def write(self, rows):
+        """Queue rows (dicts keyed by column, or sequences in column order) for the writer thread."""
+        rows = [self._values(r) for r in rows]
+        if rows:
+            self._queue.put(rows)
+
+    def _run(self):
+        conn = self._connect()
+        batch, waiters, deadline, failing = [], [], None, False
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, threading.Event) or item is _STOP:
+                waiters.append(item)
+            elif item is not None:
+                batch.extend(item)
+                deadline = deadline or time.monotonic() + self.flush_interval
+            full = len(batch) >= self.batch_size and not failing  # a failing batch waits for its retry time
+            if batch and (full or waiters or time.monotonic() >= deadline):
+                try:
+                    with conn:
+                        conn.executemany(self._insert, batch)
+                except Exception as e:
+                    logger.warning(f"[SINK-RETRY] Could not write {len(batch)} rows to {self.path}:{self.table}, "
+                                   f"retrying in {self.flush_interval:g}s: {e}")
+                    self.error, failing = e, True
+                    deadline = time.monotonic() + self.flush_interval
+                else:
+                    self.written += len(batch)
+                    self.error, failing = None, False
+                    batch, deadline = [], None
+            for waiter in waiters:
+                if waiter is _STOP:
+                    if batch:
+                        logger.error(f"[SINK-FAIL] Dropping {len(batch)} rows that could not be written to {self.path}:{self.table}")
+                    conn.close()
+                    return
+                waiter.set()
+            waiters = []
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def flush(self, timeout=None):
+        """Block until every row written so far is committed; raises the insert error if some are not
+        (they stay queued and are retried)."""
+        if self._thread.is_alive():
+            done = threading.Event()
+            self._queue.put(done)
+            done.wait(timeout)
+        self._raise_error()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def clear(self):
+        """Drop all stored rows (a fresh run)."""
+        self.flush()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f'DELETE FROM "{self.table}"')
+
+    def to_dataframe(self):
+        return read_table(self.path, self.table)
+
+    def export_csv(self, filename, sep=';'):
+        """Committed rows in insertion order, in the CSV layout of the table."""
+        self.flush()
+        return export_csv(self.path, self.table, filename, sep=sep)
+
+_STOP = object()
+
+def read_table(path, table):
+    import pandas as pd
+    with closing(sqlite3.connect(path)) as conn:
+        return pd.read_sql_query(f'SELECT * FROM "{table}" ORDER BY rowid', conn)
+
+def export_csv(path, table, filename, sep=';'):
+    """Write the table to a CSV via a temporary file, so readers never see a half-written export."""
+    df = read_table(path, table)
+    if os.path.dirname(filename):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp = f"{filename}.tmp"
+    df.to_csv(tmp, index=False, sep=sep)
+    os.replace(tmp, filename)
+    return df
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a result sink table to CSV.")
+    parser.add_argument("db")
+    parser.add_argument("table", choices=sorted(LAYOUTS))
+    parser.add_argument("csv")
+    parser.add_argument("--sep", default=";")
+    args = parser.parse_args(argv)
+    df = export_csv(args.db, args.table, args.csv, sep=args.sep)
+    print(f"{len(df)} rows written to {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Priority scheduling of pipeline units (specialities) under a call quota.
+
+Units run highest score first. With a quota (API calls for the run: Serper searches + Gemini generations),
+every such call is charged at scheduler.checkpoint(). The scheduler keeps an estimate of the cost of a unit
+(expected_cost until some have finished, then their average) and
+- stops starting new units once the remaining quota no longer covers them, and
+- preempts running units when the remaining quota cannot finish all of them: the quota is handed out in priority
+  order, and a unit whose remaining cost does not fit is preempted (a cheaper, lower-priority unit may still fit).
+A preempted unit is aborted at its next checkpoint by raising Preempted, so the quota goes to the units that matter.
+A unit that catches Preempted and returns what it has so far ends as 'preempted' with that partial result.
+
+Scores are pluggable: any row -> float function, e.g. students_score or search_count_score."""
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_EXPECTED_COST = 30.0  # calls per speciality before any has finished
+STUDY_PLANS_CSV = "data/generated/study_plans_all.csv"
+UNIVERSITIES_CSV = "data/generated/universities_cleaned.csv"
+SEARCH_QUERIES_CSV = "data/download/search_queries.csv"
+
+class Preempted(BaseException):
+    """Raised inside a unit that lost its quota to higher-priority work.
+    A BaseException (like KeyboardInterrupt) so the per-URL `except Exception` handlers in the pipeline let it through."""
+
+_active = None  # scheduler currently running, if any
+_local = threading.local()
+
+def checkpoint(units=1):
+    """Charge quota for one API call made by the current unit; raises Preempted if the unit has been preempted.
+    No-op outside a scheduled unit."""
+    task = getattr(_local, "task", None)
+    if _active is not None and task is not None:
+        _active.charge(task, units)
+
+def bind(fn):
+    """fn run on behalf of the calling thread's unit, for work handed to an inner thread pool."""
+    task = getattr(_local, "task", None)
+
+    def bound(*args, **kwargs):
+        previous, _local.task = getattr(_local, "task", None), task
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.task = previous
+    return bound
+
+class _Task:
+    def __init__(self, rank, key, priority, args):
+        self.rank, self.key, self.priority, self.args = rank, key, priority, args
+        self.used = 0
+        self.preempted = False
+
+class PriorityScheduler:
+    def __init__(self, num_workers, quota=None, expected_cost=DEFAULT_EXPECTED_COST, log=None):
+        self.num_workers = num_workers
+        self.quota = quota
+        self.expected_cost = expected_cost
+        self.log = log or (lambda msg: None)
+        self.used = 0
+        self.finished_costs = []
+        self.running = {}  # rank -> _Task
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        return float("inf") if self.quota is None else self.quota - self.used
+
+    def unit_cost(self):
+        if not self.finished_costs:
+            return self.expected_cost
+        return max(1.0, sum(self.finished_costs) / len(self.finished_costs))
+
+    def _reserve(self, task):
+        """Quota a running unit is still expected to need."""
+        return max(1.0, self.unit_cost() - task.used)
+
+    def _rebalance(self):
+        """Preempt the running units the remaining quota cannot finish (called under lock). Units claim the quota
+        highest priority first; a unit whose reserve does not fit is preempted and claims nothing."""
+        if self.quota is None:
+            return
+        budget = self.remaining()
+        for task in sorted(self.running.values(), key=lambda t: t.rank):
+            if task.preempted:
+                continue  # aborts at its next checkpoint
+            reserve = self._reserve(task)
+            if reserve <= budget:
+                budget -= reserve
+                continue
+            task.preempted = True
+            self.log(f"[PREEMPT] {task.key} (priority {task.priority:g}): {self.remaining():.0f} calls of quota left")
+
+    def charge(self, task, units=1):
+        with self.lock:
+            if task.preempted:
+                raise Preempted(task.key)
+            self.used += units
+            task.used += units
+            self._rebalance()
+            if task.preempted:
+                raise Preempted(task.key)
+
+    def _can_start(self):
+        with self.lock:
+            if self.quota is None:
+                return True
+            reserved = sum(self._reserve(t) for t in self.running.values())
+            return self.remaining() - reserved >= self.unit_cost()
+
+    def _run_task(self, fn, task):
+        _local.task = task
+        try:
+            return fn(*task.args)
+        finally:
+            _local.task = None
+
+    def run(self, units, fn):
+        """units: iterable of (priority, key, args); fn(*args) processes one unit.
+        Yields (key, status, result) as units end: status 'done' (result = fn's return value), 'failed' (the exception),
+        'preempted' (None, or fn's partial return value if fn caught Preempted) or 'skipped' (None, never started
+        because the quota ran out)."""
+        global _active
+        tasks = [_Task(rank, key, priority, tuple(args))
+                 for rank, (priority, key, args) in enumerate(sorted(units, key=lambda u: -u[0]))]
+        pending = list(reversed(tasks))  # pop() gives the highest priority
+        futures = {}
+        _active = self
+        try:
+            with ThreadPoolExecutor(max_workers=self.num_workers) as ex:
+                while pending or futures:
+                    while pending and len(futures) < self.num_workers and self._can_start():
+                        task = pending.pop()
+                        with self.lock:
+                            self.running[task.rank] = task
+                        futures[ex.submit(self._run_task, fn, task)] = task
+                    if not futures:
+                        break  # quota exhausted: nothing running and nothing may start
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        task = futures.pop(fut)
+                        with self.lock:
+                            del self.running[task.rank]
+                        try:
+                            result = fut.result()
+                        except Preempted:
+                            yield task.key, "preempted", None
+                            continue
+                        except Exception as e:
+                            yield task.key, "failed", e
+                            continue
+                        if task.preempted:
+                            yield task.key, "preempted", result
+                            continue
+                        with self.lock:
+                            self.finished_costs.append(task.used)
+                        yield task.key, "done", result
+                for task in reversed(pending):
+                    yield task.key, "skipped", None
+        finally:
+            _active = None
+
+### Scores ###
+def students_score(study_plans_df, students_map):
+    """Summed students_amount of the distinct universities with a study plan for the speciality.
+    study_plans_df: study_plans_all.csv layout (speciality_name, university); students_map: university -> students."""
+    pairs = study_plans_df[['speciality_name', 'university']].drop_duplicates()
+    students = pairs['university'].map(students_map).fillna(0)
+    totals = students.groupby(pairs['speciality_name']).sum().to_dict()
+    return lambda row: float(totals.get(row['speciality_name'], 0))
+
+def search_count_score(query_df, study_plans_df=None):
+    """Search demand for the speciality: summed search_count of its disciplines' queries when study plans are known,
+    otherwise of the queries mentioning the speciality name."""
+    counts = (query_df.assign(query=query_df['query'].astype(str).str.strip().str.lower())
+              .groupby('query')['search_count'].sum())
+    if study_plans_df is not None:
+        disciplines = study_plans_df.assign(discipline=study_plans_df['disciplines'].astype(str).str.split(';')).explode('discipline')
+        disciplines['discipline'] = disciplines['discipline'].str.strip().str.lower()
+        disciplines = disciplines.drop_duplicates(['speciality_name', 'discipline'])
+        totals = disciplines['discipline'].map(counts).fillna(0).groupby(disciplines['speciality_name']).sum().to_dict()
+        return lambda row: float(totals.get(row['speciality_name'], 0))
+    import pandas as pd
+    queries = pd.Series(counts.index)
+    values = counts.to_numpy()
+
+    def score(row):
+        mask = queries.str.contains(str(row['speciality_name']).strip().lower(), regex=False).to_numpy()
+        return float(values[mask].sum())
+    return score
+
+def prioritized_units(df, score_fn, key_columns=('speciality_code', 'speciality_name')):
+    """(priority, key, (row,)) units for PriorityScheduler.run from a DataFrame; key is a tuple of key_columns."""
+    return [(score_fn(row), tuple(row[c] for c in key_columns), (row,)) for _, row in df.iterrows()]
+
+def load_score(name):
+    """Score function by name from the usual data files: 'students', 'search_count' or None (keep input order).
+    Specialities missing from the data score 0; a missing file gives every speciality 0."""
+    import pandas as pd
+    import src.discipline_store as discipline_store
+    if name is None:
+        return lambda row: 0.0
+    study_plans_df = pd.read_csv(STUDY_PLANS_CSV, sep=';') if os.path.exists(STUDY_PLANS_CSV) else None
+    if name == "students":
+        if study_plans_df is None or not os.path.exists(UNIVERSITIES_CSV):
+            return lambda row: 0.0
+        students_map = discipline_store.students_by_university(pd.read_csv(UNIVERSITIES_CSV))
+        return students_score(study_plans_df, students_map)
+    if name == "search_count":
+        if not os.path.exists(SEARCH_QUERIES_CSV):
+            return lambda row: 0.0
+        return search_count_score(pd.read_csv(SEARCH_QUERIES_CSV), study_plans_df)
+    raise ValueError(f"Unknown priority score: {name}")
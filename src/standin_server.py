@@ -0,0 +1,271 @@
+"""Local stand-in for Serper and the Gemini API, for throughput and backpressure experiments without paid quota.
+
+    python -m src.standin_server --port 8089 --latency "search=lognormal:0.8:0.4;generate=lognormal:4:0.5" \
+        --error-rate 0.01 --rate-limit-rate 0.02 --max-concurrency 64
+    URAIT_STANDIN_URL=http://127.0.0.1:8089 python get_disciplines_data.py
+
+Endpoints (responses are synthetic but follow the real schemas):
+    POST /search                                      Serper; result links point at /docs/ on this server
+    GET  /docs/<name>                                 an HTML study plan / work program page
+    POST /v1beta/models/<model>:generateContent       text, or JSON generated from generationConfig.responseSchema
+    POST /v1beta/models/<model>:countTokens           ~4 bytes per token of the request parts
+    POST /v1beta/models/<model>:embedContent / :batchEmbedContents
+
+Latency specs per endpoint (search, docs, generate, count_tokens, embed) use the src.replay format.
+Faults: --error-rate answers 500, --rate-limit-rate answers 429 with Retry-After, and requests beyond
+--max-concurrency in flight get 429 as well (what a quota-limited upstream does under overload).
+The Files and caching APIs are not implemented: DocumentSession fails and callers fall back to per-prompt parsing."""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.replay import parse_latency, sample_latency
+
+DEFAULT_PORT = 8089
+DEFAULT_EMBEDDING_DIM = 768
+CHARS_PER_TOKEN = 4
+TOPIC_WORDS = ["Пределы", "Ряды", "Интегралы", "Матрицы", "Группы", "Графы", "Алгоритмы", "Вероятность", "Дифференциальные уравнения",
+               "Линейные пространства", "Функции", "Множества", "Логика", "Оптимизация", "Статистика", "Кольца"]
+
+### Synthetic payloads ###
+def synthetic_list(rng, n=12):
+    return "; ".join(f"{rng.choice(TOPIC_WORDS)} {i + 1}" for i in range(n))
+
+def synthetic_from_schema(schema, rng, depth=0):
+    """A value matching a Gemini responseSchema (OBJECT/ARRAY/STRING/INTEGER/NUMBER/BOOLEAN)."""
+    kind = str(schema.get("type", "STRING")).upper()
+    if kind == "OBJECT":
+        return {key: synthetic_from_schema(sub, rng, depth + 1) for key, sub in schema.get("properties", {}).items()}
+    if kind == "ARRAY":
+        n = rng.randint(3, 12) if depth < 2 else rng.randint(0, 6)
+        return [synthetic_from_schema(schema.get("items", {}), rng, depth + 1) for _ in range(n)]
+    if kind == "INTEGER":
+        return rng.randint(0, 100)
+    if kind == "NUMBER":
+        return rng.random()
+    if kind == "BOOLEAN":
+        return rng.random() < 0.5
+    if schema.get("enum"):
+        return rng.choice(schema["enum"])
+    return f"{rng.choice(TOPIC_WORDS)} {rng.randint(1, 999)}"
+
+def synthetic_embedding(text, dim):
+    """Deterministic unit vector per text, so repeated requests embed identically."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    values = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = sum(v * v for v in values) ** 0.5
+    return [v / norm for v in values]
+
+def synthetic_document(name, rng):
+    rows = "\n".join(f"<tr><td>Б1.О.{i:02d}</td><td>{rng.choice(TOPIC_WORDS)} {i}</td><td>{rng.randint(2, 8)}</td><td>экзамен</td></tr>"
+                     for i in range(1, 41))
+    topics = "\n".join(f"<p>Тема {i}. {rng.choice(TOPIC_WORDS)}: основные понятия и методы.</p>" for i in range(1, 21))
+    return f"""<!doctype html><html><head><meta charset="utf-8"><title>Учебный план {name}</title></head>
+<body><nav><a href="/">Главная</a></nav><main><h1>Учебный план и рабочие программы дисциплин</h1>
+<table><tr><th>Индекс</th><th>Дисциплина</th><th>З.е.</th><th>Форма контроля</th></tr>{rows}</table>
+<h2>Содержание дисциплины</h2>{topics}</main><footer>© Университет</footer></body></html>""".encode("utf-8")
+
+def _parts_size(contents):
+    size = 0
+    for content in contents or []:
+        for part in content.get("parts", []):
+            if "text" in part:
+                size += len(part["text"].encode("utf-8"))
+            elif "inlineData" in part:
+                size += len(part["inlineData"].get("data", "")) * 3 // 4  # base64
+    return size
+
+def _prompt_text(contents):
+    return " ".join(p.get("text", "") for c in contents or [] for p in c.get("parts", []))
+
+### Server ###
+class StandinConfig:
+    def __init__(self, latency=None, error_rate=0.0, rate_limit_rate=0.0, max_concurrency=0, retry_after=1, seed=None,
+                 embedding_dim=DEFAULT_EMBEDDING_DIM):
+        self.latency = parse_latency(latency) if isinstance(latency, str) else dict(latency or {})
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.embedding_dim = embedding_dim
+        self.rng = random.Random(seed)
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def count(self, endpoint, status):
+        with self.lock:
+            self.stats[f"{endpoint} {status}"] = self.stats.get(f"{endpoint} {status}", 0) + 1
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # set by make_server
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self):
+        path = self.path.split("?")[0]
+        if self.command == "POST" and path == "/search":
+            return "search", self._search
+        if self.command == "GET" and path.startswith("/docs/"):
+            return "docs", self._doc
+        match = re.match(r"^/v1beta/models/([^:/]+):(\w+)$", path)
+        if self.command == "POST" and match:
+            method = {"generateContent": "generate", "countTokens": "count_tokens",
+                      "embedContent": "embed", "batchEmbedContents": "embed"}.get(match.group(2))
+            if method:
+                return method, getattr(self, f"_{match.group(2)}")
+        return None, None
+
+    def _handle(self):
+        cfg = self.config
+        endpoint, handler = self._route()
+        if handler is None:
+            cfg.count("unknown", 404)
+            self._read_body_and_discard()
+            return self._send(404, {"error": {"code": 404, "message": f"No stand-in for {self.command} {self.path}", "status": "NOT_FOUND"}})
+        with cfg.lock:
+            roll = cfg.rng.random()
+            rejected = roll < cfg.rate_limit_rate or (cfg.max_concurrency and cfg.in_flight >= cfg.max_concurrency)
+            if not rejected:
+                cfg.in_flight += 1
+        if rejected:
+            cfg.count(endpoint, 429)
+            self._read_body_and_discard()
+            return self._send(429, {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).",
+                                              "status": "RESOURCE_EXHAUSTED"}}, headers={"Retry-After": str(cfg.retry_after)})
+        try:
+            spec = cfg.latency.get(endpoint)
+            if spec:
+                time.sleep(sample_latency(spec))
+            if roll < cfg.rate_limit_rate + cfg.error_rate:
+                cfg.count(endpoint, 500)
+                self._read_body_and_discard()
+                return self._send(500, {"error": {"code": 500, "message": "Internal error (injected).", "status": "INTERNAL"}})
+            cfg.count(endpoint, 200)
+            handler()
+        finally:
+            with cfg.lock:
+                cfg.in_flight -= 1
+
+    def _read_body_and_discard(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    ### Endpoints ###
+    def _search(self):
+        query = self._read_json().get("q", "")
+        rng = random.Random(query)
+        base = f"http://{self.headers.get('Host', 'localhost')}"
+        organic = []
+        for i in range(10):
+            slug = hashlib.md5(f"{query}|{i}".encode("utf-8")).hexdigest()[:12]
+            organic.append({"title": f"{query[:60]} — результат {i + 1}", "link": f"{base}/docs/{slug}.html",
+                            "snippet": f"{rng.choice(TOPIC_WORDS)}, {rng.choice(TOPIC_WORDS)}", "position": i + 1})
+        self._send(200, {"searchParameters": {"q": query, "gl": "ru", "hl": "ru", "type": "search", "engine": "google"},
+                         "organic": organic})
+
+    def _doc(self):
+        name = self.path.rsplit("/", 1)[-1]
+        self._send(200, synthetic_document(name, random.Random(name)), content_type="text/html; charset=utf-8")
+
+    def _generateContent(self):
+        body = self._read_json()
+        rng = random.Random(_prompt_text(body.get("contents")))
+        generation_config = body.get("generationConfig", {})
+        schema = generation_config.get("responseSchema")
+        if schema:
+            text = json.dumps(synthetic_from_schema(schema, rng), ensure_ascii=False)
+        elif generation_config.get("responseMimeType") == "application/json":
+            text = json.dumps({"answer": rng.choice(["Да", "Нет"]), "explanation": "Синтетический ответ."}, ensure_ascii=False)
+        else:
+            text = synthetic_list(rng)
+        prompt_tokens = max(1, _parts_size(body.get("contents")) // CHARS_PER_TOKEN)
+        output_tokens = max(1, len(text.encode("utf-8")) // CHARS_PER_TOKEN)
+        self._send(200, {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+                              "totalTokenCount": prompt_tokens + output_tokens},
+            "modelVersion": self.path.split("/")[-1].split(":")[0],
+        })
+
+    def _countTokens(self):
+        body = self._read_json()
+        self._send(200, {"totalTokens": max(1, _parts_size(body.get("contents")) // CHARS_PER_TOKEN)})
+
+    def _embed_one(self, request):
+        text = _prompt_text([request.get("content", {})])
+        return {"values": synthetic_embedding(text, request.get("outputDimensionality") or self.config.embedding_dim)}
+
+    def _embedContent(self):
+        self._send(200, {"embedding": self._embed_one(self._read_json())})
+
+    def _batchEmbedContents(self):
+        self._send(200, {"embeddings": [self._embed_one(r) for r in self._read_json().get("requests", [])]})
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, **config):
+    """ThreadingHTTPServer serving the stand-in; config goes to StandinConfig. server.config has per-endpoint stats."""
+    handler = type("ConfiguredStandinHandler", (StandinHandler,), {"config": StandinConfig(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.config = handler.config
+    return server
+
+def start_in_thread(**kwargs):
+    """Start a stand-in server in a daemon thread (port=0 picks a free port). Returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="standin-server", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Serper/Gemini stand-in server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default="", help='e.g. "search=lognormal:0.8:0.4;docs=const:0.3;generate=lognormal:4:0.5"')
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="requests in flight beyond this get 429 (0 = unlimited)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    server = make_server(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                         rate_limit_rate=args.rate_limit_rate, max_concurrency=args.max_concurrency,
+                         retry_after=args.retry_after, seed=args.seed)
+    print(f"Stand-in listening on http://{args.host}:{args.port} (set URAIT_STANDIN_URL to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for key, n in sorted(server.config.stats.items()):
+            print(f"{key}: {n}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pandas as pd
+import tldextract
+from tqdm import tqdm
+
+import src.google_search as google_search
+import src.url_utils as url_utils
+import src.metrics as metrics
+
+HOST_DROP_ETLD1 = {
+    "wikipedia.org", "vk.com", "facebook.com", "instagram.com", "ok.ru", "yandex.ru",
+    "youtube.com", "t.me", "vuzopedia.ru", "postupi.online", "universitys.ru", "ucheba.ru", "ivobr.ru", "ciur.ru", "robogeek.ru", "cdnstatic.rg.ru", "tabiturient.ru", "vuzopedia.ru", "abiturient.ru", "vuzopedia.ru", "studopedia.ru", "studfile.net", "studbooks.net", "studme.org", "studref.com", "referat911.ru", "referat.guru", "allbest.ru", "znanium.com", "libgen.is", "libgen.rs", "libgen.li", "e-lib.info", "academia.edu", "researchgate.net", "akkork.ru", "i-exam.ru", "minobr63.ru", "mskobr.ru", "dagestanschool.ru"
+}
+COLLAPSE_PREFIXES = {"en", "ru", "pk", "abitur", "priem", "admission", "admit", "new"}
+SSUZ_HINTS = ("college", "kolled", "tehnik", "tehnic", "lyceum", "ssuz", "spo", "tekhnikum")
+
+def clean_url_one(u: str,
+                  drop_ssuz: bool = False,
+                  collapse_lang_adm: bool = True) -> str | None:
+    if not u:
+        return None
+    s = urlsplit(str(u).strip())
+    host = (s.netloc or s.path).split("/")[0].lower()
+    if not host or host.startswith(("mailto:", "javascript:")):
+        return None
+    host = host.split(":", 1)[0]
+
+    # IDN → punycode (canonical)
+    try:
+        host = host.encode("idna").decode("ascii")
+    except Exception:
+        pass
+
+    ext = tldextract.extract(host)  # subdomain, domain, suffix
+    if not ext.suffix or not ext.domain:
+        return None
+    etld1 = f"{ext.domain}.{ext.suffix}"
+    sub = ext.subdomain
+
+    # Drop known aggregators/social by registrable domain
+    if etld1 in HOST_DROP_ETLD1:
+        return None
+    # Drop ONLY the edu.ru portal and its true subdomains
+    if ext.domain == "edu" and ext.suffix == "ru":
+        return None
+
+    # Optional filters
+    if drop_ssuz and any(h in host for h in SSUZ_HINTS):
+        return None
+
+    # Collapse language/admissions subdomains (but keep institutional subs like academy.customs.gov.ru)
+    if collapse_lang_adm and sub in COLLAPSE_PREFIXES:
+        host = etld1
+
+    # preserve original http if present, otherwise default to https
+    scheme = s.scheme.lower()
+    if scheme != "http":
+        scheme = "https"
+
+    return f"{scheme}://{host}/"
+
+def _map_unique(series, func):
+    """Apply func once per distinct non-null value of series (URL helpers are slow, duplicates are common)."""
+    uniq = series.dropna().unique()
+    mapping = {v: func(v) for v in uniq}
+    return series.map(mapping)
+
+def merge_by_name(universities_df):
+    """Merge rows with exactly the same name: sum students/teachers, keep the other fields from the row with most students.
+    Rows with an empty name are kept as-is and rows without a name (NaN) are dropped. Rows come out in the order
+    the names first appear."""
+    df = universities_df[universities_df['name'].notna()]
+    group_no = df.groupby('name', sort=False).ngroup()  # numbered in order of first appearance
+    empty = df['name'].astype(str) == ""
+    named = df[~empty]
+
+    grouped = named.groupby('name', sort=False)
+    totals = grouped[['students_amount', 'teachers_amount']].transform('sum')
+    keep_idx = grouped['students_amount'].idxmax()
+
+    merged = named.loc[keep_idx].copy()
+    merged[['students_amount', 'teachers_amount']] = totals.loc[keep_idx].astype(int)
+
+    out = pd.concat([merged, df[empty]])
+    order = pd.DataFrame({"group": group_no.loc[out.index], "pos": range(len(out))}, index=out.index)
+    out = out.loc[order.sort_values(['group', 'pos'], kind='stable').index]
+    return out.reset_index(drop=True)
+
+def keep_max_students(universities_df, column):
+    """For every duplicated value of column keep it only on the row with the most students; set it to None elsewhere.
+    Returns (df, number of rows whose value was cleared)."""
+    df = universities_df.copy()
+    present = df[column].notna()
+    keep_idx = df[present].groupby(column, sort=False)['students_amount'].idxmax()
+    drop_mask = present & ~df.index.isin(keep_idx)
+    df[column] = df[column].astype(object)
+    df.loc[drop_mask, column] = None
+    return df, int(drop_mask.sum())
+
+def clean_universities(universities_df, min_students=100, min_teachers=10, drop_ssuz=False, verbose=True):
+    """Clean a raw universities table (partners.csv + found `url` column, or a full registry export).
+
+    Steps, all as whole-column / groupby passes:
+    1. coerce students_amount/teachers_amount to int and drop small institutions
+    2. merge rows with the same name (sum counts, keep the row with most students; rows without a name are dropped)
+    3. clean_url_one on every distinct url
+    4. de-duplicate clean_url, keeping the university with most students (clean_url_count/clean_url_is_dup record
+       the result); drop rows without clean_url
+    5. extract url_root and de-duplicate it the same way (rows are kept, url_root set to None)
+    Returns: cleaned DataFrame with clean_url and url_root columns."""
+    def report(msg):
+        if verbose:
+            print(msg)
+
+    df = universities_df.copy()
+    for col in ['students_amount', 'teachers_amount']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+    df = df[(df['students_amount'] >= min_students) & (df['teachers_amount'] >= min_teachers)].reset_index(drop=True)
+    report(f"After filtering small universities, {len(df)} rows remain.")
+
+    before = len(df)
+    df = merge_by_name(df)
+    report(f"Merged {before - len(df)} rows -> {len(df)} rows remaining.")
+
+    df['clean_url'] = _map_unique(df['url'], lambda u: clean_url_one(u, drop_ssuz=drop_ssuz))
+    report(f"After cleaning, {df['clean_url'].notna().sum()} / {len(df)} universities have a valid URL.")
+
+    df, affected = keep_max_students(df, 'clean_url')
+    counts = df['clean_url'].dropna().value_counts()
+    df['clean_url_count'] = df['clean_url'].map(counts).fillna(0).astype(int)
+    df['clean_url_is_dup'] = df['clean_url_count'] > 1
+    report(f"Set clean_url=None for {affected} duplicate rows.")
+
+    before = len(df)
+    mask = df['clean_url'].notna() & (df['clean_url'].astype(str).str.strip() != "")
+    df = df[mask].reset_index(drop=True)
+    report(f"Dropped {before - len(df)} rows without clean_url; {len(df)} rows remain.")
+
+    df['url_root'] = _map_unique(df['clean_url'], url_utils.extract_root)
+    report(f"Unique url_root values: {df['url_root'].nunique()}")
+
+    df, affected = keep_max_students(df, 'url_root')
+    report(f"Set url_root=None for {affected} duplicate rows (kept the university with most students per root).")
+    return df
+
+### Website discovery ###
+_search_cache = {}
+_search_cache_lock = threading.Lock()
+
+def university_query(row):
+    """Search query used to find a university's website."""
+    abbreviation = row['abbreviation'] if pd.notna(row.get('abbreviation')) else ""
+    town = row['town'] if pd.notna(row.get('town')) else ""
+    return f"{abbreviation} {row['name']} {town}".strip()
+
+def search_first_url(query):
+    """Return the first search result url for query ("" if nothing found). Results are cached per query.
+    Transient errors are already retried by google_search.search (see src.resilience)."""
+    with _search_cache_lock:
+        if query in _search_cache:
+            metrics.record_cache("university_search", hit=True)
+            return _search_cache[query]
+    metrics.record_cache("university_search", hit=False)
+    results = google_search.search(query, rate_limit=0)
+    url = results[0]['url'] if results else ""
+    with _search_cache_lock:
+        _search_cache[query] = url
+    return url
+
+def find_university_urls(universities_df, url_column='url', max_workers=16):
+    """Find the website of every university without one, using a bounded thread pool.
+    Rows that already have a non-empty url_column are skipped; identical queries are searched once.
+    Returns: list of urls in the same order as universities_df rows ("" where the search failed)."""
+    if url_column in universities_df.columns:
+        existing = universities_df[url_column].fillna("").astype(str).str.strip().tolist()
+    else:
+        existing = [""] * len(universities_df)
+    queries = [university_query(row) for _, row in universities_df.iterrows()]
+    urls = list(existing)
+
+    def find(query):
+        try:
+            return search_first_url(query)
+        except Exception as e:
+            tqdm.write(f"Error for query '{query}': {e}")
+            return ""
+
+    todo = [i for i, url in enumerate(existing) if not url]
+    unique_queries = list(dict.fromkeys(queries[i] for i in todo))
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        found = dict(zip(unique_queries, tqdm(ex.map(find, unique_queries), total=len(unique_queries), desc="Finding university websites")))
+    for i in todo:
+        urls[i] = found[queries[i]]
+    return urls
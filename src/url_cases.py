@@ -0,0 +1,113 @@
+"""Known URL -> extract_root pairs (university sites, regional portals, aggregators), shared by the tests
+and the url_utils benchmarks."""
+
+URL_ROOT_CASES = [
+    ("https://miep.spb.ru/", "miep"),
+    ("https://ccu.edu.kz/", "ccu"),
+    ("https://www.hse.ru/", "hse"),
+    ("https://spbu.ru/", "spbu"),
+    ("http://ispu.ru/files/u2/sveden/education/doc.pdf", "ispu"),
+    ("https://kpfu.ru/portal/docs/file.pdf", "kpfu"),
+
+    ("https://new.mosap.ru/", "mosap"),
+    ("http://www.sibsau.ru/page/home/", "sibsau"),
+    ("https://web-edu.rsreu.ru/res/programs-file-storage/abc.pdf", "rsreu"),
+
+    ("https://edu.tatar.ru/sovetcki/org6264/page2474457.htm", "tatar"),
+
+    ("https://www.edu.ru/vuz/card/institut-zakonovedeniya-i-upravleniya-vserossijskoj-policejskoj-associacii/contacts", "institut-zakonovedeniya-i-upravleniya-vserossijskoj-policejskoj-associacii"),
+
+    # new
+    ("https://apmath.spbu.ru/images/Documenty/Programs-2024.pdf", "spbu"),
+    ("https://mpei.ru/sveden/document/Documents/report_2023s.pdf", "mpei"),
+    ("https://download.guap.ru/sveden/6049/rpd_gosudarstvennaya_itogovaya_attestaciya_220250.pdf", "guap"),
+    ("https://mpei.ru/sveden/document/Documents/report_2022.pdf", "mpei"),
+    ("http://www.mivlgu.ru/site_arch/documents/akkred/2015/otchet_samoobsled_10.03.01-n.pdf", "mivlgu"),
+    ("https://computer.susu.ru/_images/for-entrant.pdf", "susu"),
+    ("https://programms.edu.urfu.ru/ru/9986/documents/", "urfu"),
+    ("https://math-cs.spbu.ru/wp-content/uploads/2024/03/Elektivy-4-kurs-20_5152.pdf", "spbu"),
+    ("https://fgosvo.ru/uploadfiles/Projects_POOP/BAK/020301_POOP_B.pdf", "fgosvo"),
+    ("http://web.ugatu.su/assets/files/documents/study/uplan/bakal/02.03.01_MiKN-MiKM/OOP_02.03.01_MiKN-MiKM_29.05.2015.pdf", "ugatu"),
+    ("https://web-edu.rsreu.ru/res/programs-file-storage/37dc27bcf6fef3d5.pdf", "rsreu"),
+    ("https://cs.msu.ru/sites/cmc/files/docs/uchplan_fiit_2023.pdf", "msu"),
+    ("https://programs.edu.urfu.ru/media/rpm/00031688.pdf", "urfu"),
+    ("https://f.physchem.msu.ru/docs/education_programs/%D0%98%D0%91_%D0%9F%D1%80%D0%B8%D0%BA%D0%BB%D0%B0%D0%B4%D0%BD%D1%8B%D0%B5%20%D0%BC%D0%B0%D1%82%D0%B5%D0%BC%D0%B0%D1%82%D0%B8%D0%BA%D0%B0%20%D0%B8%20%D1%84%D0%B8%D0%B7%D0%B8%D0%BA%D0%B0_%D0%A4%D0%A4%D0%A5%D0%98_2023.pdf", "msu"),
+
+    # new 2
+    ("https://miep.spb.ru/", "miep"),
+    ("https://herzen.spb.ru/", "herzen"),
+
+    # Control cases show the default PSL behavior still works:
+    ("https://apmath.spbu.ru/", "spbu"),
+    ("https://math-cs.spbu.ru/wp/...", "spbu"),
+    ("https://cs.msu.ru/", "msu"),
+    ("https://web-edu.rsreu.ru/res/...", "rsreu"),
+    ("https://ccu.edu.kz/", "ccu"),
+    ("https://new.mosap.ru/", "mosap"),
+
+    # new 3
+    ("https://www.ranepa.ru/", "ranepa"),
+    ("https://uust.ru/", "uust"),
+    ("https://synergy.ru/", "synergy"),
+    ("https://www.fa.ru/", "fa"),
+    ("https://urfu.ru/ru/", "urfu"),
+    ("https://donstu.ru/", "donstu"),
+    ("https://www.rea.ru/", "rea"),
+    ("https://www.mfua.ru/", "mfua"),
+    ("https://www.rudn.ru/", "rudn"),
+    ("https://www.ruc.su/", "ruc"),
+    ("https://www.spbstu.ru/", "spbstu"),
+    ("http://www.miit.ru/", "miit"),
+    ("https://www.kubsu.ru/", "kubsu"),
+    ("https://bmstu.ru/", "bmstu"),
+    ("https://mi.university/", "mi"),
+    ("https://rpa-mu.ru/", "rpa-mu"),
+    ("https://www.sfu-kras.ru/", "sfu-kras"),
+    ("https://www.herzen.spb.ru/", "herzen"),
+    ("https://mephi.ru/node", "mephi"),
+    ("https://www.pushkin.institute/", "pushkin"),
+    ("https://mti.moscow/", "mti"),
+    ("https://xn--80af5bzc.xn--p1ai/ru/", "xn--80af5bzc"),
+
+    # new 4
+    ("https://mpei.ru/sveden/document/Documents/report_2023s.pdf", "mpei"),
+    ("http://ispu.ru/files/u2/sveden/education/RPD_01.03.02_02_O_3.pdf", "ispu"),
+
+    # new 5
+    ("http://npy.1mcg.ru/", "npy"),
+    ("https://tkt.3dn.ru/", "tkt"),
+    ("https://agrotteh.68edu.ru/", "agrotteh"),
+    ("https://lesmeh.edu35.ru/", "lesmeh"),
+
+    # 2) “city-portal / academic” style second-level hosts (need exceptions like 'spb.ru', 'ac.ru')
+    ("http://www.vspu.ac.ru/", "vspu"),
+    ("http://ivanovo.ac.ru/", "ivanovo"),
+    ("https://www.uniyar.ac.ru/", "uniyar"),
+
+    # 3) multi-tenant provider domains
+    ("https://pedcollege-derbent.dagestanschool.ru/", "pedcollege-derbent"),
+    ("https://bgpk.edu22.info/", "bgpk"),
+    ("https://akpf.educrimea.ru/", "akpf"),
+    ("https://sevask.edusev.ru/", "sevask"),
+
+    # 4) regional/departmental “*.gov.ru” trees (PSL makes 'gov.ru' a suffix)
+    ("https://nvi.rosguard.gov.ru/", "nvi"),
+    ("https://academy.customs.gov.ru/", "customs"),
+    ("https://sakhsjh.sakhalin.gov.ru/", "sakhsjh"),
+    ("https://ykt-yaksit.obr.sakha.gov.ru/", "ykt-yaksit"),
+
+    # 5) other regional second-levels
+    ("http://itam.irk.ru/", "itam"),
+    ("https://kkpt-sulin.iro61.ru/", "kkpt-sulin"),
+    ("https://kptt.kemobl.ru/", "kptt"),
+    ("https://prk.perm.ru/", "prk"),
+    ("https://netk.nnov.ru/", "netk"),
+
+    # 6) special SLDs
+    ("https://ahtt.com.ru/", "ahtt"),
+    ("https://vpk.net.ru/", "vpk"),
+
+    # 7) military/ministerial hosts
+    ("https://varhbz.mil.ru/", "varhbz"),
+    ("https://po.minobr63.ru/", "po"),
+]
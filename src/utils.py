@@ -1,80 +1,436 @@
-import numpy as np
-from google import genai
-from google.genai import types
-import httpx
 import os
-from dotenv import load_dotenv
+import codecs
+import io
 import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+import src.pdf_utils as pdf_utils
+import src.html_utils as html_utils
+import src.metrics as metrics
+import src.replay as replay
+import src.limits as limits
+import src.resilience as resilience
+import src.scheduler as scheduler
 
 DEFAULT_MODEL = "gemini-2.5-flash"
 DEFAULT_TEMPERATURE = 0.0
 DEFAULT_MAX_OUTPUT_TOKENS = 1024
 DEFAULT_THINKING_BUDGET = 512
 DEFAULT_MAX_INPUT_TOKENS = 400_000
+DEFAULT_CHUNK_FILL = 0.8  # target chunk size as a fraction of max_input_tokens (token counts per page vary)
+DEFAULT_CHUNK_WORKERS = 4
 
 def get_gemini_client(api_key_name="GOOGLE_API_KEY"):
-    """Make a genai client from an env var."""
+    """Make a genai client from an env var. In replay mode (see src.replay) no key is needed:
+    Gemini calls are served from fixtures and the local stub client handles file uploads and caches."""
+    if replay.mode() == "replay":
+        from src.gemini_stub import StubGeminiClient
+        return StubGeminiClient()
+    from google import genai
+    from google.genai import types
+    from dotenv import load_dotenv
     load_dotenv()
     api_key = os.getenv(api_key_name)
+    standin_url = os.getenv("URAIT_STANDIN_URL")  # local stand-in server, see src/standin_server.py
+    if standin_url:
+        return genai.Client(api_key=api_key or "standin", http_options=types.HttpOptions(base_url=standin_url))
     client = genai.Client(api_key=api_key)
     return client
 
+### Instrumented Gemini calls (latency, errors and token usage go to src.metrics; concurrency is set by src.limits) ###
+# Every attempt is timed and counted against the service's concurrency limit; transient errors are retried.
+def gemini_count_tokens(client, model, contents):
+    def attempt():
+        with limits.get_limiter("gemini_count_tokens").slot(), metrics.timed("gemini_count_tokens"):
+            return replay.call("gemini_count_tokens", {"model": model, "contents": contents},
+                               lambda: client.models.count_tokens(model=model, contents=contents).total_tokens,
+                               replay.encode_count_tokens, replay.decode_count_tokens)
+    return resilience.call_with_retries(attempt, "gemini_count_tokens")
+
+def gemini_generate(client, model, contents, config=None):
+    scheduler.checkpoint()
+
+    def attempt():
+        with limits.get_limiter("gemini_generate").slot(), metrics.timed("gemini_generate"):
+            return replay.call("gemini_generate", {"model": model, "contents": contents, "config": config},
+                               lambda: client.models.generate_content(model=model, contents=contents, config=config),
+                               replay.encode_generate, replay.decode_generate)
+    response = resilience.call_with_retries(attempt, "gemini_generate")
+    metrics.record_usage("gemini_generate", response)
+    return response
+
+def gemini_embed(client, model, contents, config=None):
+    def attempt():
+        with limits.get_limiter("gemini_embed").slot(), metrics.timed("gemini_embed"):
+            return replay.call("gemini_embed", {"model": model, "contents": contents, "config": config},
+                               lambda: client.models.embed_content(model=model, contents=contents, config=config),
+                               replay.encode_embed, replay.decode_embed)
+    response = resilience.call_with_retries(attempt, "gemini_embed")
+    metrics.inc("gemini_embedded_texts_total", 1 if isinstance(contents, str) else len(contents))
+    return response
+
+### Document fetching ###
+DEFAULT_MAX_DOCUMENT_BYTES = 20 * 1024 * 1024  # inline request limit for Gemini; bigger files are scans or archives
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 30.0
+SUPPORTED_MIME_TYPES = {"application/pdf", "text/html", "text/plain"}
+# header types that say nothing about the content: sniff the bytes instead
+GENERIC_MIME_TYPES = {"", "application/octet-stream", "binary/octet-stream", "application/x-download", "application/force-download", "application/download"}
+_MAGIC_PREFIXES = [
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\xd0\xcf\x11\xe0", "application/msword"),
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"Rar!", "application/x-rar-compressed"),
+]
+
+def _header_mime_type(content_type):
+    mime = (content_type or "").split(";")[0].strip().lower()
+    return "text/html" if mime == "application/xhtml+xml" else mime
+
+def detect_mime_type(data, content_type=""):
+    """Detect the real MIME type of a document from its first bytes, falling back to the Content-Type header."""
+    head = data[:2048]
+    for prefix, mime in _MAGIC_PREFIXES:
+        if head.startswith(prefix):
+            return mime
+    if b"%PDF-" in head[:1024]:  # some servers prepend junk before the PDF header
+        return "application/pdf"
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith((b"<!doctype html", b"<html", b"<head", b"<body")) or b"<html" in text:
+        return "text/html"
+    header = _header_mime_type(content_type)
+    if header not in GENERIC_MIME_TYPES:
+        return header
+    try:
+        # the head may end inside a multi-byte character: only a complete document must end cleanly
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=len(data) < 2048)
+        return "text/plain"
+    except UnicodeDecodeError:
+        return "application/octet-stream"
+
+def fetch_document(url, max_bytes=DEFAULT_MAX_DOCUMENT_BYTES, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+    """Stream a document, rejecting it as early as possible.
+    Checks Content-Type/Content-Length before reading the body, sniffs the MIME type from the first chunk,
+    and aborts once more than max_bytes have arrived.
+    Returns: (bytes, mime_type). Raises ValueError for oversized or unsupported documents."""
+    def attempt():
+        with metrics.timed("fetch"):
+            return replay.call("fetch", {"url": url, "max_bytes": max_bytes},
+                               lambda: _fetch_document(url, max_bytes, connect_timeout, read_timeout),
+                               replay.encode_fetch, replay.decode_fetch)
+    # university servers time out and 5xx a lot: retry those, and skip hosts that keep failing (circuit breaker)
+    data, mime_type = resilience.call_with_retries(attempt, "fetch", host=urlsplit(url).hostname)
+    metrics.inc("fetch_bytes_total", len(data), mime_type=mime_type)
+    return data, mime_type
+
+def _fetch_document(url, max_bytes, connect_timeout, read_timeout):
+    import httpx
+    timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+    with httpx.stream("GET", url, timeout=timeout, follow_redirects=True) as resp:
+        resp.raise_for_status()
+        content_type = resp.headers.get("content-type", "")
+        header_mime = _header_mime_type(content_type)
+        if header_mime not in SUPPORTED_MIME_TYPES and header_mime not in GENERIC_MIME_TYPES:
+            raise ValueError(f"Unsupported Content-Type {header_mime!r} for {url}.")
+        content_length = resp.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise ValueError(f"Document size {int(content_length)} bytes exceeds max_bytes limit of {max_bytes}.")
+
+        chunks, size, mime_type = [], 0, None
+        for chunk in resp.iter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"Document size exceeds max_bytes limit of {max_bytes} (aborted after {size} bytes).")
+            if mime_type is None and size >= 2048:
+                mime_type = detect_mime_type(b"".join(chunks), content_type)
+                if mime_type not in SUPPORTED_MIME_TYPES:
+                    raise ValueError(f"Unsupported document type {mime_type!r} for {url}.")
+    data = b"".join(chunks)
+    if mime_type is None:
+        mime_type = detect_mime_type(data, content_type)
+        if mime_type not in SUPPORTED_MIME_TYPES:
+            raise ValueError(f"Unsupported document type {mime_type!r} for {url}.")
+    return data, mime_type
+
 ### Document parsing utilities ###
-def _generate_from_url(url, prompt, mime_type, client, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, thinking_budget=DEFAULT_THINKING_BUDGET, max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS, max_input_tokens=DEFAULT_MAX_INPUT_TOKENS):
-    """Helper to fetch URL content and generate response from it.
-    Raises ValueError if the fetched document exceeds max_input_tokens (counted via client.models.count_tokens)."""
-    resp = httpx.get(url)
-    resp.raise_for_status()
-    doc_data = resp.content
-
-    token_count = client.models.count_tokens(
-        model=model,
-        contents=[types.Part.from_bytes(data=doc_data, mime_type=mime_type)],
-    ).total_tokens
+class TruncatedResponseError(ValueError):
+    """A structured (JSON) answer was cut off at max_output_tokens."""
+
+def _finish_reason(response):
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return None
+    reason = getattr(candidates[0], "finish_reason", None)
+    return getattr(reason, "name", reason)
+
+def _generate_from_url(url, prompt, client, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, thinking_budget=DEFAULT_THINKING_BUDGET, max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS, max_input_tokens=DEFAULT_MAX_INPUT_TOKENS, max_bytes=DEFAULT_MAX_DOCUMENT_BYTES, page_keywords=None, page_terms=(), split_oversized=False, response_schema=None, merge=None):
+    """Helper to fetch URL content and generate response from it (see load_document and generate_from_document)."""
+    doc_data, mime_type = load_document(url, max_bytes=max_bytes, page_keywords=page_keywords, page_terms=page_terms)
+    return generate_from_document(doc_data, mime_type, prompt, client, model=model, temperature=temperature,
+                                  thinking_budget=thinking_budget, max_output_tokens=max_output_tokens,
+                                  max_input_tokens=max_input_tokens, split_oversized=split_oversized,
+                                  response_schema=response_schema, merge=merge)
+
+def generate_from_document(doc_data, mime_type, prompt, client, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, thinking_budget=DEFAULT_THINKING_BUDGET, max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS, max_input_tokens=DEFAULT_MAX_INPUT_TOKENS, split_oversized=False, response_schema=None, merge=None):
+    """Generate a response from an already loaded document (bytes, mime_type).
+    Raises ValueError if the document exceeds max_input_tokens (counted via client.models.count_tokens) and
+    split_oversized is False. With split_oversized, such documents are split into page ranges (text: line ranges)
+    that are parsed concurrently with the same prompt; the answers are merged with merge
+    (default: merge_list_responses for `;` lists).
+    response_schema: request structured JSON output following this schema instead of free text;
+    raises TruncatedResponseError if an answer stops at max_output_tokens."""
+    from google.genai import types
+    token_count = gemini_count_tokens(client, model, [types.Part.from_bytes(data=doc_data, mime_type=mime_type)])
+
+    config = _generation_config(temperature, max_output_tokens, thinking_budget, response_schema=response_schema)
+
+    def generate(data):
+        response = gemini_generate(client, model, [types.Part.from_bytes(data=data, mime_type=mime_type), prompt], config)
+        if response_schema is not None and _finish_reason(response) == "MAX_TOKENS":
+            raise TruncatedResponseError(f"Structured answer cut off at max_output_tokens={max_output_tokens}.")
+        return response.text
 
     if token_count > max_input_tokens:
-        raise ValueError(f"Document token count {token_count} exceeds max_input_tokens limit of {max_input_tokens}.")
-
-    response = client.models.generate_content(
-        model=model,
-        contents=[
-            types.Part.from_bytes(data=doc_data, mime_type=mime_type),
-            prompt,
-        ],
-        config=types.GenerateContentConfig(temperature=temperature, max_output_tokens=max_output_tokens, thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget)),
-    )
-    return response.text
-
-def parse_pdf(url, prompt, client, model=DEFAULT_MODEL):
-    return _generate_from_url(url, prompt, mime_type="application/pdf", client=client, model=model)
-
-def parse_html(url, prompt, client, model=DEFAULT_MODEL):
-    return _generate_from_url(url, prompt, mime_type="text/html", client=client, model=model)
-
-def parse_document(url, prompt, client, model=DEFAULT_MODEL):
-    """Parse a document from a URL using the given prompt."""
-    if url.endswith(".pdf"):
-        return parse_pdf(url, prompt, client, model=model)
-    elif url.endswith(".html"):
-        return parse_html(url, prompt, client, model=model)
-    else: # still try HTML for other URLs
-        return parse_html(url, prompt, client, model=model)
+        if not split_oversized:
+            raise ValueError(f"Document token count {token_count} exceeds max_input_tokens limit of {max_input_tokens}.")
+        num_chunks = math.ceil(token_count / (max_input_tokens * DEFAULT_CHUNK_FILL))
+        chunks = split_document(doc_data, mime_type, num_chunks)
+        with ThreadPoolExecutor(max_workers=min(DEFAULT_CHUNK_WORKERS, len(chunks))) as ex:
+            return (merge or merge_list_responses)(list(ex.map(scheduler.bind(generate), chunks)))
+
+    return generate(doc_data)
+
+def load_document(url, max_bytes=DEFAULT_MAX_DOCUMENT_BYTES, page_keywords=None, page_terms=()):
+    """Fetch a document and reduce it to what is worth sending (see reduce_document).
+    Returns: (bytes, mime_type)."""
+    doc_data, mime_type = fetch_document(url, max_bytes=max_bytes)
+    return reduce_document(doc_data, mime_type, page_keywords=page_keywords, page_terms=page_terms)
+
+def reduce_document(doc_data, mime_type, page_keywords=None, page_terms=()):
+    """Relevant PDF pages (if page_keywords is given, see pdf_utils.prune_pdf) or the main text of HTML
+    (see html_utils.extract_main_text, sent as text/plain); other documents are returned unchanged.
+    Returns: (bytes, mime_type)."""
+    if page_keywords and mime_type == "application/pdf":
+        doc_data, mime_type = pdf_utils.prune_pdf(doc_data, page_keywords, extra_terms=page_terms)
+    elif mime_type == "text/html":
+        text = html_utils.extract_main_text(doc_data)
+        if text is not None:
+            doc_data, mime_type = text.encode("utf-8"), "text/plain"
+    return doc_data, mime_type
+
+def _generation_config(temperature=DEFAULT_TEMPERATURE, max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS, thinking_budget=DEFAULT_THINKING_BUDGET, cached_content=None, response_schema=None):
+    from google.genai import types
+    return types.GenerateContentConfig(temperature=temperature, max_output_tokens=max_output_tokens,
+                                       thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
+                                       cached_content=cached_content,
+                                       response_mime_type="application/json" if response_schema is not None else None,
+                                       response_schema=response_schema)
+
+def split_document(doc_data, mime_type, num_chunks):
+    """Split a document into num_chunks parts: page ranges for PDFs, line ranges for text."""
+    if mime_type == "application/pdf":
+        return [chunk for _, _, chunk in pdf_utils.split_pdf(doc_data, num_chunks)]
+    lines = doc_data.decode("utf-8", errors="replace").splitlines(keepends=True)
+    size = math.ceil(len(lines) / num_chunks) or 1
+    return ["".join(lines[i:i + size]).encode("utf-8") for i in range(0, len(lines), size)]
+
+def merge_list_responses(texts, separator=";"):
+    """Merge `;`-separated list answers from several chunks: order-preserving, case-insensitive de-duplication.
+    Returns "None" if no chunk found anything (same convention as a single-document answer)."""
+    merged = {}
+    for text in texts:
+        for item in re.split(rf"\s*{re.escape(separator)}\s*", text or ""):
+            item = item.strip()
+            if item and item.lower() != "none":
+                merged.setdefault(item.lower(), item)
+    return "; ".join(merged.values()) if merged else "None"
+
+def parse_document(url, prompt, client, model=DEFAULT_MODEL, page_keywords=None, page_terms=(), split_oversized=False):
+    """Parse a document from a URL using the given prompt. The document type is detected from its content.
+    page_keywords/page_terms: optional keyword sets to send only the relevant pages of a PDF.
+    split_oversized: parse documents over the token limit in chunks (only for prompts answering with a `;`-separated list)."""
+    return _generate_from_url(url, prompt, client=client, model=model,
+                              page_keywords=page_keywords, page_terms=page_terms, split_oversized=split_oversized)
+
+def parse_document_structured(url, prompt, client, response_schema, model=DEFAULT_MODEL, max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS,
+                              page_keywords=None, page_terms=(), merge=None):
+    """Parse a document into JSON following response_schema (structured output). Returns the parsed JSON.
+    Documents over the token limit are parsed in chunks if a merge function (list of JSON strings -> JSON string) is given.
+    Raises TruncatedResponseError if the answer is cut off, json.JSONDecodeError if it is not valid JSON."""
+    text = _generate_from_url(url, prompt, client=client, model=model, max_output_tokens=max_output_tokens,
+                              page_keywords=page_keywords, page_terms=page_terms, split_oversized=merge is not None,
+                              response_schema=response_schema, merge=merge)
+    return json.loads(text)
+
+### Document sessions ###
+SESSION_DISPLAY_PREFIX = "urait-session"
+DEFAULT_SESSION_TTL = 600  # seconds; the cache outlives a session only if close() is never reached
+DEFAULT_SESSION_WORKERS = 4
+
+class DocumentSession:
+    """One document, many prompts: the document is fetched, preprocessed and uploaded once (Files API),
+    then put in an explicit context cache so every prompt is billed and sent without the document bytes.
+    Documents too small for caching (or models without cache support) fall back to referencing the uploaded file.
+
+        with utils.DocumentSession(url, client) as session:
+            answers = session.generate_many(prompts)
+
+    Works with any client exposing the genai surface used here (models/files/caches), e.g. gemini_stub.StubGeminiClient."""
+
+    def __init__(self, url, client, model=DEFAULT_MODEL, page_keywords=None, page_terms=(), ttl=DEFAULT_SESSION_TTL,
+                 max_bytes=DEFAULT_MAX_DOCUMENT_BYTES, max_input_tokens=DEFAULT_MAX_INPUT_TOKENS):
+        from google.genai import types
+        self.url, self.client, self.model, self.ttl = url, client, model, ttl
+        self.file, self.cache = None, None
+        doc_data, self.mime_type = load_document(url, max_bytes=max_bytes, page_keywords=page_keywords, page_terms=page_terms)
+        self.token_count = gemini_count_tokens(client, model, [types.Part.from_bytes(data=doc_data, mime_type=self.mime_type)])
+        if self.token_count > max_input_tokens:
+            raise ValueError(f"Document token count {self.token_count} exceeds max_input_tokens limit of {max_input_tokens}.")
+
+        doc_digest = replay.digest(doc_data)
+        display_name = f"{SESSION_DISPLAY_PREFIX}-{doc_digest[:16]}"
+        self.file = client.files.upload(
+            file=io.BytesIO(doc_data),
+            config=types.UploadFileConfig(mime_type=self.mime_type, display_name=display_name),
+        )
+        replay.alias(self.file.uri, doc_digest)  # replayed sessions upload under other names
+        self.document_part = types.Part.from_uri(file_uri=self.file.uri, mime_type=self.mime_type)
+        def create_cache():
+            return client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    contents=[types.Content(role="user", parts=[self.document_part])],
+                    ttl=f"{int(ttl)}s",
+                    display_name=display_name,
+                ),
+            )
+
+        try:
+            # recorded too, so that a replayed session takes the same cache-or-file path as the recording
+            self.cache = replay.call("gemini_cache_create", {"model": model, "document": doc_digest}, create_cache,
+                                     replay.encode_cache, replay.decode_cache)
+            replay.alias(self.cache.name, doc_digest)
+        except Exception:
+            self.cache = None  # below the model's minimum cache size, or caching unsupported: use the file directly
+
+    def generate(self, prompt, temperature=DEFAULT_TEMPERATURE, thinking_budget=DEFAULT_THINKING_BUDGET, max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS):
+        """Answer one prompt against the session document."""
+        if self.cache is not None:
+            contents = [prompt]
+            config = _generation_config(temperature, max_output_tokens, thinking_budget, cached_content=self.cache.name)
+        else:
+            contents = [self.document_part, prompt]
+            config = _generation_config(temperature, max_output_tokens, thinking_budget)
+        metrics.record_cache("gemini_context", hit=self.cache is not None)
+        return gemini_generate(self.client, self.model, contents, config).text
+
+    def generate_many(self, prompts, max_workers=DEFAULT_SESSION_WORKERS, return_exceptions=False, **kwargs):
+        """Answer prompts concurrently. Returns answers in prompt order; with return_exceptions,
+        a failed prompt yields its exception in place of the answer instead of raising."""
+        def run(prompt):
+            try:
+                return self.generate(prompt, **kwargs)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        prompts = list(prompts)
+        if not prompts:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as ex:
+            return list(ex.map(scheduler.bind(run), prompts))
+
+    def close(self):
+        """Delete the cache and the uploaded file (errors are ignored: both expire on their own)."""
+        if self.cache is not None:
+            try:
+                self.client.caches.delete(name=self.cache.name)
+            except Exception:
+                pass
+            self.cache = None
+        if self.file is not None:
+            try:
+                self.client.files.delete(name=self.file.name)
+            except Exception:
+                pass
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def cleanup_document_sessions(client, max_age=DEFAULT_SESSION_TTL):
+    """Delete caches and files left behind by DocumentSessions that were never closed (crashed or killed runs):
+    everything with the session display-name prefix that has expired or is older than max_age seconds.
+    Returns: number of deleted objects."""
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=max_age)
+
+    def stale(obj, expire_time):
+        if not (obj.display_name or "").startswith(SESSION_DISPLAY_PREFIX):
+            return False
+        return (expire_time is not None and expire_time <= now) or (obj.create_time is not None and obj.create_time <= cutoff)
+
+    deleted = 0
+    for cache in client.caches.list():
+        if stale(cache, cache.expire_time):
+            try:
+                client.caches.delete(name=cache.name)
+                deleted += 1
+            except Exception:
+                pass
+    for file in client.files.list():
+        if stale(file, file.expiration_time):
+            try:
+                client.files.delete(name=file.name)
+                deleted += 1
+            except Exception:
+                pass
+    return deleted
 
 ### Embedding-related utilities ###
 def embed_text(text, client, model="gemini-embedding-001", output_dimensionality=768):
     """Embed text using the specified embedding model."""
-    response = client.models.embed_content(
-        model=model,
-        contents=text,
-        config=types.EmbedContentConfig(output_dimensionality=output_dimensionality))
+    from google.genai import types
+    import numpy as np
+    response = gemini_embed(client, model, text, types.EmbedContentConfig(output_dimensionality=output_dimensionality))
     embedding = np.array(response.embeddings[0].values, dtype=float)
     embedding = embedding / np.linalg.norm(embedding)
     return embedding
 
+EMBED_BATCH_SIZE = 100  # max contents per embed_content request
+
+def embed_texts(texts, client, model="gemini-embedding-001", output_dimensionality=768, batch_size=EMBED_BATCH_SIZE):
+    """Embed a list of texts with one embed_content call per batch.
+    Returns: np.ndarray of shape (len(texts), output_dimensionality), rows L2-normalised."""
+    from google.genai import types
+    import numpy as np
+    vecs = []
+    for start in range(0, len(texts), batch_size):
+        response = gemini_embed(client, model, list(texts[start:start + batch_size]),
+                                types.EmbedContentConfig(output_dimensionality=output_dimensionality))
+        vecs.extend(e.values for e in response.embeddings)
+    embeddings = np.array(vecs, dtype=np.float32).reshape(len(texts), output_dimensionality)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
 def load_course_embeddings(npz_path="course_embeddings/course_embeddings.npz"):
     """Load course embeddings from disk into a dict of id -> embedding.
     
     TODO: switch to a better storage format, maybe just store in the same CSV as courses."""
+    import numpy as np
     with np.load(npz_path) as data:
         loaded_ids = data["ids"].astype(int)
         vecs = data["embeddings"].astype(float)
@@ -86,11 +442,85 @@ def get_most_similar(embedding, embeddings, top_k=5):
     """Get the top_k most similar course ids to the given embedding.
     embeddings: np.ndarray of shape (num_courses, embedding_dim)
     Returns: List of indices of the most similar courses and their similarity scores."""
+    import numpy as np
     sims = embeddings @ embedding
     top_indices = np.argsort(sims)[-top_k:][::-1]
     top_scores = sims[top_indices]
     return top_indices, top_scores
-    
+
+def batch_top_k(queries, embeddings, top_k=5, chunk_size=1024):
+    """Top_k most similar rows of embeddings for every row of queries, one matrix multiply per chunk of queries.
+    queries: np.ndarray of shape (num_queries, embedding_dim); embeddings: (num_courses, embedding_dim)
+    Returns: (indices, scores), both of shape (num_queries, top_k), best match first."""
+    import numpy as np
+    queries = np.asarray(queries, dtype=np.float32)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    top_k = min(top_k, embeddings.shape[0])
+    all_indices = np.empty((queries.shape[0], top_k), dtype=np.int64)
+    all_scores = np.empty((queries.shape[0], top_k), dtype=np.float32)
+    for start in range(0, queries.shape[0], chunk_size):
+        sims = queries[start:start + chunk_size] @ embeddings.T
+        part = np.argpartition(-sims, top_k - 1, axis=1)[:, :top_k]
+        part_scores = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_scores, axis=1)
+        all_indices[start:start + chunk_size] = np.take_along_axis(part, order, axis=1)
+        all_scores[start:start + chunk_size] = np.take_along_axis(part_scores, order, axis=1)
+    return all_indices, all_scores
+
+DEFAULT_PREFIX_DIM = 256  # gemini-embedding-001 is Matryoshka-trained: its leading dimensions are an embedding too
+DEFAULT_SHORTLIST = 32    # stage-1 candidates per query rescored at full dimension
+
+def truncate_embeddings(embeddings, dim):
+    """Leading `dim` columns of embeddings, rows re-normalised (what output_dimensionality=dim would return).
+    Returns: C-contiguous float32 array of shape (n, dim)."""
+    import numpy as np
+    prefix = np.array(np.asarray(embeddings, dtype=np.float32)[..., :dim], dtype=np.float32, order='C')
+    norms = np.linalg.norm(prefix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    prefix /= norms
+    return prefix
+
+def two_stage_top_k(queries, embeddings, top_k=5, prefix=None, prefix_dim=DEFAULT_PREFIX_DIM, shortlist=DEFAULT_SHORTLIST,
+                    chunk_size=1024, rescore_chunk_size=32):
+    """batch_top_k that scans a truncated copy of embeddings and rescores only a shortlist at full dimension.
+    prefix: truncate_embeddings(embeddings, prefix_dim), precomputed by callers that search the same matrix repeatedly.
+    Returns: (indices, scores) like batch_top_k, scores at full dimension. Matches exact search wherever the true
+    top_k are in the shortlist; see `python -m benchmarks.matryoshka` for recall against exact search."""
+    import numpy as np
+    queries = np.asarray(queries, dtype=np.float32)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if prefix is None:
+        prefix = truncate_embeddings(embeddings, prefix_dim)
+    top_k = min(top_k, embeddings.shape[0])
+    shortlist = min(max(shortlist, top_k), embeddings.shape[0])
+    candidates, _ = batch_top_k(truncate_embeddings(queries, prefix.shape[1]), prefix, top_k=shortlist, chunk_size=chunk_size)
+
+    all_indices = np.empty((queries.shape[0], top_k), dtype=np.int64)
+    all_scores = np.empty((queries.shape[0], top_k), dtype=np.float32)
+    for start in range(0, queries.shape[0], rescore_chunk_size):
+        cand = candidates[start:start + rescore_chunk_size]
+        sims = np.einsum('qsd,qd->qs', embeddings[cand], queries[start:start + rescore_chunk_size])
+        order = np.argsort(-sims, axis=1)[:, :top_k]
+        all_indices[start:start + rescore_chunk_size] = np.take_along_axis(cand, order, axis=1)
+        all_scores[start:start + rescore_chunk_size] = np.take_along_axis(sims, order, axis=1)
+    return all_indices, all_scores
+
+
+### Course catalogue ###
+def load_project_subjects(path="data/download/project_subjects.csv"):
+    """Raw Urait export: one row per (project, subject)."""
+    import pandas as pd
+    return pd.read_csv(path, sep=';', encoding='utf-8-sig', na_values=['NULL'], engine='python')
+
+def aggregate_courses(subjects_df):
+    """One row per project_id with its subject short names joined into `topics`."""
+    agg_dict = {col: 'first' for col in subjects_df.columns if col not in ['project_id', 'subject_short_name']}
+    agg_dict['subject_short_name'] = lambda x: ', '.join(x.dropna().astype(str).unique())
+    courses_df = subjects_df.groupby('project_id', as_index=False).agg(agg_dict)
+    courses_df = courses_df.rename(columns={'subject_short_name': 'topics', 'fname': 'university'})
+    courses_df = courses_df.drop(columns=['subject_name', 'subject_id', 'parent_subject_id', 'fcode', 'l_key', 'r_key', 'level', 'subject_page'])
+    return courses_df.reset_index(drop=True)
+
 
 ### Course-discipline suitability determination ###
 SCHEMA = {
@@ -138,15 +568,11 @@ def determine_course_suitability(speciality, discipline_name, discipline_topics,
 
     prompt = main_prompt + schema
 
-    response = client.models.generate_content(
-        model=model,
-        contents=[prompt],
-        config={
-            "temperature": 0.2,
-            "response_mime_type": "application/json",
-            "response_schema": SCHEMA,
-        },
-    )
+    response = gemini_generate(client, model, [prompt], config={
+        "temperature": 0.2,
+        "response_mime_type": "application/json",
+        "response_schema": SCHEMA,
+    })
 
     try:
         text = response.text.strip()
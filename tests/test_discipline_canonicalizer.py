@@ -0,0 +1,35 @@
+import numpy as np
+
+import src.discipline_canonicalizer as discipline_canonicalizer
+
+def _embed_fn(angles):
+    """Unit vectors at the given angles (degrees) per normal form: cosine = cos of the angle between them."""
+    def embed(keys):
+        return np.array([[np.cos(np.radians(angles[k])), np.sin(np.radians(angles[k]))] for k in keys])
+    return embed
+
+# «мат анализ», «матем анализ» and «математический анализ» share token prefixes, so all three pairs are candidates
+NAMES = {"математический анализ": 5, "матем анализ": 2, "мат анализ": 1}
+
+def test_chained_pairs_do_not_merge_dissimilar_names():
+    # A~B and B~C pass 0.9 (cos 20° = 0.94), A~C does not (cos 40° = 0.77)
+    angles = {"математический анализ": 0, "матем анализ": 20, "мат анализ": 40}
+    canonical_map = discipline_canonicalizer.build_canonical_map(
+        list(NAMES), counts=NAMES, embed_fn=_embed_fn(angles), cosine_threshold=0.9, verbose=False)
+    assert canonical_map == {"матем анализ": "математический анализ"}
+
+def test_threshold_decides_merges():
+    angles = {"математический анализ": 0, "матем анализ": 30, "мат анализ": 180}  # cos 30° = 0.87
+    kwargs = dict(counts=NAMES, embed_fn=_embed_fn(angles), verbose=False)
+    assert discipline_canonicalizer.build_canonical_map(list(NAMES), cosine_threshold=0.9, **kwargs) == {}
+    assert discipline_canonicalizer.build_canonical_map(list(NAMES), cosine_threshold=0.85, **kwargs) == {
+        "матем анализ": "математический анализ"}
+
+def test_identical_normal_forms_merge_without_embeddings():
+    counts = {"Алгебра": 3, "алгебра (часть 1)": 1, "Алгебра-2": 1}
+    canonical_map = discipline_canonicalizer.build_canonical_map(list(counts), counts=counts, verbose=False)
+    assert canonical_map == {"алгебра (часть 1)": "Алгебра", "Алгебра-2": "Алгебра"}
+
+def test_complete_linkage_needs_every_cross_pair():
+    assert discipline_canonicalizer.complete_linkage_clusters(3, [(0, 1), (1, 2)]) == [0, 0, 2]
+    assert discipline_canonicalizer.complete_linkage_clusters(3, [(0, 1), (1, 2), (0, 2)]) == [0, 0, 0]
@@ -0,0 +1,43 @@
+import pandas as pd
+
+import src.discipline_store as discipline_store
+
+ROWS = [
+    {"speciality_code": "01.03.01", "speciality_name": "Математика", "university": "МГУ",
+     "study_plan_url": "https://msu.ru/plan.pdf", "disciplines": "Алгебра; Геометрия"},
+    {"speciality_code": "01.03.02", "speciality_name": "Прикладная математика", "university": "СПбГУ",
+     "study_plan_url": "https://spbu.ru/plan.pdf", "disciplines": "Алгебра"},
+]
+
+def _store(tmp_path):
+    return discipline_store.DisciplinePopularityStore(str(tmp_path / "pop.sqlite"),
+                                                      students_map={"МГУ": 100, "СПбГУ": 50})
+
+def test_re_adding_rows_is_a_no_op(tmp_path):
+    store = _store(tmp_path)
+    assert store.add_study_plan_rows(ROWS) == 3
+    assert store.add_study_plan_rows(ROWS) == 0
+    df = store.to_dataframe().set_index("discipline")
+    assert df.loc["алгебра", "total_students_amount"] == 150
+    assert df.loc["алгебра", "num_distinct_university"] == 2
+    assert df.loc["геометрия", "university"] == ["МГУ"]
+    assert list(df.index) == ["алгебра", "геометрия"]  # most students first
+
+def test_clear_drops_occurrences_but_keeps_search_counts(tmp_path):
+    store = _store(tmp_path)
+    store.set_search_counts(pd.DataFrame({"query": ["Алгебра "], "search_count": [7]}))
+    store.add_study_plan_rows(ROWS)
+    store.clear()
+    assert store.to_dataframe().empty and store.occurrences_dataframe().empty
+    assert store.add_study_plan_rows(ROWS[1:]) == 1  # counted again after a clear
+    assert store.to_dataframe().set_index("discipline").loc["алгебра", "search_count"] == 7
+
+def test_export_csv_writes_the_aggregate(tmp_path):
+    store = _store(tmp_path)
+    store.add_study_plan_rows(ROWS)
+    filename = str(tmp_path / "popularity.csv")
+    store.export_csv(filename)
+    df = pd.read_csv(filename, sep=";")
+    assert list(df.columns) == discipline_store.POPULARITY_COLUMNS
+    assert df["discipline"].tolist() == ["алгебра", "геометрия"]
+    assert not (tmp_path / "popularity.csv.tmp").exists()
@@ -0,0 +1,66 @@
+import io
+
+import pytest
+
+import src.utils as utils
+from src.gemini_stub import StubGeminiClient
+
+LARGE_DOCUMENT = ("Рабочая программа дисциплины. Тема 1. Группы и кольца. " * 200).encode("utf-8")  # above the cache minimum
+SMALL_DOCUMENT = "Тема 1. Группы.".encode("utf-8")
+
+@pytest.fixture
+def serve_document(monkeypatch):
+    def serve(data):
+        monkeypatch.setattr(utils, "_fetch_document", lambda url, *args: (data, "text/plain"))
+    return serve
+
+def _client():
+    return StubGeminiClient(lambda prompt, document: f"{prompt}: {len(document)}")
+
+def test_session_uploads_once_caches_and_fans_out(serve_document):
+    serve_document(LARGE_DOCUMENT)
+    client = _client()
+    prompts = [f"Темы дисциплины {i}" for i in range(6)]
+    with utils.DocumentSession("https://example.ru/rpd.txt", client) as session:
+        assert len(client.files.items) == 1
+        assert len(client.caches.items) == 1
+        answers = session.generate_many(prompts)
+        cache_name = session.cache.name
+
+    assert answers == [f"{p}: {len(LARGE_DOCUMENT)}" for p in prompts]
+    assert sorted(c["prompt"] for c in client.calls) == sorted(prompts)
+    assert all(c["cached_content"] == cache_name for c in client.calls)
+    assert client.files.items == {} and client.caches.items == {}  # close() deleted both
+
+def test_small_document_references_the_uploaded_file(serve_document):
+    serve_document(SMALL_DOCUMENT)
+    client = _client()
+    session = utils.DocumentSession("https://example.ru/rpd.txt", client)
+    assert session.cache is None and len(client.files.items) == 1
+    assert session.generate("Темы") == f"Темы: {len(SMALL_DOCUMENT)}"
+    assert client.calls[0]["cached_content"] is None
+    session.close()
+    assert client.files.items == {}
+
+def test_generate_many_return_exceptions(serve_document):
+    serve_document(LARGE_DOCUMENT)
+
+    def respond(prompt, document):
+        if prompt == "bad":
+            raise RuntimeError("boom")
+        return "ok"
+
+    client = StubGeminiClient(respond)
+    with utils.DocumentSession("https://example.ru/rpd.txt", client) as session:
+        answers = session.generate_many(["good", "bad"], return_exceptions=True)
+    assert answers[0] == "ok" and isinstance(answers[1], RuntimeError)
+
+def test_cleanup_deletes_only_stale_session_objects(serve_document):
+    serve_document(LARGE_DOCUMENT)
+    client = _client()
+    utils.DocumentSession("https://example.ru/rpd.txt", client)  # never closed, as in a crashed run
+    other = client.files.upload(file=io.BytesIO(b"data"), config=None)
+
+    assert utils.cleanup_document_sessions(client, max_age=3600) == 0  # still fresh
+    assert utils.cleanup_document_sessions(client, max_age=0) == 2
+    assert list(client.files.items) == [other.name] and client.caches.items == {}
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+import src.gap_analysis as gap_analysis
+import src.utils as utils
+
+def test_failed_check_is_unchecked_not_a_gap(tmp_path, monkeypatch):
+    disciplines = pd.DataFrame({"speciality_name": ["Математика"] * 2, "discipline_name": ["Алгебра", "Геометрия"],
+                                "topics": ["Группы", "Аффинные пространства"]})
+    courses = pd.DataFrame({"project_id": [1, 2], "project_name": ["Алгебра", "Геометрия"], "topics": ["", ""]})
+    course_embeddings = np.eye(2, dtype=np.float32)
+    discipline_embeddings = np.array([[0.75, 0.66], [0.66, 0.75]], dtype=np.float32)  # both uncertain
+
+    def suitability(speciality_name, discipline_name, *args):
+        if discipline_name == "Алгебра":
+            raise RuntimeError("timeout")
+        return {"answer": "Нет", "explanation": "другой курс"}
+
+    monkeypatch.setattr(utils, "determine_course_suitability", suitability)
+    coverage = gap_analysis.run_gap_analysis(disciplines, discipline_embeddings, courses, course_embeddings, None,
+                                             cache_path=str(tmp_path / "checks.jsonl"), top_k=1)
+    algebra, geometry = coverage.to_dict("records")
+    assert algebra["status"] == "unchecked" and pd.isna(algebra["decided_by"])
+    assert geometry["status"] == "gap" and geometry["decided_by"] == "llm"
+    assert list(gap_analysis.load_check_cache(str(tmp_path / "checks.jsonl"))) == ["Математика|Геометрия|2"]
@@ -0,0 +1,12 @@
+from src.html_utils import html_to_text
+
+def test_drops_site_chrome():
+    html = """<html><body><nav>Главная</nav><div class="header">Шапка</div><div id="sidebar">Меню</div>
+    <ul class="menu top"><li>Пункт</li></ul><div role="navigation">Ссылки</div><p>Учебный план</p></body></html>"""
+    assert html_to_text(html) == "Учебный план"
+
+def test_keeps_content_with_chrome_like_class_names():
+    html = """<html><body><div class="page-header"><h1>Учебный план</h1></div>
+    <table class="table-header menu"><tr><td>Алгебра</td><td>4</td></tr></table>
+    <div class="menu-content"><p>Геометрия</p></div></body></html>"""
+    assert html_to_text(html).splitlines() == ["Учебный план", "Алгебра | 4", "Геометрия"]
@@ -0,0 +1,50 @@
+"""Import-time budget: pipeline workers and CLIs must start fast, so heavy libraries are imported on first use."""
+import subprocess
+import sys
+
+import pytest
+
+# cumulative import time of one module, as a fraction of `import pandas` measured right after it in the same
+# interpreter, so a slow or busy machine slows both; test_no_heavy_imports is the strict guard
+IMPORT_BUDGET_FRACTION = 0.5
+REFERENCE_MODULE = "pandas"
+HEAVY_MODULES = ("google.genai", "numpy", "pandas", "httpx", "requests", "tldextract")
+
+MODULES = [
+    "src.url_utils",
+    "src.utils",
+    "src.google_search",
+    "src.pipeline_utils",
+    "src.scheduler",
+    "src.result_sink",
+    "src.matching",
+    "src.matching_service",
+    "src.bulk_match",
+]
+
+def _run(code):
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, check=True)
+
+def _cumulative_seconds(module, stderr):
+    """Cumulative time of `module` from `python -X importtime` output ('import time: self | cumulative | name')."""
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6
+    raise AssertionError(f"{module} not in -X importtime output")
+
+def _relative_import_time(module):
+    stderr = _run(f"import {module}; import {REFERENCE_MODULE}").stderr
+    return _cumulative_seconds(module, stderr) / _cumulative_seconds(REFERENCE_MODULE, stderr)
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_budget(module):
+    fraction = _relative_import_time(module)
+    assert fraction < IMPORT_BUDGET_FRACTION, f"import {module} took {fraction:.0%} of import {REFERENCE_MODULE}"
+
+@pytest.mark.parametrize("module", MODULES)
+def test_no_heavy_imports(module):
+    code = f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    loaded = _run(code).stdout.split()
+    assert not loaded, f"import {module} pulled in {', '.join(loaded)}"
@@ -0,0 +1,25 @@
+import pytest
+
+import src.limits as limits
+
+class TooManyRequests(Exception):
+    status_code = 429
+
+def test_slot_is_released_on_base_exceptions():
+    limiter = limits.AIMDLimiter("test", initial=1)
+    with pytest.raises(KeyboardInterrupt):
+        with limiter.slot():
+            raise KeyboardInterrupt
+    assert limiter.in_flight == 0 and limiter.limit == 1
+    with limiter.slot():  # would block forever if the slot had leaked
+        assert limiter.in_flight == 1
+
+def test_rate_limited_calls_cut_the_limit_and_successes_raise_it():
+    limiter = limits.AIMDLimiter("test", initial=8, decrease=0.5)
+    with pytest.raises(TooManyRequests):
+        with limiter.slot():
+            raise TooManyRequests
+    assert limiter.limit == 4 and limiter.in_flight == 0
+    with limiter.slot():
+        pass
+    assert limiter.limit == 4.25
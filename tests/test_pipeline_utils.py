@@ -0,0 +1,44 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import src.pipeline_utils as pipeline_utils
+import src.utils as utils
+from src.gemini_stub import StubGeminiClient
+
+PLAN = "Учебный план. Математический анализ; Алгебра; Геометрия.".encode("utf-8")
+ANNOTATED_PLAN = PLAN + " Аннотации дисциплин. Содержание дисциплины: пределы, ряды.".encode("utf-8")
+TOPICS_ANSWER = json.dumps({"disciplines": [{"discipline_name": "Математический анализ", "topics": ["Пределы", "Ряды"]},
+                                            {"discipline_name": "Алгебра", "topics": []}]}, ensure_ascii=False)
+
+@pytest.fixture
+def run(monkeypatch):
+    def run(document, structured_answer):
+        def respond(prompt, doc):
+            return structured_answer if "educational programme" in prompt else "Математический анализ; Алгебра; "
+        client = StubGeminiClient(respond)
+        monkeypatch.setattr(utils, "_fetch_document", lambda url, *args: (document, "text/plain"))
+        monkeypatch.setattr(utils, "get_gemini_client", lambda *a, **kw: client)
+        result = pipeline_utils.extract_discipline_names("https://example.ru/plan", "Математика", with_topics=True)
+        return result, ["educational programme" in c["prompt"] for c in client.calls]
+    return run
+
+def test_annotated_plan_takes_structured_call(run):
+    result, structured = run(ANNOTATED_PLAN, TOPICS_ANSWER)
+    assert result == {"Математический анализ": ["Пределы", "Ряды"], "Алгебра": []}
+    assert structured == [True]
+
+def test_plan_without_annotations_gets_names_only(run):
+    result, structured = run(PLAN, TOPICS_ANSWER)
+    assert result == {"Математический анализ": [], "Алгебра": []}
+    assert structured == [False]
+
+@pytest.mark.parametrize("answer", [
+    TOPICS_ANSWER[:40],  # malformed
+    SimpleNamespace(text=TOPICS_ANSWER, candidates=[SimpleNamespace(finish_reason="MAX_TOKENS")]),  # cut off
+])
+def test_unusable_structured_answer_falls_back_to_names(run, answer):
+    result, structured = run(ANNOTATED_PLAN, answer)
+    assert list(result) == ["Математический анализ", "Алгебра"]
+    assert structured == [True, False]
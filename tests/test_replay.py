@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import pytest
+
+import src.replay as replay
+import src.resilience as resilience
+
+class ServiceUnavailable(Exception):
+    code = 503  # like genai.errors.APIError
+
+@pytest.fixture
+def fixture_dir(tmp_path):
+    yield str(tmp_path)
+    replay.configure(mode="off")
+
+def _generate(live):
+    return replay.call("gemini_generate", {"model": "m", "contents": ["Темы"]}, live,
+                       replay.encode_generate, replay.decode_generate)
+
+def _search(live):
+    return replay.call("search", {"q": "учебный план"}, live, replay.encode_search, replay.decode_search)
+
+def _fail(exc):
+    def live():
+        raise exc
+    return live
+
+def test_record_then_replay_success_and_errors(fixture_dir):
+    replay.configure(mode="record", fixture_dir=fixture_dir)
+    response = SimpleNamespace(text="Группы; Кольца", usage_metadata=None,
+                               candidates=[SimpleNamespace(finish_reason=SimpleNamespace(name="STOP"))])
+    assert _generate(lambda: response) is response
+    with pytest.raises(ServiceUnavailable):
+        _search(_fail(ServiceUnavailable("overloaded")))
+    with pytest.raises(TimeoutError):
+        replay.call("fetch", {"url": "https://univ.ru/plan.pdf"}, _fail(TimeoutError("read timed out")),
+                    replay.encode_fetch, replay.decode_fetch)
+
+    replay.configure(mode="replay", fixture_dir=fixture_dir)
+    replayed = _generate(lambda: pytest.fail("replay must not call the network"))
+    assert replayed.text == "Группы; Кольца" and replayed.candidates[0].finish_reason == "STOP"
+
+    with pytest.raises(replay.ReplayedError) as info:
+        _search(lambda: pytest.fail("replay must not call the network"))
+    assert info.value.status_code == 503 and resilience.classify(info.value) == resilience.TRANSIENT
+
+    with pytest.raises(replay.ReplayedError) as info:
+        replay.call("fetch", {"url": "https://univ.ru/plan.pdf"}, lambda: None, replay.encode_fetch, replay.decode_fetch)
+    assert resilience.classify(info.value) == resilience.TRANSIENT
+
+    with pytest.raises(replay.FixtureMissing):
+        replay.call("search", {"q": "другой запрос"}, lambda: None, replay.encode_search, replay.decode_search)
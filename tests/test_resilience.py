@@ -0,0 +1,81 @@
+import pytest
+
+import src.resilience as resilience
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+def test_breaker_opens_after_threshold_failures(clock):
+    breaker = resilience.CircuitBreaker("univ.ru", failure_threshold=3, cooldown=60)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record(failed=True)
+    breaker.before_call()  # still closed below the threshold
+    breaker.record(failed=True)
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()
+
+def test_breaker_half_open_lets_one_trial_through_then_closes(clock):
+    breaker = resilience.CircuitBreaker("univ.ru", failure_threshold=1, cooldown=60)
+    breaker.record(failed=True)
+    clock.now += 61
+    breaker.before_call()  # half-open: the trial call
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()  # a second caller while the trial is in flight
+    breaker.record(failed=False)
+    assert breaker.opened_at is None and breaker.failures == 0
+    breaker.before_call()
+
+def test_breaker_failed_trial_reopens_for_a_full_cooldown(clock):
+    breaker = resilience.CircuitBreaker("univ.ru", failure_threshold=1, cooldown=60)
+    breaker.record(failed=True)
+    clock.now += 61
+    breaker.before_call()
+    breaker.record(failed=True)
+    clock.now += 30
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()
+    clock.now += 31
+    breaker.before_call()
+
+def test_call_with_retries_stops_when_the_budget_is_exhausted(clock):
+    budget = resilience.RetryBudget(ratio=0.0, min_per_second=0.0, max_tokens=2)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise TimeoutError("slow server")
+
+    with pytest.raises(TimeoutError):
+        resilience.call_with_retries(fail, "test", max_attempts=10, budget=budget)
+    assert len(calls) == 3  # the first attempt plus the two retries the budget allowed
+    assert len(clock.sleeps) == 2
+    with pytest.raises(TimeoutError):
+        resilience.call_with_retries(fail, "test", max_attempts=10, budget=budget)
+    assert len(calls) == 4  # no tokens left: not retried at all
+
+def test_permanent_errors_are_not_retried(clock):
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ValueError("unsupported document")
+
+    with pytest.raises(ValueError):
+        resilience.call_with_retries(fail, "test", budget=resilience.RetryBudget())
+    assert len(calls) == 1 and clock.sleeps == []
@@ -0,0 +1,32 @@
+import sqlite3
+
+import pytest
+
+import src.result_sink as result_sink
+
+ROW = {"speciality_code": "01.03.01", "speciality_name": "Математика", "university": "МГУ",
+       "study_plan_url": "https://msu.ru/plan.pdf", "disciplines": "Алгебра; Геометрия"}
+
+def _count(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM study_plans").fetchone()[0]
+
+def test_failed_batch_is_kept_and_retried(tmp_path):
+    path = str(tmp_path / "out.sqlite")
+    sink = result_sink.ResultSink(path, "study_plans", flush_interval=0.05)
+    insert, sink._insert = sink._insert, "INSERT INTO missing_table VALUES (?)"
+    sink.write([ROW, ROW])
+    with pytest.raises(sqlite3.OperationalError):
+        sink.flush()
+    sink.write([ROW])  # later writes are not blamed for the failed batch
+    sink._insert = insert
+    sink.flush()
+    sink.close()
+    assert sink.written == 3 and _count(path) == 3
+
+def test_close_raises_if_rows_could_not_be_written(tmp_path):
+    sink = result_sink.ResultSink(str(tmp_path / "out.sqlite"), "study_plans")
+    sink._insert = "INSERT INTO missing_table VALUES (?)"
+    sink.write([ROW])
+    with pytest.raises(sqlite3.OperationalError):
+        sink.close()
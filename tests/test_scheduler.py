@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import src.scheduler as scheduler
+
+def _running(sched, *ranks):
+    tasks = [scheduler._Task(rank, f"unit{rank}", 10.0 - rank, ()) for rank in ranks]
+    sched.running.update({t.rank: t for t in tasks})
+    return {t.rank: t for t in tasks}
+
+def test_can_start_reserves_quota_for_running_units():
+    sched = scheduler.PriorityScheduler(2, quota=100, expected_cost=30)
+    assert sched._can_start()
+    _running(sched, 0, 1)
+    assert sched._can_start()  # 100 - 2 * 30 left
+    _running(sched, 2)
+    assert not sched._can_start()  # 10 left, less than one unit
+    assert scheduler.PriorityScheduler(2)._can_start()  # no quota
+
+def test_rebalance_serves_highest_priority_first():
+    sched = scheduler.PriorityScheduler(3, quota=70, expected_cost=30)
+    tasks = _running(sched, 2, 0, 1)  # insertion order must not matter
+    sched.used = 5
+    sched._rebalance()  # 65 left covers ranks 0 and 1 only
+    assert [tasks[r].preempted for r in (0, 1, 2)] == [False, False, True]
+    sched.used = 40
+    sched._rebalance()
+    assert [tasks[r].preempted for r in (0, 1, 2)] == [False, True, True]
+
+def test_rebalance_lets_a_cheaper_lower_priority_unit_finish():
+    sched = scheduler.PriorityScheduler(2, quota=100, expected_cost=30)
+    tasks = _running(sched, 0, 1)
+    tasks[1].used = 28  # needs 2 more calls, the top unit needs 30
+    sched.used = 80
+    sched._rebalance()
+    assert tasks[0].preempted and not tasks[1].preempted
+
+@pytest.fixture
+def active(monkeypatch):
+    sched = scheduler.PriorityScheduler(1, quota=10, expected_cost=3)
+    monkeypatch.setattr(scheduler, "_active", sched)
+    task = scheduler._Task(0, "unit0", 1.0, ())
+    sched.running[0] = task
+    scheduler._local.task = task
+    yield sched, task
+    scheduler._local.task = None
+
+def test_bind_charges_inner_thread_calls_to_the_unit(active):
+    sched, task = active
+    bound = scheduler.bind(lambda: scheduler.checkpoint())
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        list(ex.map(lambda _: bound(), range(4)))
+    assert task.used == 4 and sched.used == 4
+
+def test_bind_raises_preempted_in_inner_threads(active):
+    sched, task = active
+    task.preempted = True
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        with pytest.raises(scheduler.Preempted):
+            ex.submit(scheduler.bind(scheduler.checkpoint)).result()
+
+def test_preempted_unit_can_return_partial_result():
+    def unit(n):
+        rows = []
+        try:
+            for i in range(n):
+                scheduler.checkpoint()
+                rows.append(i)
+        except scheduler.Preempted:
+            pass
+        return rows
+
+    sched = scheduler.PriorityScheduler(1, quota=5, expected_cost=3)
+    results = list(sched.run([(2.0, "a", (10,)), (1.0, "b", (10,))], unit))
+    assert results == [("a", "preempted", [0, 1, 2, 3]), ("b", "skipped", None)]
@@ -0,0 +1,23 @@
+import pytest
+
+from src.university_utils import clean_url_one
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://bsuedu.ru/", "https://bsuedu.ru/"),
+    ("https://sfedu.ru/", "https://sfedu.ru/"),
+    ("https://asu-edu.ru/", "https://asu-edu.ru/"),
+    ("https://www.edu.ru/vuz/card/...", None),
+    ("https://ru.wikipedia.org/...", None),
+    # keep institutional subdomains
+    ("https://academy.customs.gov.ru/", "https://academy.customs.gov.ru/"),
+])
+def test_clean_url_one(url, expected):
+    assert clean_url_one(url) == expected
+
+# collapse admissions/language subdomains
+@pytest.mark.parametrize("url, suffix", [
+    ("https://pk.aumsu.ru/", "aumsu.ru/"),
+    ("https://abitur.penzgtu.ru/", "penzgtu.ru/"),
+])
+def test_clean_url_one_collapses_admissions_subdomains(url, suffix):
+    assert clean_url_one(url).endswith(suffix)
@@ -0,0 +1,8 @@
+import pytest
+
+from src.url_cases import URL_ROOT_CASES
+from src.url_utils import extract_root
+
+@pytest.mark.parametrize("url, expected", URL_ROOT_CASES)
+def test_extract_root(url, expected):
+    assert extract_root(url) == expected
@@ -0,0 +1,39 @@
+import numpy as np
+
+import src.utils as utils
+
+def test_detect_mime_type_text_cut_inside_a_character():
+    data = ("a" + "Текст " * 500).encode("utf-8")  # byte 2048 falls inside a Cyrillic character
+    assert utils.detect_mime_type(data) == "text/plain"
+
+def test_detect_mime_type_binary_and_truncated_documents():
+    assert utils.detect_mime_type(b"\xff\xfe\x00binary" * 10) == "application/octet-stream"
+    assert utils.detect_mime_type("Текст".encode("utf-8")[:-1]) == "application/octet-stream"  # the whole document
+    assert utils.detect_mime_type(b"%PDF-1.7\n...") == "application/pdf"
+
+def _unit_rows(n, dim, seed):
+    rows = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+def test_truncate_embeddings_renormalises_rows():
+    embeddings = _unit_rows(20, 64, seed=0)
+    prefix = utils.truncate_embeddings(embeddings, 16)
+    assert prefix.shape == (20, 16) and prefix.dtype == np.float32 and prefix.flags.c_contiguous
+    np.testing.assert_allclose(np.linalg.norm(prefix, axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_allclose(prefix * np.linalg.norm(embeddings[:, :16], axis=1, keepdims=True),
+                               embeddings[:, :16], rtol=1e-5, atol=1e-6)  # same direction as the leading columns
+
+def test_two_stage_top_k_with_full_shortlist_matches_exact_search():
+    embeddings, queries = _unit_rows(50, 64, seed=1), _unit_rows(70, 64, seed=2)
+    exact_indices, exact_scores = utils.batch_top_k(queries, embeddings, top_k=5)
+    indices, scores = utils.two_stage_top_k(queries, embeddings, top_k=5, prefix_dim=8, shortlist=50,
+                                            chunk_size=16, rescore_chunk_size=7)
+    np.testing.assert_array_equal(indices, exact_indices)
+    np.testing.assert_allclose(scores, exact_scores, rtol=1e-5, atol=1e-6)
+
+def test_two_stage_top_k_scores_at_full_dimension():
+    embeddings, queries = _unit_rows(50, 64, seed=3), _unit_rows(10, 64, seed=4)
+    indices, scores = utils.two_stage_top_k(queries, embeddings, top_k=3, prefix_dim=8, shortlist=10)
+    full = np.einsum('qkd,qd->qk', embeddings[indices], queries)
+    np.testing.assert_allclose(scores, full, rtol=1e-5, atol=1e-6)
+    assert (np.diff(scores, axis=1) <= 0).all()  # best first